@@ -5,7 +5,13 @@ if SERVER then
     CreateConVar("proxchat_pos_hz", "2", FCVAR_ARCHIVE, "Position batch frequency in Hz (2-5 recommended)")
     CreateConVar("proxchat_include_spectators", "0", FCVAR_ARCHIVE, "When enabled, include spectators in position batches (for testing)")
     CreateConVar("proxchat_autounspect", "0", FCVAR_ARCHIVE, "If enabled, auto-clear spectator-only for new players so rounds can start")
+    CreateConVar("proxchat_server_id", "", FCVAR_ARCHIVE, "Identifies this server to a bridge that drives several servers (empty = default)")
     CreateConVar("proxchat_enabled", "1", FCVAR_ARCHIVE, "Enable/disable ProxChat addon hooks without unloading")
+    CreateConVar("proxchat_wire_format", "json", FCVAR_ARCHIVE, "Position batch encoding: json or binary (packed, smaller and faster to parse)")
+    CreateConVar("proxchat_batch_events", "1", FCVAR_ARCHIVE, "Buffer events and send them together to /events/batch on the position timer")
+    CreateConVar("proxchat_delta", "0", FCVAR_ARCHIVE, "Send only players that moved between periodic keyframes")
+    CreateConVar("proxchat_keyframe_sec", "5", FCVAR_ARCHIVE, "Seconds between full position keyframes in delta mode")
+    CreateConVar("proxchat_delta_threshold", "8", FCVAR_ARCHIVE, "Minimum movement (units) before a player is resent in delta mode")
 
     util.AddNetworkString("proxchat_debug")
 
@@ -18,6 +24,9 @@ if SERVER then
         return default
     end
 
+    -- Delta position stream state (proxchat_delta); seq is shared by JSON and binary batches
+    local pos_stream = { seq = 0, last = {}, last_keyframe = -math.huge, force_keyframe = true }
+
     local function http_post(path, bodyTbl)
         local base = get_cvar_str("proxchat_bridge_url", "http://127.0.0.1:8085")
         local secret = get_cvar_str("proxchat_bridge_secret", "")
@@ -35,6 +44,12 @@ if SERVER then
             success = function(data, code)
                 if code ~= 200 then
                     print("[ProxChat] Bridge POST failed: " .. tostring(code))
+                elseif bodyTbl and bodyTbl.mode == "delta" then
+                    -- Bridge detected a gap in the delta stream and wants full state
+                    local ok, resp = pcall(util.JSONToTable, data or "")
+                    if ok and istable(resp) and resp.keyframe == true then
+                        pos_stream.force_keyframe = true
+                    end
                 else
                     -- print success for link_attempts
                     if bodyTbl and bodyTbl.type == "link_attempt" then
@@ -62,18 +77,200 @@ if SERVER then
         return cv and cv:GetBool()
     end
 
+    -- Events buffered for /events/batch; flushed on the position timer
+    local event_buffer = {}
+    local batch_supported = true
+    local MAX_BUFFERED_EVENTS = 200
+
+    local function flush_events()
+        if #event_buffer == 0 then return end
+        local events = event_buffer
+        event_buffer = {}
+        local base = get_cvar_str("proxchat_bridge_url", "http://127.0.0.1:8085")
+        HTTP({
+            url = string.TrimRight(base, "/") .. "/events/batch",
+            method = "POST",
+            body = util.TableToJSON({ events = events }),
+            type = "application/json",
+            headers = {
+                ["Content-Type"] = "application/json",
+                ["x-bridge-secret"] = get_cvar_str("proxchat_bridge_secret", ""),
+            },
+            success = function(data, code)
+                if code == 404 then
+                    -- Older bridge without /events/batch: fall back to one POST per event
+                    print("[ProxChat] Bridge has no /events/batch; sending events individually")
+                    batch_supported = false
+                    for _, ev in ipairs(events) do http_post("/events", ev) end
+                    return
+                end
+                if code ~= 200 then
+                    print("[ProxChat] Bridge batch POST failed: " .. tostring(code))
+                    return
+                end
+                local ok, resp = pcall(util.JSONToTable, data or "")
+                if ok and istable(resp) and istable(resp.results) then
+                    for i, r in ipairs(resp.results) do
+                        local ev = events[i]
+                        if ev and ev.mode == "delta" and istable(r) and r.keyframe == true then
+                            pos_stream.force_keyframe = true
+                        end
+                    end
+                end
+            end,
+            failed = function(err)
+                print("[ProxChat] Bridge batch POST error: " .. tostring(err))
+            end
+        })
+    end
+
     local function emit_event(ev)
         if not is_enabled() then return end
+        -- Routes the event to this server's tenant on a multi-server bridge
+        local server_id = get_cvar_str("proxchat_server_id", "")
+        if server_id ~= "" then ev.server_id = server_id end
+        -- link_attempt stays immediate: its response is reported back to the player
+        if batch_supported and ev.type ~= "link_attempt" and GetConVar("proxchat_batch_events"):GetBool() then
+            table.insert(event_buffer, ev)
+            if #event_buffer >= MAX_BUFFERED_EVENTS then flush_events() end
+            return
+        end
         http_post("/events", ev)
     end
 
+    -- Packed binary position batches (layout documented in docs/events.md)
+    local WIRE_CONTENT_TYPE = "application/x-proxchat-pos"
+    local WIRE_MAGIC = "PXPB"
+    local WIRE_VERSION = 1
+    local WIRE_FLAG_TABLE = 1
+    -- Steamid table: slot -> account id; resent in every frame until the bridge acks it
+    local WIRE_FLAG_KEYFRAME = 2
+    local WIRE_FLAG_DELTA = 4
+    local wire = { table_id = 0, version = 0, acked_version = -1, accounts = {}, slots = {} }
+
+    local function wire_reset_table()
+        wire.table_id = (wire.table_id + 1) % 4294967296
+        wire.version = wire.version + 1
+        wire.accounts = {}
+        wire.slots = {}
+    end
+
+    local function pack_u16(n)
+        n = math.floor(n) % 65536
+        return string.char(n % 256, math.floor(n / 256))
+    end
+
+    local function pack_u32(n)
+        n = math.floor(n) % 4294967296
+        local b0 = n % 256; n = math.floor(n / 256)
+        local b1 = n % 256; n = math.floor(n / 256)
+        local b2 = n % 256; n = math.floor(n / 256)
+        return string.char(b0, b1, b2, n % 256)
+    end
+
+    -- IEEE 754 single precision, little endian (subnormals flush to zero)
+    local function pack_f32(x)
+        if x ~= x then return string.char(0, 0, 192, 127) end
+        local sign = 0
+        if x < 0 or (x == 0 and 1 / x < 0) then sign = 128; x = -x end
+        if x == 0 then return string.char(0, 0, 0, sign) end
+        local m, e = math.frexp(x) -- x = m * 2^e with 0.5 <= m < 1
+        e = e + 126
+        local mant = math.floor((m * 2 - 1) * 8388608 + 0.5)
+        if mant >= 8388608 then mant = 0; e = e + 1 end
+        if e <= 0 then return string.char(0, 0, 0, sign) end
+        if x == math.huge or e >= 255 then return string.char(0, 0, 128, sign + 127) end
+        local b0 = mant % 256; mant = math.floor(mant / 256)
+        local b1 = mant % 256; mant = math.floor(mant / 256)
+        return string.char(b0, b1, mant + (e % 2) * 128, sign + math.floor(e / 2))
+    end
+
+    local NAN_RECORD_TAIL = string.rep(string.char(0, 0, 192, 127), 3)
+
+    -- players: entities to encode; removed: { acct = ... } entries sent as NaN records (delta mode)
+    local function wire_encode(players, removed, flags, seq)
+        local recs = {}
+        for _, ply in ipairs(players) do
+            local acct = ply.AccountID and ply:AccountID()
+            if acct and acct > 0 then
+                local slot = wire.slots[acct]
+                if not slot and #wire.accounts < 65535 then
+                    table.insert(wire.accounts, acct)
+                    slot = #wire.accounts - 1
+                    wire.slots[acct] = slot
+                    wire.version = wire.version + 1
+                end
+                if slot then
+                    local pos = ply:GetPos()
+                    recs[#recs + 1] = pack_u16(slot) .. pack_f32(pos.x) .. pack_f32(pos.y) .. pack_f32(pos.z)
+                end
+            end
+        end
+        for _, r in ipairs(removed) do
+            local slot = r.acct and wire.slots[r.acct]
+            if slot then recs[#recs + 1] = pack_u16(slot) .. NAN_RECORD_TAIL end
+        end
+        local with_table = wire.acked_version ~= wire.version
+        local parts = {}
+        if with_table then
+            for i, acct in ipairs(wire.accounts) do parts[i] = pack_u32(acct) end
+        end
+        if with_table then flags = flags + WIRE_FLAG_TABLE end
+        local header = WIRE_MAGIC .. string.char(WIRE_VERSION, flags)
+            .. pack_u16(with_table and #wire.accounts or 0) .. pack_u16(#recs)
+            .. pack_u32(wire.table_id) .. pack_u32(seq) .. pack_u32(CurTime() * 1000)
+        return header .. table.concat(parts) .. table.concat(recs), #recs, wire.version
+    end
+
+    local function emit_binary_batch(players, removed, mode, seq)
+        local flags = (mode == "keyframe" and WIRE_FLAG_KEYFRAME) or (mode == "delta" and WIRE_FLAG_DELTA) or 0
+        local body, count, version = wire_encode(players, removed, flags, seq)
+        -- Empty delta frames still go out as heartbeats so the bridge can detect gaps
+        if count == 0 and not mode then return end
+        local base = get_cvar_str("proxchat_bridge_url", "http://127.0.0.1:8085")
+        HTTP({
+            url = string.TrimRight(base, "/") .. "/events",
+            method = "POST",
+            body = body,
+            type = WIRE_CONTENT_TYPE,
+            headers = {
+                ["Content-Type"] = WIRE_CONTENT_TYPE,
+                ["x-bridge-secret"] = get_cvar_str("proxchat_bridge_secret", ""),
+                ["x-proxchat-server"] = get_cvar_str("proxchat_server_id", ""),
+            },
+            success = function(data, code)
+                if code == 200 then
+                    -- Table for this version reached the bridge; stop resending it
+                    if version == wire.version then wire.acked_version = version end
+                    if mode == "delta" then
+                        local ok, resp = pcall(util.JSONToTable, data or "")
+                        if ok and istable(resp) and resp.keyframe == true then
+                            pos_stream.force_keyframe = true
+                        end
+                    end
+                elseif code == 409 then
+                    -- Bridge lost our table (e.g. restarted); resend with the next frame
+                    wire.acked_version = -1
+                else
+                    print("[ProxChat] Bridge POST failed (binary batch): " .. tostring(code))
+                end
+            end,
+            failed = function(err)
+                print("[ProxChat] Bridge POST error (binary batch): " .. tostring(err))
+            end
+        })
+    end
+
     local round_active = false
 
     hook.Add("TTTBeginRound", "ProxChat_TTTBeginRound", function()
         if not is_enabled() then return end
         round_active = true
+        wire_reset_table()
+        pos_stream.last = {}
+        pos_stream.force_keyframe = true
         print("[ProxChat] TTTBeginRound fired; round_active=true")
-        emit_event({ type = "round_start", ts = CurTime(), round_id = tostring(os.time()) })
+        emit_event({ type = "round_start", ts = CurTime(), round_id = tostring(os.time()), map = game.GetMap() })
     end)
 
     hook.Add("TTTEndRound", "ProxChat_TTTEndRound", function()
@@ -177,13 +374,18 @@ if SERVER then
     local accum = 0
     hook.Add("Think", "ProxChat_PosBatchThink", function()
         if not is_enabled() then return end
-        if not round_active then return end
         local hz = math.Clamp(GetConVar("proxchat_pos_hz"):GetInt(), 1, 10)
         local interval = 1 / hz
         accum = accum + FrameTime()
         if accum < interval then return end
         accum = 0
-        local positions = {}
+        if not round_active then
+            -- Still deliver buffered events (e.g. round_end) between rounds
+            flush_events()
+            return
+        end
+        local binary = get_cvar_str("proxchat_wire_format", "json") == "binary"
+        local players = {}
         for _, ply in ipairs(player.GetAll()) do
             if not IsValid(ply) or not ply:IsFullyAuthenticated() then
                 -- skip invalid or unauthenticated players
@@ -192,18 +394,71 @@ if SERVER then
                 if not include_spect and not ply:Alive() then
                     -- skip spectators unless explicitly enabled
                 else
-                    local pos = ply:GetPos()
-                    table.insert(positions, {
-                        player = { steamid64 = ply:SteamID64() },
-                        pos = { x = pos.x, y = pos.y, z = pos.z },
-                        ts = CurTime(),
-                    })
+                    table.insert(players, ply)
+                end
+            end
+        end
+
+        -- Delta mode: keyframe periodically (or when the bridge asks), otherwise only movers
+        local now = CurTime()
+        local mode, send, removed = nil, players, {}
+        if GetConVar("proxchat_delta"):GetBool() then
+            local keyframe = pos_stream.force_keyframe
+                or (now - pos_stream.last_keyframe) >= math.max(GetConVar("proxchat_keyframe_sec"):GetFloat(), 0.5)
+            local thr = GetConVar("proxchat_delta_threshold"):GetFloat()
+            local thr2 = thr * thr
+            local seen = {}
+            send = {}
+            for _, ply in ipairs(players) do
+                local sid = ply:SteamID64()
+                local pos = ply:GetPos()
+                seen[sid] = true
+                local prev = pos_stream.last[sid]
+                if keyframe or not prev or prev.pos:DistToSqr(pos) > thr2 then
+                    table.insert(send, ply)
+                    pos_stream.last[sid] = { pos = pos, acct = ply.AccountID and ply:AccountID() }
+                end
+            end
+            for sid, prev in pairs(pos_stream.last) do
+                if not seen[sid] then
+                    table.insert(removed, { sid = sid, acct = prev.acct })
+                    pos_stream.last[sid] = nil
                 end
             end
+            if keyframe then
+                mode = "keyframe"
+                removed = {}
+                pos_stream.last_keyframe = now
+                pos_stream.force_keyframe = false
+            else
+                mode = "delta"
+            end
+            pos_stream.seq = (pos_stream.seq + 1) % 4294967296
+        end
+
+        if binary then
+            -- Buffered control events happened before this sample; send them first
+            flush_events()
+            emit_binary_batch(send, removed, mode, pos_stream.seq)
+            return
+        end
+        local positions = {}
+        for _, ply in ipairs(send) do
+            local pos = ply:GetPos()
+            table.insert(positions, {
+                player = { steamid64 = ply:SteamID64() },
+                pos = { x = pos.x, y = pos.y, z = pos.z },
+                ts = now,
+            })
         end
-        if #positions > 0 then
+        if mode then
+            local removed_sids = {}
+            for i, r in ipairs(removed) do removed_sids[i] = r.sid end
+            emit_event({ type = "player_pos_batch", mode = mode, seq = pos_stream.seq, ts = now, positions = positions, removed = removed_sids })
+        elseif #positions > 0 then
             emit_event({ type = "player_pos_batch", positions = positions })
         end
+        flush_events()
     end)
 
     -- Optional: auto-clear spectator-only for new players (does not run unless enabled)
@@ -3,164 +3,179 @@ from __future__ import annotations
 import asyncio
 import json
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 import discord
 from discord import app_commands
 
-from .config import get_settings
-from .http_server import create_app, run_server
-from .discord_actions import ensure_in_channel, set_voice_policy
-from .proximity import Pos, cluster_positions, ensure_cluster_channels, cleanup_cluster_channels
-from .store import load_mapping, save_mapping
-import secrets
-import time
+from .config import get_settings, on_settings_reload, reload_settings, settings_stats, Settings
+from .http_server import create_app, create_metrics_app, run_server
+from .tenant import Tenant, TenantConfig, build_tenants, load_tenants, route_event
+from .actuator import ActuatorLink, ActuatorServer, default_address
+from .recorder import EventRecorder
+from .link_codes import LinkCodeStore
+from .store import MappingStore, load_mapping, save_mapping
+from .log import get_logger, setup_logging
+
+log = get_logger("ProxBot")
+link_log = get_logger("Link")
+config_log = get_logger("Config")
 
 
 class ProxBot(discord.Client):
-    def __init__(self, guild_id: int, living_channel: int, dead_channel: int,
-                 prox_radius: float, max_clusters: int, prefix: str, category_id: int | None):
+    """One gateway connection and bot login shared by every tenant (GMod server)."""
+
+    def __init__(self, tenants: List[TenantConfig]):
         intents = discord.Intents.default()
         intents.guilds = True
         intents.members = True
         intents.voice_states = True
-        super().__init__(intents=intents)
-        self.guild_id = guild_id
-        self.living_channel = living_channel
-        self.dead_channel = dead_channel
-        self._guild: Optional[discord.Guild] = None
+        # Surface long rate-limit waits as errors so the move dispatcher can reprioritize
+        super().__init__(intents=intents, max_ratelimit_timeout=get_settings().PROX_MAX_RATELIMIT_WAIT_SEC)
+        # Shared settings snapshot; swapped on reload
+        self.settings: Settings = get_settings()
+        # Links are per Discord user, so the mapping and pending codes are shared by all tenants
         self.steam_to_discord: Dict[str, int] = {}
-        self._pending_codes: Dict[str, tuple[int, float]] = {}  # code -> (discord_id, expiry_ts)
-        self.prox_radius = prox_radius
-        self.max_clusters = max_clusters
-        self.cluster_prefix = prefix
-        self.cluster_category_id = category_id
-        # Hysteresis state
-        self._last_cluster: Dict[int, int] = {}  # user_id -> cluster_index
-        self._stable_count: Dict[int, int] = {}
-        self._last_move_ts: Dict[int, float] = {}  # per-user move cooldown
-        self._last_cluster_move_ts: Dict[int, float] = {}  # per-cluster cooldown (cluster_idx -> ts)
-        # Permission/cache flags
-        self._perm_warned = False
-        self._can_manage_channels = False
-        self._can_move_members = False
-        self._can_mute_members = False
-        # Not-ready log rate limit
-        self._not_ready_last_log_ts = 0.0
+        self.link_codes = LinkCodeStore(
+            ttl=self.settings.LINK_CODE_TTL_SEC,
+            per_user=self.settings.LINK_CODES_PER_USER,
+            max_codes=self.settings.LINK_CODES_MAX,
+        )
+        # Set when MAPPING_DB is configured; otherwise links are saved to MAPPING_FILE
+        self.store: Optional[MappingStore] = None
+        self.tenants: Dict[str, Tenant] = build_tenants(tenants, self.settings, self.steam_to_discord, self)
+        self._tenants_by_guild: Dict[int, List[Tenant]] = {}
+        for tenant in self.tenants.values():
+            self._tenants_by_guild.setdefault(tenant.guild_id, []).append(tenant)
+        # Set in PROX_MODE=actuator: pushes voice/link/tenant state to the ingress process
+        self.actuator_server: Optional[ActuatorServer] = None
         # Slash commands
         self.tree = app_commands.CommandTree(self)
-        # Internal: seeded flag
-        self._clusters_seeded = False
-
-    def _refresh_perms(self) -> None:
-        try:
-            if not self._guild:
-                return
-            me = self.guild.me  # type: ignore
-            if not me:
-                return
-            perms = me.guild_permissions
-            before = (self._can_manage_channels, self._can_move_members, self._can_mute_members)
-            self._can_manage_channels = bool(perms.manage_channels)
-            self._can_move_members = bool(perms.move_members)
-            self._can_mute_members = bool(perms.mute_members or perms.deafen_members)
-            after = (self._can_manage_channels, self._can_move_members, self._can_mute_members)
-            # If permissions improved, clear warn flag so we can log future issues if they regress
-            if after > before and self._perm_warned and (self._can_manage_channels and self._can_move_members):
-                self._perm_warned = False
-        except Exception:
-            pass
-
-    @property
-    def guild(self) -> discord.Guild:
-        assert self._guild is not None
-        return self._guild
-
-    async def on_ready(self):
-        print(f"Logged in as {self.user}")
-        # Try to resolve configured guild
+        on_settings_reload(self.apply_settings)
+
+    def apply_settings(self, settings: Settings) -> None:
+        """Adopt a reloaded settings snapshot. Guild changes, TENANTS_FILE and bridge host/port still need a restart."""
+        self.settings = settings
+        self.link_codes.configure(ttl=settings.LINK_CODE_TTL_SEC, per_user=settings.LINK_CODES_PER_USER, max_codes=settings.LINK_CODES_MAX)
+        for tenant in self.tenants.values():
+            tenant.apply_settings(settings)
+
+    def _tenant_for(self, interaction: discord.Interaction) -> Optional[Tenant]:
+        """First ready tenant bound to the guild a slash command was used in."""
+        for tenant in self._tenants_by_guild.get(interaction.guild_id or 0, []):
+            if tenant._guild is not None:
+                return tenant
+        return None
+
+    def _publish_tenant(self, tenant: Tenant) -> None:
+        if self.actuator_server is not None:
+            self.actuator_server.broadcast(self.actuator_server.tenant_state(tenant, voice=True))
+
+    async def _attach_tenant(self, tenant: Tenant) -> None:
         try:
-            g = self.get_guild(self.guild_id)
+            g = self.get_guild(tenant.guild_id)
             if g is None:
-                g = await self.fetch_guild(self.guild_id)
-            self._guild = g
-            print(f"[ProxBot] Connected to guild={self.guild.name} ({self.guild.id})")
+                g = await self.fetch_guild(tenant.guild_id)
+            tenant.attach(g)
+            log.info(
+                f"Tenant '{tenant.server_id}' connected to guild={g.name} ({g.id}); "
+                f"{len(tenant.voice)} users in voice"
+            )
         except Exception as e:
-            self._guild = None
-            print(
-                f"[ProxBot] Logged in but cannot access configured GUILD_ID={self.guild_id}: {e}. "
+            log.warning(
+                f"Logged in but cannot access GUILD_ID={tenant.guild_id} for tenant '{tenant.server_id}': {e}. "
                 f"Ensure the bot is invited to that server and GUILD_ID is correct. Will retry."
             )
             # Start a background retry to obtain guild later
             async def retry_guild():
-                while self.is_ready() and self._guild is None:
+                while self.is_ready() and tenant._guild is None:
                     try:
-                        g2 = self.get_guild(self.guild_id) or await self.fetch_guild(self.guild_id)
+                        g2 = self.get_guild(tenant.guild_id) or await self.fetch_guild(tenant.guild_id)
                         if g2:
-                            self._guild = g2
-                            print(f"[ProxBot] Guild resolved after retry: {self.guild.name} ({self.guild.id})")
+                            tenant.attach(g2)
+                            tenant.refresh_perms()
+                            self._publish_tenant(tenant)
+                            log.info(f"Guild resolved after retry for tenant '{tenant.server_id}': {g2.name} ({g2.id})")
                             break
                     except Exception:
                         pass
                     await asyncio.sleep(15)
             asyncio.create_task(retry_guild())
+            return
         # Snapshot permissions for the bot member
         try:
-            me = self.guild.me or await self.guild.fetch_member(self.user.id)  # type: ignore
+            me = tenant.guild.me or await tenant.guild.fetch_member(self.user.id)  # type: ignore
             perms = me.guild_permissions if me else None
             if perms:
-                self._can_manage_channels = bool(perms.manage_channels)
-                self._can_move_members = bool(perms.move_members)
-                self._can_mute_members = bool(perms.mute_members or perms.deafen_members)
-                print(
-                    f"[ProxBot] Bot perms: manage_channels={self._can_manage_channels} "
-                    f"move_members={self._can_move_members} mute/deafen={self._can_mute_members}"
+                tenant._can_manage_channels = bool(perms.manage_channels)
+                tenant._can_move_members = bool(perms.move_members)
+                tenant._can_mute_members = bool(perms.mute_members or perms.deafen_members)
+                log.info(
+                    f"Bot perms in tenant '{tenant.server_id}': manage_channels={tenant._can_manage_channels} "
+                    f"move_members={tenant._can_move_members} mute/deafen={tenant._can_mute_members}"
                 )
         except Exception:
             pass
-        # Ready
-        # Seed a couple of cluster channels early to avoid rate/permission surprises during events
+        self._publish_tenant(tenant)
+        # Create the spare cluster channels early to avoid rate/permission surprises during events
         try:
-            from .config import get_settings
-            if get_settings().PROX_ENABLE_CLUSTERING and self._can_manage_channels and self.guild:
-                async def _seed():
-                    try:
-                        if not self._clusters_seeded:
-                            print("[ProxBot] Seeding initial cluster channels (target=2)")
-                            await ensure_cluster_channels(self.guild, self.cluster_prefix, self.cluster_category_id, 2)
-                            self._clusters_seeded = True
-                    except Exception as e:
-                        print(f"[ProxBot] Cluster seed error: {e}")
-                asyncio.create_task(_seed())
-        except Exception:
-            pass
+            if self.settings.PROX_ENABLE_CLUSTERING and tenant._can_manage_channels:
+                tenant.pool.warm()
+        except Exception as e:
+            log.error(f"Cluster warm-up error: {e}")
+
+    async def on_ready(self):
+        log.info(f"Logged in as {self.user}; serving {len(self.tenants)} tenant(s)")
+        await asyncio.gather(*(self._attach_tenant(t) for t in self.tenants.values()))
+
+    async def on_resumed(self):
+        # Cached voice states may have changed while disconnected
+        for tenant in self.tenants.values():
+            if tenant._guild is not None:
+                tenant.voice.rebuild(tenant._guild)
+                self._publish_tenant(tenant)
+
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        cid = after.channel.id if after.channel else None
+        for tenant in self._tenants_by_guild.get(member.guild.id, []):
+            tenant.voice.update(member.id, cid)
+        if self.actuator_server is not None and before.channel != after.channel:
+            self.actuator_server.broadcast({"op": "voice", "guild_id": member.guild.id, "user_id": member.id, "channel_id": cid})
+
+    async def on_member_remove(self, member: discord.Member):
+        for tenant in self._tenants_by_guild.get(member.guild.id, []):
+            tenant.voice.update(member.id, None)
+        if self.actuator_server is not None:
+            self.actuator_server.broadcast({"op": "voice", "guild_id": member.guild.id, "user_id": member.id, "channel_id": None})
 
     async def setup_hook(self) -> None:
-        # Define slash commands here so they bind to this instance
-        guild_obj = discord.Object(id=self.guild_id)
+        # Define slash commands here so they bind to this instance; every tenant guild gets the same commands; tenant-specific ones resolve via _tenant_for()
+        guild_objs = [discord.Object(id=gid) for gid in self._tenants_by_guild]
 
-        @self.tree.command(name="linksteam", description="Generate a one-time code to link your SteamID from in-game", guild=guild_obj)
+        @self.tree.command(name="linksteam", description="Generate a one-time code to link your SteamID from in-game", guilds=guild_objs)
         async def linksteam(interaction: discord.Interaction):
             # Immediate ack to avoid 3s timeout
             if not interaction.response.is_done():
                 await interaction.response.defer(ephemeral=True)
             try:
-                code = secrets.token_hex(3).upper()  # 6 hex chars
-                self._pending_codes[code] = (interaction.user.id, time.time() + 300)  # 5 minutes
+                code = self.link_codes.issue(interaction.user.id)
+                if code is None:
+                    await interaction.edit_original_response(content="Too many pending link codes right now; try again in a few minutes.")
+                    return
                 msg = (
                     f"Your link code: {code}\n"
                     f"In Garry's Mod chat, type: !link {code}"
                 )
                 await interaction.edit_original_response(content=msg)
             except Exception as e:
-                print(f"/linksteam error: {e}")
+                log.error(f"/linksteam error: {e}")
                 # Fallback DM in case followup fails
                 try:
                     await interaction.user.send("Here's your link code via DM: " + msg)
                 except Exception:
                     pass
 
-        @self.tree.command(name="linked", description="List currently linked SteamIDs (admin only)", guild=guild_obj)
+        @self.tree.command(name="linked", description="List currently linked SteamIDs (admin only)", guilds=guild_objs)
         async def linked(interaction: discord.Interaction):
             # Immediate ack to avoid 3s timeout
             if not interaction.response.is_done():
@@ -186,13 +201,13 @@ class ProxBot(discord.Client):
                     footer = f"\n… and {len(items) - limit} more."
                 await interaction.edit_original_response(content=f"Linked players ({len(items)} total):\n{body}{footer}")
             except Exception as e:
-                print(f"/linked error: {e}")
+                log.error(f"/linked error: {e}")
                 try:
                     await interaction.user.send("An error occurred while listing links. Try again later.")
                 except Exception:
                     pass
 
-        @self.tree.command(name="seedclusters", description="Create N proximity channels now (admin only)", guild=guild_obj)
+        @self.tree.command(name="seedclusters", description="Create N proximity channels now (admin only)", guilds=guild_objs)
         async def seedclusters(interaction: discord.Interaction, n: int):
             if not interaction.response.is_done():
                 await interaction.response.defer(ephemeral=True)
@@ -201,26 +216,24 @@ class ProxBot(discord.Client):
                 if not perms or not perms.manage_guild:
                     await interaction.edit_original_response(content="Admin only: requires Manage Server.")
                     return
+                tenant = self._tenant_for(interaction)
+                if tenant is None:
+                    await interaction.edit_original_response(content="This server is not configured as a ProxChat tenant yet.")
+                    return
                 if n <= 0 or n > 20:
                     await interaction.edit_original_response(content="Please choose 1..20 channels to seed.")
                     return
-                # Schedule background ensure to avoid long waits, reply immediately
-                from .proximity import ensure_cluster_channels
-                async def _bg():
-                    try:
-                        await ensure_cluster_channels(self.guild, self.cluster_prefix, self.cluster_category_id, n)
-                    except Exception as e:
-                        print(f"[ProxBot] seedclusters(bg) error: {e}")
-                asyncio.create_task(_bg())
+                # The pool creates channels in the background; reply immediately
+                tenant.pool.warm(n)
                 # Give a quick snapshot of currently visible channels with our prefix
-                existing = [ch for ch in self.guild.voice_channels if ch.name.startswith(self.cluster_prefix)]
+                existing = [ch for ch in tenant.guild.voice_channels if ch.name.startswith(tenant.cluster_prefix)]
                 existing.sort(key=lambda c: c.name)
                 names = ", ".join(ch.name for ch in existing) or "<none>"
                 await interaction.edit_original_response(content=f"Seeding up to {n} channels in background. Currently have: {names}. Watch bot logs for creation updates.")
             except Exception as e:
                 await interaction.edit_original_response(content=f"Error seeding clusters: {e}")
 
-        @self.tree.command(name="cleanupclusters", description="Delete empty proximity channels (admin only)", guild=guild_obj)
+        @self.tree.command(name="cleanupclusters", description="Delete empty proximity channels (admin only)", guilds=guild_objs)
         async def cleanupclusters(interaction: discord.Interaction):
             if not interaction.response.is_done():
                 await interaction.response.defer(ephemeral=True)
@@ -229,12 +242,16 @@ class ProxBot(discord.Client):
                 if not perms or not perms.manage_guild:
                     await interaction.edit_original_response(content="Admin only: requires Manage Server.")
                     return
-                deleted = await cleanup_cluster_channels(self.guild, self.cluster_prefix, category_id=self.cluster_category_id)
+                tenant = self._tenant_for(interaction)
+                if tenant is None:
+                    await interaction.edit_original_response(content="This server is not configured as a ProxChat tenant yet.")
+                    return
+                deleted = await tenant.pool.release(keep=0)
                 await interaction.edit_original_response(content=f"Deleted {deleted} empty cluster channels.")
             except Exception as e:
                 await interaction.edit_original_response(content=f"Error cleaning clusters: {e}")
 
-        @self.tree.command(name="listvoice", description="List voice channels and IDs (admin only)", guild=guild_obj)
+        @self.tree.command(name="listvoice", description="List voice channels and IDs (admin only)", guilds=guild_objs)
         async def listvoice(interaction: discord.Interaction, prefix: Optional[str] = None):
             if not interaction.response.is_done():
                 await interaction.response.defer(ephemeral=True)
@@ -243,7 +260,11 @@ class ProxBot(discord.Client):
                 if not perms or not perms.manage_guild:
                     await interaction.edit_original_response(content="Admin only: requires Manage Server.")
                     return
-                chans = list(self.guild.voice_channels)
+                tenant = self._tenant_for(interaction)
+                if tenant is None:
+                    await interaction.edit_original_response(content="This server is not configured as a ProxChat tenant yet.")
+                    return
+                chans = list(tenant.guild.voice_channels)
                 if prefix:
                     chans = [c for c in chans if c.name.startswith(prefix)]
                 chans.sort(key=lambda c: c.name)
@@ -256,9 +277,24 @@ class ProxBot(discord.Client):
             except Exception as e:
                 await interaction.edit_original_response(content=f"Error listing channels: {e}")
 
+        @self.tree.command(name="reloadconfig", description="Reload settings from .env/environment (admin only)", guilds=guild_objs)
+        async def reloadconfig(interaction: discord.Interaction):
+            if not interaction.response.is_done():
+                await interaction.response.defer(ephemeral=True)
+            try:
+                perms = getattr(interaction.user, "guild_permissions", None)
+                if not perms or not perms.manage_guild:
+                    await interaction.edit_original_response(content="Admin only: requires Manage Server.")
+                    return
+                reload_settings()
+                build_ms = settings_stats()["build_ms"]
+                await interaction.edit_original_response(content=f"Settings reloaded in {build_ms:.2f} ms.")
+            except Exception as e:
+                await interaction.edit_original_response(content=f"Reload failed; keeping previous settings: {e}")
+
         @self.tree.error
         async def on_app_command_error(interaction: discord.Interaction, error: Exception):
-            print(f"App command error: {error}")
+            log.error(f"App command error: {error}")
             try:
                 if not interaction.response.is_done():
                     await interaction.response.defer(ephemeral=True)
@@ -266,265 +302,156 @@ class ProxBot(discord.Client):
             except Exception:
                 pass
 
-        # Sync commands to this guild for instant availability
-        try:
-            synced = await self.tree.sync(guild=guild_obj)
-            print(f"Synced {len(synced)} app commands to guild {self.guild_id}")
-        except Exception as e:
-            print(f"Slash command sync failed: {e}")
-
-    def load_mapping(self, mapping_file: Optional[str]):
+        # Sync commands to each tenant guild for instant availability
+        for guild_obj in guild_objs:
+            try:
+                synced = await self.tree.sync(guild=guild_obj)
+                log.info(f"Synced {len(synced)} app commands to guild {guild_obj.id}")
+            except Exception as e:
+                log.warning(f"Slash command sync failed for guild {guild_obj.id}: {e}")
+
+    def load_mapping(self, mapping_file: Optional[str], mapping_db: Optional[str] = None):
+        if mapping_db:
+            # Fills self.steam_to_discord in place
+            self.store = MappingStore(mapping_db, self.steam_to_discord)
+            self.store.load(import_json=mapping_file)
+            # Pending link codes survive restarts too
+            self.link_codes.backend = self.store
+            restored = self.link_codes.load()
+            if restored:
+                link_log.info(f"Restored {restored} pending link codes")
+            for tenant in self.tenants.values():
+                tenant.voice.set_linked(self.steam_to_discord.values())
+            log.info(f"Loaded {len(self.steam_to_discord)} ID mappings from {mapping_db}")
+            return
         if not mapping_file:
             return
         p = Path(mapping_file)
         if not p.exists():
             return
-        self.steam_to_discord = load_mapping(str(p))
-        print(f"Loaded {len(self.steam_to_discord)} ID mappings from {mapping_file}")
-
-    def save_mapping(self, mapping_file: Optional[str]):
+        # Update in place: tenants hold a reference to this dict
+        self.steam_to_discord.clear()
+        self.steam_to_discord.update(load_mapping(str(p)))
+        for tenant in self.tenants.values():
+            tenant.voice.set_linked(self.steam_to_discord.values())
+        log.info(f"Loaded {len(self.steam_to_discord)} ID mappings from {mapping_file}")
+
+    async def save_mapping(self, mapping_file: Optional[str]):
         if not mapping_file:
             return
-        save_mapping(mapping_file, self.steam_to_discord)
-
-    async def handle_event(self, ev: dict):
-        # Determine event type early
-        t = ev.get("type")
-        # Process linking even before guild is ready (doesn't require guild)
-        if t == "link_attempt":
-            try:
-                code_raw = ev.get("code")
-                player = ev.get("player", {})
-                steamid = player.get("steamid64")
-                code = str(code_raw).strip().upper() if code_raw is not None else None
-                if not code or not steamid:
-                    print(f"[Link] Invalid link_attempt payload: code={code_raw!r} steamid={steamid!r}")
-                    return {"linked": False, "reason": "invalid_payload"}
-                entry = self._pending_codes.get(code)
-                if not entry:
-                    print(f"[Link] Code not found: {code} from steamid {steamid}")
-                    return {"linked": False, "reason": "code_not_found"}
-                discord_id, expiry = entry
-                now_ts = time.time()
-                if now_ts > expiry:
-                    print(f"[Link] Code expired: {code} for discord {discord_id}")
-                    del self._pending_codes[code]
-                    return {"linked": False, "reason": "code_expired"}
-                # Link and persist
-                self.steam_to_discord[str(steamid)] = int(discord_id)
-                del self._pending_codes[code]
-                self.save_mapping(get_settings().MAPPING_FILE)
-                print(f"[Link] Linked steamid {steamid} -> discord {discord_id}")
-                # DM the user if possible
-                try:
-                    user = await self.fetch_user(discord_id)
-                    await user.send(f"Linked SteamID64 {steamid} to your Discord account.")
-                except Exception:
-                    pass
-                return {"linked": True}
-            except Exception as e:
-                print(f"[Link] Exception handling link_attempt: {e}")
-                return {"linked": False, "reason": "exception"}
-
-        # For all other events, ignore until the Discord client is ready and guild is set
-        if not getattr(self, "_guild", None):
-            et = t if t is not None else "?"
-            now_ts = time.time()
-            if now_ts - self._not_ready_last_log_ts >= 5.0:
-                print(f"[ProxBot] Received event '{et}' before bot ready; ignoring")
-                self._not_ready_last_log_ts = now_ts
-            return
+        # File I/O off the event loop so gateway heartbeats and voice events aren't delayed
+        await asyncio.to_thread(save_mapping, mapping_file, dict(self.steam_to_discord))
 
-        # From here on, guild-dependent events
-        t = t
-        # Refresh permissions to pick up mid-run role changes
-        self._refresh_perms()
-        
-        if t == "player_death":
+    async def handle_link(self, ev: dict):
+        """Process a link_attempt; doesn't require any guild to be ready."""
+        try:
+            code_raw = ev.get("code")
             player = ev.get("player", {})
             steamid = player.get("steamid64")
-            if steamid and steamid in self.steam_to_discord:
-                uid = self.steam_to_discord[steamid]
-                print(f"[ProxBot] player_death for steamid={steamid} mapped uid={uid}")
-                # Move to Dead channel and optionally server mute/deafen
-                await ensure_in_channel(
-                    self.guild,
-                    uid,
-                    self.dead_channel,
-                    mute=get_settings().PROX_DEAD_MUTE,
-                    deafen=get_settings().PROX_DEAD_DEAFEN,
-                )
-        elif t == "round_end":
-            print("[ProxBot] round_end: returning mapped users to Living and clearing mute/deafen")
-            # Clear all hysteresis and cooldown state to prevent carryover into next round
-            self._last_cluster.clear()
-            self._stable_count.clear()
-            self._last_move_ts.clear()
-            self._last_cluster_move_ts.clear()
-            # Clear mute/deafen regardless of move ability
-            for uid in list(self.steam_to_discord.values()):
-                try:
-                    await set_voice_policy(self.guild, uid, mute=False, deafen=False)
-                except Exception:
-                    pass
-            # Fallback: also clear for anyone currently in the Dead channel, even if not mapped
+            code = str(code_raw).strip().upper() if code_raw is not None else None
+            if not code or not steamid:
+                link_log.warning(f"Invalid link_attempt payload: code={code_raw!r} steamid={steamid!r}")
+                return {"linked": False, "reason": "invalid_payload"}
+            # Consumes the code
+            discord_id, reason = self.link_codes.redeem(code)
+            if discord_id is None:
+                link_log.info(f"Link failed ({reason}): {code} from steamid {steamid}")
+                return {"linked": False, "reason": reason}
+            # Link and persist; a relinked SteamID may leave its previous account unlinked
+            prev = self.steam_to_discord.get(str(steamid))
+            if self.store is not None:
+                others = self.store.steamids_for(int(discord_id)) - {str(steamid)}
+                if others:
+                    link_log.info(f"discord {discord_id} is also linked to {', '.join(sorted(others))}")
+                # Updates steam_to_discord now; one row upsert on the store thread
+                saved = self.store.link(str(steamid), int(discord_id))
+            else:
+                self.steam_to_discord[str(steamid)] = int(discord_id)
+                saved = self.save_mapping(self.settings.MAPPING_FILE)
+            stale = prev is not None and prev != int(discord_id) and (
+                not self.store.steamids_for(prev) if self.store is not None else prev not in self.steam_to_discord.values()
+            )
+            for tenant in self.tenants.values():
+                tenant.voice.link(int(discord_id))
+                if stale:
+                    tenant.voice.unlink(prev)
+            if self.actuator_server is not None:
+                self.actuator_server.broadcast({"op": "link", "steamid": str(steamid), "user_id": int(discord_id)})
+            await saved
+            link_log.info(f"Linked steamid {steamid} -> discord {discord_id}")
+            # DM the user if possible
             try:
-                dead_ch = self.guild.get_channel(self.dead_channel)
-                if dead_ch and isinstance(dead_ch, discord.VoiceChannel):
-                    for m in list(dead_ch.members):
-                        try:
-                            await m.edit(mute=False, deafen=False, reason="ProxChat round end unmute")
-                        except Exception:
-                            pass
+                user = await self.fetch_user(discord_id)
+                await user.send(f"Linked SteamID64 {steamid} to your Discord account.")
             except Exception:
                 pass
-            # Try to return users to Living channel if they are in voice somewhere
-            for uid in list(self.steam_to_discord.values()):
-                await ensure_in_channel(self.guild, uid, self.living_channel)
-            # Optional cleanup of empty cluster channels
-            if self._can_manage_channels and get_settings().PROX_CLEANUP_CLUSTERS:
-                print("[ProxBot] round_end: cleaning up empty cluster channels")
-                try:
-                    await cleanup_cluster_channels(self.guild, self.cluster_prefix, category_id=self.cluster_category_id)
-                except Exception as e:
-                    print(f"[ProxBot] Cleanup error: {e}")
-        elif t == "round_start":
-            print("[ProxBot] round_start: normalizing users to Living")
-            # Optional: move mapped users that are already in voice to Living (normalize state)
-            if get_settings().PROX_MOVE_TO_LIVING_ON_START:
-                for uid in list(self.steam_to_discord.values()):
-                    await ensure_in_channel(self.guild, uid, self.living_channel)
-        elif t == "player_pos_batch":
-            # Respect config toggle
-            if not get_settings().PROX_ENABLE_CLUSTERING:
-                return
-            # Build a map of discord user -> last position
-            positions = ev.get("positions") or []
-            print(f"[ProxBot] player_pos_batch received with {len(positions)} positions")
-            pts: Dict[int, Pos] = {}
-            for item in positions:
-                p = item.get("player", {})
-                sid = p.get("steamid64")
-                if not sid:
-                    continue
-                uid = self.steam_to_discord.get(sid)
-                if not uid:
-                    continue
-                # Only track users who are in the guild (may not be in voice yet)
-                member = self.guild.get_member(uid)
-                if not member:
-                    continue
-                if not (member.voice and member.voice.channel):
-                    # Not in voice; clustering won't move them. Skip but log at low frequency is excessive; keep quiet here.
-                    continue
-                pos = item.get("pos") or {}
-                pts[uid] = Pos(float(pos.get("x", 0)), float(pos.get("y", 0)), float(pos.get("z", 0)))
-
-            if not pts:
-                # Nothing to do because no mapped users currently in voice
-                return
-
-            clusters = cluster_positions(pts, self.prox_radius, self.max_clusters)
-            if not clusters:
-                return
-
-            # Ensure enough cluster channels exist (requires Manage Channels)
-            if not self._can_manage_channels:
-                if not self._perm_warned:
-                    print("[ProxBot] Missing 'Manage Channels' permission; clustering disabled.")
-                    self._perm_warned = True
-                return
+            return {"linked": True}
+        except Exception as e:
+            link_log.error(f"Exception handling link_attempt: {e}")
+            return {"linked": False, "reason": "exception"}
+
+    async def route_event(self, ev: dict) -> Optional[dict]:
+        # Not "dispatch": discord.Client.dispatch delivers gateway events
+        return await route_event(self.tenants, ev, self.handle_link)
+
+
+def _install_sighup() -> None:
+    # SIGHUP triggers a settings reload (not available on Windows; use /reloadconfig there)
+    try:
+        import signal
+
+        def _on_sighup():
             try:
-                print(f"[ProxBot] Ensuring {len(clusters)} cluster channels with prefix '{self.cluster_prefix}'")
-                # Prefer static channels if configured
-                static_ids = get_settings().PROX_CLUSTER_STATIC_IDS
-                channels = None
-                if static_ids:
-                    ids = [int(x.strip()) for x in static_ids.split(",") if x.strip().isdigit()]
-                    chans = []
-                    for cid in ids[:len(clusters)]:
-                        ch = self.guild.get_channel(cid)
-                        if ch and isinstance(ch, discord.VoiceChannel):
-                            chans.append(ch)
-                    if len(chans) >= 1:
-                        channels = chans
-                        print(f"[ProxBot] Using static cluster channels: {[c.name for c in chans]}")
-                if channels is None:
-                    channels = await ensure_cluster_channels(self.guild, self.cluster_prefix, self.cluster_category_id, len(clusters))
+                reload_settings()
             except Exception as e:
-                if not self._perm_warned:
-                    print(f"[ProxBot] Could not create/ensure cluster channels: {e}")
-                    self._perm_warned = True
-                return
-
-            # Build reverse lookup: user -> cluster_index
-            user_to_cluster: Dict[int, int] = {}
-            for idx, members in enumerate(clusters):
-                for uid in members:
-                    user_to_cluster[uid] = idx
-
-            # Hysteresis and throttling
-            now = time.time()
-            # Allow faster moves when configured for static clusters
-            if get_settings().PROX_FAST_MOVE_ON_CHANGE:
-                stability_needed = 1
-            else:
-                stability_needed = get_settings().PROX_STABILITY_BATCHES
-            min_interval = get_settings().PROX_MIN_MOVE_INTERVAL_SEC
-            cluster_cooldown = get_settings().PROX_CLUSTER_COOLDOWN_SEC
-
-            # Move users that stabilized into a cluster and passed min interval
-            for uid, cidx in user_to_cluster.items():
-                # Only move users who are currently in Living or a cluster channel
-                # This prevents moving spectators or users in unrelated channels
-                member = self.guild.get_member(uid)
-                if not member or not member.voice or not member.voice.channel:
-                    continue
-                current_channel_id = member.voice.channel.id
-                # Build list of valid "moveable" channel IDs (Living + all cluster channels)
-                valid_channel_ids = {self.living_channel}
-                for ch in channels:
-                    valid_channel_ids.add(ch.id)
-                if current_channel_id not in valid_channel_ids:
-                    # User is in Dead, AFK, or some other channel; don't move them
-                    continue
-                
-                prev = self._last_cluster.get(uid)
-                if prev == cidx:
-                    self._stable_count[uid] = self._stable_count.get(uid, 0) + 1
-                else:
-                    self._last_cluster[uid] = cidx
-                    self._stable_count[uid] = 1
-                
-                # Check per-user cooldown
-                last_move = self._last_move_ts.get(uid, 0.0)
-                if (now - last_move) < min_interval:
-                    continue
-                
-                # Check per-cluster cooldown to avoid rapid reassignments to the same cluster
-                last_cluster_move = self._last_cluster_move_ts.get(cidx, 0.0)
-                if (now - last_cluster_move) < cluster_cooldown:
-                    continue
-                
-                # Check stability threshold
-                if self._stable_count[uid] >= stability_needed:
-                    if cidx < len(channels):
-                        if not self._can_move_members:
-                            if not self._perm_warned:
-                                print("[ProxBot] Missing 'Move Members' permission; cannot move users between channels.")
-                                self._perm_warned = True
-                            continue
-                        print(f"[ProxBot] Moving uid={uid} to {channels[cidx].name}")
-                        await ensure_in_channel(self.guild, uid, channels[cidx].id)
-                        self._last_move_ts[uid] = now
-                        self._last_cluster_move_ts[cidx] = now
-        else:
-            # Unknown event type ignored
-            pass
+                config_log.error(f"Reload failed; keeping previous settings: {e}")
+
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _on_sighup)
+    except (ImportError, AttributeError, NotImplementedError, RuntimeError):
+        pass
+
+
+async def run_ingress(settings: Settings):
+    """PROX_MODE=ingress: HTTP listener and clustering only; moves run in the actuator process."""
+    addr = settings.PROX_ACTUATOR_ADDR or default_address()
+    # Filled from the actuator's snapshot; the actuator owns the mapping file and link codes
+    mapping: Dict[str, int] = {}
+    tenants = build_tenants(load_tenants(settings.TENANTS_FILE, settings), settings, mapping)
+    link = ActuatorLink(addr, tenants, mapping, lambda: get_settings().BRIDGE_SECRET)
+
+    def _apply(s: Settings) -> None:
+        for tenant in tenants.values():
+            tenant.apply_settings(s)
+
+    on_settings_reload(_apply)
+
+    async def handle_link(ev: dict) -> dict:
+        result = await link.request({"op": "link", "event": ev})
+        return result if isinstance(result, dict) else {"linked": False, "reason": "actuator_unavailable"}
+
+    async def dispatch(ev: dict) -> Optional[dict]:
+        return await route_event(tenants, ev, handle_link)
+
+    recorder = EventRecorder(settings.PROX_RECORD_FILE) if settings.PROX_RECORD_FILE else None
+    app = create_app(lambda: get_settings().BRIDGE_SECRET, dispatch, recorder.record if recorder else None)
+    _install_sighup()
+    log.info(f"Ingress mode: {len(tenants)} tenant(s), actuator at {addr}")
+    await asyncio.gather(link.run(), run_server(settings.BRIDGE_HOST, settings.BRIDGE_PORT, app))
 
 
 async def main():
     settings = get_settings()
+    # Log lines are written by a background thread from here on
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_SAMPLE_SEC)
+    on_settings_reload(lambda s: setup_logging(s.LOG_LEVEL, s.LOG_FORMAT, s.LOG_SAMPLE_SEC))
+    mode = settings.PROX_MODE
+    if mode not in ("all", "ingress", "actuator"):
+        log.error(f"PROX_MODE must be all, ingress or actuator (got {mode!r})")
+        raise SystemExit(1)
+    if mode == "ingress":
+        # No Discord login in this process
+        await run_ingress(settings)
+        return
     # Validate and log a redacted snapshot of the token to help diagnose 401/Improper token
     def _mask(tok: str) -> str:
         t = tok.strip()
@@ -534,35 +461,42 @@ async def main():
 
     tok = (settings.DISCORD_TOKEN or "").strip()
     if tok.startswith("Bot "):
-        print("[ProxBot] ERROR: DISCORD_TOKEN should NOT include the 'Bot ' prefix. Provide only the raw token string.")
-        print(f"[ProxBot] Token snapshot: {_mask(tok)}")
+        log.error("DISCORD_TOKEN should NOT include the 'Bot ' prefix. Provide only the raw token string.")
+        log.error(f"Token snapshot: {_mask(tok)}")
         raise SystemExit(1)
     if len(tok) < 50:
         # Discord bot tokens are typically long; a very short value usually means misconfigured env
-        print("[ProxBot] ERROR: DISCORD_TOKEN looks too short. Double-check your environment or .env under systemd.")
-        print(f"[ProxBot] Token snapshot: {_mask(tok)}")
+        log.error("DISCORD_TOKEN looks too short. Double-check your environment or .env under systemd.")
+        log.error(f"Token snapshot: {_mask(tok)}")
         raise SystemExit(1)
-    bot = ProxBot(
-        settings.GUILD_ID,
-        settings.LIVING_CHANNEL_ID,
-        settings.DEAD_CHANNEL_ID,
-        settings.PROX_RADIUS,
-        settings.PROX_MAX_CLUSTERS,
-        settings.PROX_CHANNEL_PREFIX,
-        settings.PROX_CATEGORY_ID,
-    )
-    bot.load_mapping(settings.MAPPING_FILE)
-
-    app = create_app(settings.BRIDGE_SECRET, bot.handle_event)
+    # One bot login and one HTTP listener drive every configured GMod server
+    bot = ProxBot(load_tenants(settings.TENANTS_FILE, settings))
+    bot.load_mapping(settings.MAPPING_FILE, settings.MAPPING_DB)
+
+    _install_sighup()
 
     # run discord client and http server concurrently
     async def run_bot():
         try:
             await bot.start(settings.DISCORD_TOKEN)
         except discord.errors.LoginFailure:
-            print("[ProxBot] Login failed: Improper token passed. Verify DISCORD_TOKEN under your service environment (no quotes, no 'Bot ' prefix, up-to-date token).")
+            log.error("Login failed: Improper token passed. Verify DISCORD_TOKEN under your service environment (no quotes, no 'Bot ' prefix, up-to-date token).")
             raise
 
+    if mode == "actuator":
+        # Discord only; events arrive as intents from the ingress process
+        bot.actuator_server = ActuatorServer(settings.PROX_ACTUATOR_ADDR or default_address(), bot,
+                                             lambda: get_settings().BRIDGE_SECRET)
+        tasks = [run_bot(), bot.actuator_server.serve()]
+        if settings.PROX_ACTUATOR_METRICS_PORT:
+            tasks.append(run_server(settings.BRIDGE_HOST, settings.PROX_ACTUATOR_METRICS_PORT, create_metrics_app()))
+        await asyncio.gather(*tasks)
+        return
+
+    # Read the secret through the shared snapshot so a reload can rotate it
+    recorder = EventRecorder(settings.PROX_RECORD_FILE) if settings.PROX_RECORD_FILE else None
+    app = create_app(lambda: get_settings().BRIDGE_SECRET, bot.route_event, recorder.record if recorder else None)
+
     async def run_http():
         await run_server(settings.BRIDGE_HOST, settings.BRIDGE_PORT, app)
 
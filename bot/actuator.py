@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import itertools
+import json
+import os
+import socket
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from .dispatcher import MoveIntent, PRIORITY_CLUSTER
+from .log import get_logger
+
+if TYPE_CHECKING:
+    from .tenant import Tenant
+
+log = get_logger("Actuator")
+
+
+# Protocol between PROX_MODE=ingress and PROX_MODE=actuator: one JSON object per line.
+#   ingress -> actuator: hello (first line, carries BRIDGE_SECRET), then move, cancel, channels,
+#                        cleanup, link (requests carry "id")
+#   actuator -> ingress: result (echoes "id"), tenant (ready/perms/voice snapshot), voice, mapping, link
+# A snapshot carries the whole SteamID mapping, so allow long lines
+MAX_LINE_BYTES = 16 * 1024 * 1024
+# A peer that lets this much unread output pile up is dropped (it reconnects and gets a fresh snapshot)
+MAX_PENDING_BYTES = 4 * MAX_LINE_BYTES
+# Seconds a new connection has to send its hello
+HANDSHAKE_TIMEOUT = 5.0
+
+
+def default_address() -> str:
+    """Unix socket where available, loopback TCP otherwise (Windows)."""
+    if hasattr(socket, "AF_UNIX"):
+        return "unix:/tmp/proxchat-actuator.sock"
+    return "tcp:127.0.0.1:8086"
+
+
+def parse_address(addr: str) -> Tuple[str, str, int]:
+    """"unix:/path" -> ("unix", path, 0); "tcp:host:port" -> ("tcp", host, port)."""
+    kind, _, rest = addr.partition(":")
+    if kind == "unix" and rest:
+        return "unix", rest, 0
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        if port.isdigit():
+            return "tcp", host or "127.0.0.1", int(port)
+    raise ValueError(f"Invalid actuator address {addr!r}; use unix:/path/to.sock or tcp:host:port")
+
+
+async def open_connection(addr: str):
+    kind, where, port = parse_address(addr)
+    if kind == "unix":
+        return await asyncio.open_unix_connection(where, limit=MAX_LINE_BYTES)
+    return await asyncio.open_connection(where, port, limit=MAX_LINE_BYTES)
+
+
+async def start_server(addr: str, cb):
+    kind, where, port = parse_address(addr)
+    if kind == "unix":
+        # Leftover socket file from a previous run
+        try:
+            os.unlink(where)
+        except FileNotFoundError:
+            pass
+        return await asyncio.start_unix_server(cb, where, limit=MAX_LINE_BYTES)
+    return await asyncio.start_server(cb, where, port, limit=MAX_LINE_BYTES)
+
+
+def encode(msg: dict) -> bytes:
+    return json.dumps(msg, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def write(writer: asyncio.StreamWriter, data: bytes) -> bool:
+    """Buffer data for the peer; closes the connection instead when the peer has stopped reading."""
+    if writer.is_closing():
+        return False
+    if writer.transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+        log.warning("Peer is not reading; dropping connection", key="slow-peer", sample=True)
+        writer.close()
+        return False
+    writer.write(data)
+    return True
+
+
+class RemoteDispatcher:
+    """MoveDispatcher stand-in for the ingress process; intents execute in the actuator process.
+
+    Futures resolve with the actuator's result, or None if the link drops first.
+    """
+
+    def __init__(self, link: "ActuatorLink", server_id: str):
+        self._link = link
+        self.server_id = server_id
+        # Informational only; the actuator applies its own PROX_MOVE_CONCURRENCY
+        self.concurrency = 1
+
+    @property
+    def depth(self) -> int:
+        return self._link.depth
+
+    def submit(self, intent: MoveIntent) -> asyncio.Future:
+        return self._link.request({
+            "op": "move",
+            "server_id": self.server_id,
+            "user_id": intent.user_id,
+            "channel_id": intent.channel_id,
+            "priority": intent.priority,
+            "mute": intent.mute,
+            "deafen": intent.deafen,
+        })
+
+    def cancel(self, min_priority: int = PRIORITY_CLUSTER) -> int:
+        self._link.send({"op": "cancel", "server_id": self.server_id, "min_priority": min_priority})
+        return 0
+
+
+class ActuatorLink:
+    """Ingress side of the actuator connection. Sends move intents and channel requests, and
+    applies voice, mapping and tenant-state updates pushed by the actuator. Reconnects forever,
+    so either process can restart on its own."""
+
+    def __init__(self, addr: str, tenants: Dict[str, "Tenant"], mapping: Dict[str, int],
+                 secret: Union[str, Callable[[], str]]):
+        self.addr = addr
+        # A callable follows settings reloads
+        self._secret = secret if callable(secret) else (lambda: secret)
+        self.tenants = tenants
+        self.mapping = mapping
+        self._ids = itertools.count(1)
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._ready: Set[str] = set()  # server ids whose guild the actuator has resolved
+        for tenant in tenants.values():
+            tenant.remote = self
+            tenant.dispatcher = RemoteDispatcher(self, tenant.server_id)  # type: ignore[assignment]
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    @property
+    def depth(self) -> int:
+        return len(self._waiting)
+
+    def is_ready(self, server_id: str) -> bool:
+        return self.connected and server_id in self._ready
+
+    def send(self, msg: dict) -> bool:
+        if self._writer is None:
+            return False
+        return write(self._writer, encode(msg))
+
+    def request(self, msg: dict) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        if self._writer is None:
+            fut.set_result(None)
+            return fut
+        rid = next(self._ids)
+        self._waiting[rid] = fut
+        self.send({**msg, "id": rid})
+        return fut
+
+    async def run(self) -> None:
+        while True:
+            try:
+                reader, writer = await open_connection(self.addr)
+            except OSError as e:
+                log.warning(f"Cannot reach actuator at {self.addr}: {e}; retrying", key="unreachable", sample=30.0)
+                await asyncio.sleep(2)
+                continue
+            writer.write(encode({"op": "hello", "secret": self._secret()}))
+            self._writer = writer
+            log.info(f"Connected to actuator at {self.addr}")
+            try:
+                await writer.drain()
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    try:
+                        self._handle(json.loads(line))
+                    except Exception as e:
+                        log.warning(f"Bad message from actuator: {e}")
+            except (ConnectionError, ValueError) as e:
+                log.warning(f"Connection error: {e}")
+            finally:
+                self._writer = None
+                self._ready.clear()
+                waiting, self._waiting = self._waiting, {}
+                for fut in waiting.values():
+                    if not fut.done():
+                        fut.set_result(None)
+                writer.close()
+            log.warning("Lost connection to actuator; reconnecting")
+            await asyncio.sleep(1)
+
+    def _handle(self, msg: dict) -> None:
+        op = msg.get("op")
+        if op == "result":
+            fut = self._waiting.pop(msg.get("id"), None)
+            if fut is not None and not fut.done():
+                fut.set_result(msg.get("value"))
+        elif op == "voice":
+            cid = msg.get("channel_id")
+            for tenant in self.tenants.values():
+                if tenant.guild_id == msg.get("guild_id"):
+                    tenant.voice.update(int(msg["user_id"]), int(cid) if cid is not None else None)
+        elif op == "mapping":
+            self.mapping.clear()
+            self.mapping.update({str(k): int(v) for k, v in (msg.get("mapping") or {}).items()})
+            for tenant in self.tenants.values():
+                tenant.voice.set_linked(self.mapping.values())
+        elif op == "link":
+            uid = int(msg["user_id"])
+            prev = self.mapping.get(str(msg["steamid"]))
+            self.mapping[str(msg["steamid"])] = uid
+            stale = prev is not None and prev != uid and prev not in self.mapping.values()
+            for tenant in self.tenants.values():
+                tenant.voice.link(uid)
+                if stale:
+                    tenant.voice.unlink(prev)
+        elif op == "tenant":
+            tenant = self.tenants.get(msg.get("server_id"))
+            if tenant is None:
+                return
+            perms = msg.get("perms") or {}
+            tenant._can_manage_channels = bool(perms.get("manage_channels"))
+            tenant._can_move_members = bool(perms.get("move_members"))
+            tenant._can_mute_members = bool(perms.get("mute_members"))
+            if "clusters" in msg:
+                tenant.remote_cluster_ids = {int(cid) for cid in msg["clusters"]}
+            if "voice" in msg:
+                tenant.voice.reset((int(uid), int(cid)) for uid, cid in msg["voice"])
+                tenant.voice.set_linked(self.mapping.values())
+            if msg.get("ready"):
+                self._ready.add(tenant.server_id)
+            else:
+                self._ready.discard(tenant.server_id)
+
+
+class ActuatorServer:
+    """Actuator side: runs move intents and channel requests from ingress processes against the
+    local discord.Client's tenants, and pushes voice, mapping and tenant state back."""
+
+    def __init__(self, addr: str, bot, secret: Union[str, Callable[[], str]]):
+        self.addr = addr
+        self.bot = bot
+        self._secret = secret if callable(secret) else (lambda: secret)
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    def tenant_state(self, tenant: "Tenant", *, voice: bool = False) -> dict:
+        msg = {
+            "op": "tenant",
+            "server_id": tenant.server_id,
+            "ready": tenant._guild is not None,
+            "perms": {
+                "manage_channels": tenant._can_manage_channels,
+                "move_members": tenant._can_move_members,
+                "mute_members": tenant._can_mute_members,
+            },
+            # Lets ingress scope reset waves to this tenant's channels
+            "clusters": sorted(tenant.pool.channel_ids()),
+        }
+        if voice:
+            msg["voice"] = tenant.voice.states()
+        return msg
+
+    def snapshot(self) -> List[dict]:
+        msgs = [{"op": "mapping", "mapping": dict(self.bot.steam_to_discord)}]
+        msgs.extend(self.tenant_state(t, voice=True) for t in self.bot.tenants.values())
+        return msgs
+
+    def broadcast(self, msg: dict) -> None:
+        data = encode(msg)
+        for writer in list(self._writers):
+            try:
+                ok = write(writer, data)
+            except Exception:
+                ok = False
+            if not ok:
+                self._writers.discard(writer)
+
+    async def serve(self) -> None:
+        server = await start_server(self.addr, self._on_client)
+        log.info(f"Listening for ingress connections on {self.addr}")
+        async with server:
+            await server.serve_forever()
+
+    async def _authenticate(self, reader: asyncio.StreamReader) -> bool:
+        try:
+            line = await asyncio.wait_for(reader.readline(), HANDSHAKE_TIMEOUT)
+            hello = json.loads(line)
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            return False
+        if not isinstance(hello, dict) or hello.get("op") != "hello":
+            return False
+        return hmac.compare_digest(str(hello.get("secret") or "").encode(), self._secret().encode())
+
+    async def _on_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if not await self._authenticate(reader):
+            # Nothing (snapshot included) goes out before the secret checks out
+            log.warning("Rejected ingress connection: missing or wrong BRIDGE_SECRET", sample=True)
+            writer.close()
+            return
+        log.info("Ingress connected")
+        try:
+            for msg in self.snapshot():
+                writer.write(encode(msg))
+            await writer.drain()
+        except ConnectionError:
+            writer.close()
+            log.info("Ingress disconnected")
+            return
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                except ValueError as e:
+                    log.warning(f"Bad message from ingress: {e}")
+                    continue
+                # Submit happens before the task's first await, so per-user order is kept
+                asyncio.create_task(self._handle(msg, writer))
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+            log.info("Ingress disconnected")
+
+    async def _handle(self, msg: dict, writer: asyncio.StreamWriter) -> None:
+        op = msg.get("op")
+        value = None
+        tenant = self.bot.tenants.get(msg.get("server_id"))
+        try:
+            if op == "link":
+                value = await self.bot.handle_link(msg.get("event") or {})
+            elif tenant is None:
+                log.warning(f"Request '{op}' for unknown server_id {msg.get('server_id')!r}")
+            else:
+                before = self.tenant_state(tenant)
+                tenant.refresh_perms()
+                if op == "move":
+                    value = await tenant.dispatcher.submit(MoveIntent(
+                        int(msg["user_id"]),
+                        int(msg["channel_id"]) if msg.get("channel_id") is not None else None,
+                        int(msg.get("priority", PRIORITY_CLUSTER)),
+                        mute=msg.get("mute"),
+                        deafen=msg.get("deafen"),
+                    ))
+                elif op == "cancel":
+                    value = tenant.dispatcher.cancel(int(msg.get("min_priority", PRIORITY_CLUSTER)))
+                elif op == "channels":
+                    value = [list(c) for c in await tenant.resolve_cluster_channels(int(msg["count"]))]
+                elif op == "cleanup":
+                    value = await tenant._cleanup_clusters()
+                after = self.tenant_state(tenant)
+                if after != before:
+                    self.broadcast(after)
+        except Exception as e:
+            log.error(f"Error handling '{op}': {e}")
+        if "id" in msg:
+            try:
+                if write(writer, encode({"op": "result", "id": msg["id"], "value": value})):
+                    await writer.drain()
+            except Exception:
+                pass
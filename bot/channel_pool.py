@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import discord
+
+from .log import get_logger
+from .proximity import _create_channel
+
+
+# Lifecycle of a pooled cluster channel
+CREATING = "creating"
+READY = "ready"
+DRAINING = "draining"  # surplus and empty; deleted after drain_sec unless demand returns
+DELETING = "deleting"
+STATES = (CREATING, READY, DRAINING, DELETING)
+
+
+class PooledChannel:
+    __slots__ = ("index", "name", "channel_id", "state", "since")
+
+    def __init__(self, index: int, name: str, channel_id: Optional[int], state: str):
+        self.index = index
+        self.name = name
+        self.channel_id = channel_id
+        self.state = state
+        self.since = time.monotonic()
+
+
+class ChannelPool:
+    """Per-tenant set of "{prefix}-N" cluster voice channels, indexed by N.
+
+    acquire(n) answers from memory in O(n): the first n usable channels by index, checked
+    against the guild cache only. Creation and deletion run as background tasks. A
+    maintenance pass, at most once per second and only when the pool is off target, keeps
+    `spare` channels beyond recent demand. Recent demand is the peak n over the last drain_sec.
+    Surplus empty channels drain for drain_sec before they are deleted, and are reused
+    if demand comes back first. Static channel ids (PROX_CLUSTER_STATIC_IDS) are resolved
+    once per attach or settings change.
+    """
+
+    def __init__(self, name: str, *, prefix: str = "Cluster", category_id: Optional[int] = None,
+                 static_ids: Optional[str] = None, max_channels: int = 10, spare: int = 2,
+                 drain_sec: float = 30.0, retry_sec: float = 15.0):
+        self.name = name
+        self.log = get_logger(f"Pool:{name}")
+        self.prefix = prefix
+        self.category_id = category_id
+        self.static_ids = static_ids
+        self.max_channels = max_channels
+        self.spare = max(0, spare)
+        self.drain_sec = drain_sec
+        self.retry_sec = retry_sec
+        self._guild: Optional[discord.Guild] = None
+        self._slots: Dict[int, PooledChannel] = {}
+        # Indexes of READY/DRAINING slots in ascending order; rebuilt on state changes only
+        self._usable: List[int] = []
+        self._static: Optional[List[Tuple[int, str]]] = None
+        self._peak = 0
+        self._peak_ts = 0.0
+        self._last_attempt: Dict[int, float] = {}
+        self._last_maintain = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+
+    def configure(self, *, prefix: str, category_id: Optional[int], static_ids: Optional[str],
+                  max_channels: int, spare: int, drain_sec: float) -> None:
+        resync = (prefix, category_id, static_ids) != (self.prefix, self.category_id, self.static_ids)
+        self.prefix = prefix
+        self.category_id = category_id
+        self.static_ids = static_ids
+        self.max_channels = max_channels
+        self.spare = max(0, spare)
+        self.drain_sec = drain_sec
+        if resync and self._guild is not None:
+            self.attach(self._guild)
+
+    def attach(self, guild: discord.Guild) -> None:
+        """Adopt existing prefix channels and resolve static ids (one scan of the guild cache)."""
+        self._guild = guild
+        self._slots = {i: s for i, s in self._slots.items() if s.state in (CREATING, DELETING)}
+        self._sync()
+        self._static = None
+        if self.static_ids:
+            chans = []
+            for part in self.static_ids.split(","):
+                if part.strip().isdigit():
+                    ch = guild.get_channel(int(part.strip()))
+                    if ch and isinstance(ch, discord.VoiceChannel):
+                        chans.append((ch.id, ch.name))
+            if chans:
+                self._static = chans
+                self.log.info(f"Using static cluster channels: {[n for _, n in chans]}")
+            else:
+                self.log.warning("None of PROX_CLUSTER_STATIC_IDS resolved; using dynamic channels")
+
+    def _index_of(self, name: str) -> int:
+        if not name.startswith(self.prefix + "-"):
+            return 0
+        part = name[len(self.prefix) + 1:]
+        return int(part) if part.isdigit() else 0
+
+    def _sync(self) -> None:
+        """Register prefix channels present in the guild cache that the pool doesn't know yet."""
+        guild = self._guild
+        if guild is None:
+            return
+        known = {s.channel_id for s in self._slots.values()}
+        for ch in guild.voice_channels:
+            idx = self._index_of(ch.name)
+            if idx <= 0 or ch.id in known or idx in self._slots:
+                continue
+            self._slots[idx] = PooledChannel(idx, ch.name, ch.id, READY)
+        self._reindex()
+
+    def _reindex(self) -> None:
+        self._usable = sorted(i for i, s in self._slots.items() if s.state in (READY, DRAINING))
+
+    def channel_ids(self) -> Set[int]:
+        """Ids of every channel the pool manages (static ones, or all created/adopted)."""
+        if self._static is not None:
+            return {cid for cid, _ in self._static}
+        return {s.channel_id for s in self._slots.values() if s.channel_id is not None}
+
+    def counts(self) -> Dict[str, int]:
+        out = {state: 0 for state in STATES}
+        for s in self._slots.values():
+            out[s.state] += 1
+        return out
+
+    def acquire(self, n: int) -> List[Tuple[int, str]]:
+        """(id, name) of up to n channels, lowest index first. No Discord calls; may return fewer
+        while channels are still being created."""
+        if self._static is not None:
+            return self._static[:n]
+        guild = self._guild
+        if guild is None:
+            return []
+        now = time.monotonic()
+        if n >= self._peak or now - self._peak_ts >= self.drain_sec:
+            self._peak, self._peak_ts = n, now
+        out: List[Tuple[int, str]] = []
+        stale = False
+        for idx in self._usable:
+            if len(out) >= n:
+                break
+            slot = self._slots[idx]
+            if guild.get_channel(slot.channel_id) is None:  # type: ignore[arg-type]
+                # Deleted behind our back; recreated by maintenance
+                del self._slots[idx]
+                stale = True
+                continue
+            if slot.state == DRAINING:
+                slot.state, slot.since = READY, now
+            out.append((slot.channel_id, slot.name))  # type: ignore[arg-type]
+        if stale:
+            self._reindex()
+        if now - self._last_maintain >= 1.0 and self._off_target():
+            self._maintain()
+        return out
+
+    def _target(self) -> int:
+        return min(self._peak, max(1, self.max_channels)) + self.spare
+
+    def _off_target(self) -> bool:
+        # Occupied channels above target are pinned until they empty, so they don't count
+        target = self._target()
+        slots = self._slots
+        if any(i not in slots for i in range(1, target + 1)):
+            return True
+        return any(s.state == DRAINING or (idx > target and s.state == READY and self._is_empty(s))
+                   for idx, s in slots.items())
+
+    def warm(self, n: int = 0) -> None:
+        """Create channels ahead of demand now: at least n, plus spares (e.g. on attach or /seedclusters)."""
+        if self._static is None and self._guild is not None:
+            self._maintain(at_least=n)
+
+    def _maintain(self, at_least: int = 0) -> None:
+        """One pass: start creates for missing indexes, drain surplus, delete drained. Only
+        schedules tasks; never awaits Discord."""
+        guild = self._guild
+        if guild is None:
+            return
+        now = time.monotonic()
+        self._last_maintain = now
+        target = max(self._target(), at_least)
+        missing = [i for i in range(1, target + 1) if i not in self._slots]
+        if missing:
+            # Someone may have created (or restored) channels since the last scan
+            self._sync()
+            missing = [i for i in missing if i not in self._slots]
+        for idx in missing:
+            if now - self._last_attempt.get(idx, -self.retry_sec) < self.retry_sec:
+                continue
+            self._last_attempt[idx] = now
+            slot = self._slots[idx] = PooledChannel(idx, f"{self.prefix}-{idx}", None, CREATING)
+            self._spawn(self._create(slot))
+        for idx, slot in list(self._slots.items()):
+            if slot.state in (READY, DRAINING) and guild.get_channel(slot.channel_id) is None:  # type: ignore[arg-type]
+                del self._slots[idx]
+            elif slot.state == DRAINING and idx <= target:
+                slot.state, slot.since = READY, now
+            elif slot.state == READY and idx > target and self._is_empty(slot):
+                slot.state, slot.since = DRAINING, now
+            elif slot.state == DRAINING and now - slot.since >= self.drain_sec:
+                if self._is_empty(slot):
+                    self._spawn(self._delete(slot))
+                else:
+                    slot.state, slot.since = READY, now
+        self._reindex()
+
+    def _is_empty(self, slot: PooledChannel) -> bool:
+        ch = self._guild.get_channel(slot.channel_id) if self._guild is not None else None  # type: ignore[arg-type]
+        if ch is None:
+            return True
+        # Only delete channels in our category when one is configured
+        if self.category_id is not None and getattr(ch, "category_id", None) != self.category_id:
+            return False
+        return len(ch.members) == 0  # type: ignore[union-attr]
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _create(self, slot: PooledChannel) -> None:
+        ch = None
+        try:
+            ch = await _create_channel(self._guild, slot.name, category_id=self.category_id)
+        except Exception as e:
+            self.log.warning(f"Create '{slot.name}' failed: {type(e).__name__}: {e}")
+        if self._slots.get(slot.index) is not slot:
+            return  # pool was resynced meanwhile
+        if ch is None:
+            # Retried by a later maintenance pass after retry_sec
+            del self._slots[slot.index]
+        else:
+            slot.channel_id, slot.state, slot.since = ch.id, READY, time.monotonic()
+        self._reindex()
+
+    async def _delete(self, slot: PooledChannel) -> bool:
+        slot.state, slot.since = DELETING, time.monotonic()
+        self._reindex()
+        ch = self._guild.get_channel(slot.channel_id) if self._guild is not None else None  # type: ignore[arg-type]
+        ok = True
+        if ch is not None:
+            try:
+                await ch.delete(reason="ProxChat pool: surplus cluster channel")
+                self.log.info(f"Deleted surplus cluster channel '{slot.name}'")
+            except Exception as e:
+                ok = False
+                self.log.warning(f"Failed to delete '{slot.name}': {type(e).__name__}: {e}")
+        if self._slots.get(slot.index) is slot:
+            if ok:
+                del self._slots[slot.index]
+            else:
+                slot.state, slot.since = READY, time.monotonic()
+            self._reindex()
+        return ok
+
+    async def release(self, keep: Optional[int] = None) -> int:
+        """Round end: forget demand and delete empty channels beyond the first `keep` (default: the
+        spares) now, without draining. Returns how many were deleted."""
+        if self._static is not None or self._guild is None:
+            return 0
+        self._peak, self._peak_ts = 0, 0.0
+        target = self.spare if keep is None else max(0, keep)
+        doomed = [s for idx, s in self._slots.items()
+                  if idx > target and s.state in (READY, DRAINING) and self._is_empty(s)]
+        results = await asyncio.gather(*(self._delete(s) for s in doomed))
+        return sum(1 for ok in results if ok)
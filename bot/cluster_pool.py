@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+from .proximity import Pos, cluster_coords_numpy, get_clusterer, np
+from .log import get_logger
+
+log = get_logger("ProxBot")
+
+
+# Shared segment layout: n × int64 user ids, then n × (x, y, z) float64
+_UID = struct.Struct("<q")
+_COORD = struct.Struct("<ddd")
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # The parent owns and unlinks the segment. Pool workers share the parent's resource
+    # tracker, where re-registering an existing name is a no-op, so no unregister here.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _cluster_shared(name: str, n: int, radius: float, max_clusters: int, backend: str) -> List[List[int]]:
+    """Worker entry point: cluster the n positions stored in shared segment `name`."""
+    shm = _attach(name)
+    try:
+        buf = shm.buf
+        uids = buf[: n * _UID.size].cast("q").tolist()
+        coords_mv = buf[n * _UID.size : n * (_UID.size + _COORD.size)].cast("d")
+        try:
+            if backend.strip().lower() == "numpy" and np is not None:
+                # Read coordinates in place; only the id list is copied out of the segment
+                coords = np.frombuffer(coords_mv, dtype=np.float64).reshape(n, 3)
+                try:
+                    return cluster_coords_numpy(uids, coords, radius, max_clusters)
+                finally:
+                    del coords
+            xs = coords_mv.tolist()
+            pts = {uid: Pos(xs[3 * i], xs[3 * i + 1], xs[3 * i + 2]) for i, uid in enumerate(uids)}
+            return get_clusterer(backend)(pts, radius, max_clusters)
+        finally:
+            coords_mv.release()
+    finally:
+        shm.close()
+
+
+class ClusterPool:
+    """Runs non-incremental clustering on a process pool for large batches.
+
+    Batches with fewer than `min_players` positions (or `workers` == 0) are clustered inline,
+    where IPC would cost more than it saves. Larger batches are written once into a
+    shared-memory segment and the worker reads them from there; the event loop only awaits
+    the future, and only the (small) cluster lists are pickled back.
+    """
+
+    def __init__(self, workers: int = 0, min_players: int = 64):
+        self.workers = max(0, workers)
+        self.min_players = min_players
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Counters for diagnostics
+        self.offloaded = 0
+        self.inline = 0
+
+    def configure(self, workers: int, min_players: int) -> None:
+        workers = max(0, workers)
+        if workers != self.workers:
+            self.close()
+            self.workers = workers
+        self.min_players = min_players
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: don't fork a process that is running an event loop and helper threads
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def cluster(self, points: Dict[int, Pos], radius: float, max_clusters: int, backend: str) -> List[List[int]]:
+        n = len(points)
+        if self.workers <= 0 or n < max(1, self.min_players):
+            self.inline += 1
+            return get_clusterer(backend)(points, radius, max_clusters)
+        uids = sorted(points)
+        shm = shared_memory.SharedMemory(create=True, size=n * (_UID.size + _COORD.size))
+        try:
+            id_bytes = array("q", uids).tobytes()
+            shm.buf[: len(id_bytes)] = id_bytes
+            coords = array("d")
+            for uid in uids:
+                p = points[uid]
+                coords.extend((p.x, p.y, p.z))
+            shm.buf[len(id_bytes) : len(id_bytes) + len(coords) * coords.itemsize] = coords.tobytes()
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(self._get_executor(), _cluster_shared, shm.name, n, radius, max_clusters, backend)
+            try:
+                clusters = await fut
+            except BrokenProcessPool as e:
+                # A worker died (e.g. OOM-killed); start a fresh pool next time and answer inline now
+                log.warning(f"Cluster pool broken ({e}); clustering inline")
+                self.close()
+                self.inline += 1
+                return get_clusterer(backend)(points, radius, max_clusters)
+            self.offloaded += 1
+            return clusters
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+_pool: Optional[ClusterPool] = None
+
+
+def get_cluster_pool(workers: int, min_players: int) -> ClusterPool:
+    """Process-wide pool shared by all tenants, reconfigured from the current settings."""
+    global _pool
+    if _pool is None:
+        _pool = ClusterPool(workers, min_players)
+    else:
+        _pool.configure(workers, min_players)
+    return _pool
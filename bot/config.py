@@ -1,11 +1,21 @@
 from __future__ import annotations
 
 import os
-from pydantic import BaseModel
-from dotenv import load_dotenv
+import time
+from typing import Callable, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+from dotenv import dotenv_values
+
+from .log import get_logger
+
+log = get_logger("Config")
 
 
 class Settings(BaseModel):
+    # Immutable snapshot; swap the whole object via reload_settings() instead of mutating
+    model_config = ConfigDict(frozen=True)
+
     DISCORD_TOKEN: str
     GUILD_ID: int
     LIVING_CHANNEL_ID: int
@@ -16,12 +26,57 @@ class Settings(BaseModel):
     BRIDGE_SECRET: str
 
     MAPPING_FILE: str | None = None
+    # Optional: keep links in this SQLite database instead (one upsert per link, written off the
+    # event loop). MAPPING_FILE, if set, is imported on first start and no longer written.
+    MAPPING_DB: str | None = None
+    # /linksteam codes: lifetime, live codes per Discord user (a new one revokes the oldest) and
+    # total live codes (new codes are refused when full). Persisted in MAPPING_DB when set.
+    LINK_CODE_TTL_SEC: float = 300.0
+    LINK_CODES_PER_USER: int = 3
+    LINK_CODES_MAX: int = 10000
+    # Optional: append every authenticated event to this gzip JSON-lines log (see scripts/replay.py)
+    PROX_RECORD_FILE: str | None = None
+    # Process layout: "all" (single process), or split into "ingress" (HTTP + clustering) and
+    # "actuator" (Discord client) processes connected over PROX_ACTUATOR_ADDR
+    PROX_MODE: str = "all"
+    # unix:/path/to.sock or tcp:host:port (default: unix:/tmp/proxchat-actuator.sock, TCP on Windows)
+    PROX_ACTUATOR_ADDR: str | None = None
+    # Optional: serve /metrics from the actuator process on this port (Discord call latencies live there)
+    PROX_ACTUATOR_METRICS_PORT: int | None = None
+    # Optional JSON file listing extra GMod servers (tenants) driven by this process; see README
+    TENANTS_FILE: str | None = None
+    # Logging: level (DEBUG shows every batch and move), "text" or "json" lines, and the interval
+    # at which repetitive hot-path messages are sampled (suppressed repeats are counted)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"
+    LOG_SAMPLE_SEC: float = 5.0
 
     # Proximity behavior
     PROX_ENABLE_CLUSTERING: bool = True
     PROX_RADIUS: float = 800.0  # Source engine units (~800 ~= ~66 ft)
     PROX_MAX_CLUSTERS: int = 10
     PROX_CHANNEL_PREFIX: str = "Cluster"
+    # Clustering engine: "grid" (pure Python spatial hash) or "numpy" (vectorized; needs numpy installed)
+    PROX_CLUSTER_BACKEND: str = "grid"
+    # Incremental clustering: keep last batch's state and only recompute players who moved
+    # more than PROX_INCREMENTAL_EPSILON units (or joined/left). Overrides PROX_CLUSTER_BACKEND.
+    PROX_CLUSTER_INCREMENTAL: bool = False
+    PROX_INCREMENTAL_EPSILON: float = 16.0
+    # Predictive clustering: cluster on where each player will be this many seconds ahead, from
+    # velocity estimated over recent batches (0 = off). Stopped players skip the stability wait.
+    PROX_PREDICT_HORIZON_SEC: float = 0.0
+    # Velocity smoothing (0..1, higher follows direction changes faster), speed clamp and the
+    # speed (units/s) below which a player counts as stopped
+    PROX_PREDICT_SMOOTHING: float = 0.5
+    PROX_PREDICT_MAX_SPEED: float = 600.0
+    PROX_PREDICT_STILL_SPEED: float = 40.0
+    # Optional JSON file of per-map zones (rooms with adjacency); on maps it covers, players
+    # are clustered by room connectivity instead of raw distance. See README.
+    PROX_ZONES_FILE: str | None = None
+    # Process-pool clustering: worker processes (0 = always inline) and the batch size below which
+    # clustering stays inline because IPC would cost more than it saves. Not used with incremental.
+    PROX_CLUSTER_WORKERS: int = 0
+    PROX_CLUSTER_POOL_MIN_PLAYERS: int = 64
     PROX_CATEGORY_ID: int | None = None  # Optional voice category to place cluster channels
     PROX_STABILITY_BATCHES: int = 3  # require N consecutive batches in same cluster before move
     PROX_MIN_MOVE_INTERVAL_SEC: float = 5.0  # per-user min interval between moves
@@ -29,6 +84,10 @@ class Settings(BaseModel):
     PROX_CLEANUP_CLUSTERS: bool = False
     # Optional: static list of cluster channel IDs (comma-separated) to use instead of dynamic creation
     PROX_CLUSTER_STATIC_IDS: str | None = None
+    # Channel pool: empty cluster channels kept ready beyond recent demand
+    PROX_SPARE_CHANNELS: int = 2
+    # Seconds a surplus empty cluster channel waits before deletion (reused if demand returns)
+    PROX_CHANNEL_DRAIN_SEC: float = 30.0
 
     # Death handling
     PROX_DEAD_MUTE: bool = True
@@ -42,10 +101,60 @@ class Settings(BaseModel):
     # Per-cluster cooldown: minimum time (seconds) before moving another user into the same cluster
     # to prevent rapid oscillation. Helps smooth movement in fast-move mode.
     PROX_CLUSTER_COOLDOWN_SEC: float = 1.5
+    # Move dispatcher: max concurrent Discord voice moves/edits
+    PROX_MOVE_CONCURRENCY: int = 4
+    # Rate-limit waits longer than this (seconds, discord.py minimum 30) raise instead of sleeping
+    # inside discord.py, so the dispatcher can pause and let death moves jump the queue. 0 means
+    # always sleep inside discord.py. Needs a restart.
+    PROX_MAX_RATELIMIT_WAIT_SEC: float | None = 30.0
+
+
+_current: Optional[Settings] = None
+_build_ms: float = 0.0
+_listeners: List[Callable[[Settings], None]] = []
+
+
+def load_settings() -> Settings:
+    """Build a fresh Settings from .env and the process environment (environment wins)."""
+    file_env = {k: v for k, v in dotenv_values().items() if v is not None}
+    env = {**file_env, **os.environ}
+    return Settings(**env)
 
 
 def get_settings() -> Settings:
-    # Load .env if present
-    load_dotenv(override=False)
-    env = {k: v for k, v in os.environ.items()}
-    return Settings(**env)
\ No newline at end of file
+    """Return the shared settings snapshot, building it on first use."""
+    global _current, _build_ms
+    if _current is None:
+        t0 = time.perf_counter()
+        _current = load_settings()
+        _build_ms = (time.perf_counter() - t0) * 1000.0
+        log.info(f"Settings loaded in {_build_ms:.2f} ms (previously paid on every get_settings() call)")
+    return _current
+
+
+def reload_settings() -> Settings:
+    """Rebuild settings and swap the shared snapshot. On validation errors the old snapshot stays."""
+    global _current, _build_ms
+    t0 = time.perf_counter()
+    new = load_settings()
+    _build_ms = (time.perf_counter() - t0) * 1000.0
+    old = _current
+    _current = new
+    changed = sorted(k for k in Settings.model_fields if old is None or getattr(old, k) != getattr(new, k))
+    # Never print secret values; names are enough
+    log.info(f"Settings reloaded in {_build_ms:.2f} ms; changed: {', '.join(changed) or '<none>'}")
+    for cb in list(_listeners):
+        try:
+            cb(new)
+        except Exception as e:
+            log.error(f"Reload listener error: {e}")
+    return new
+
+
+def on_settings_reload(cb: Callable[[Settings], None]) -> None:
+    _listeners.append(cb)
+
+
+def settings_stats() -> dict:
+    """Cost of the last settings build, i.e. what each get_settings() call used to pay."""
+    return {"build_ms": _build_ms}
\ No newline at end of file
@@ -1,69 +1,88 @@
 from __future__ import annotations
 
-import asyncio
-from typing import Iterable, Optional
+from typing import Optional
 
 import discord
 
+from .metrics import DISCORD_CALL_SECONDS
 
-async def ensure_in_channel(
+
+def is_rate_limited(e: BaseException) -> bool:
+    return isinstance(e, discord.RateLimited) or (isinstance(e, discord.HTTPException) and e.status == 429)
+
+
+def retry_after(e: BaseException, default: float = 1.0) -> float:
+    """Seconds to back off after a rate-limit error, from the exception or Retry-After header."""
+    ra = getattr(e, "retry_after", None)
+    if ra is None:
+        try:
+            ra = float(e.response.headers.get("Retry-After"))  # type: ignore[attr-defined]
+        except Exception:
+            ra = None
+    return float(ra) if ra and ra > 0 else default
+
+
+async def move_member(
     guild: discord.Guild,
     user_id: int,
-    channel_id: int,
+    channel_id: Optional[int],
     *,
     mute: Optional[bool] = None,
     deafen: Optional[bool] = None,
-) -> None:
+    fetch: bool = True,
+) -> bool:
+    """Move a connected member and apply mute/deafen. Returns True if everything was applied.
+
+    Rate-limit errors propagate so the caller (MoveDispatcher) can back off and retry.
+    A channel_id of None only applies the voice policy. The policy is still attempted when
+    the move itself is refused, so a missing Move Members permission doesn't block unmutes.
+    With fetch=False only the member cache is consulted (no REST fallback).
+    """
     try:
-        member = guild.get_member(user_id) or await guild.fetch_member(user_id)
-    except Exception:
-        return
+        member = guild.get_member(user_id)
+        if member is None and fetch:
+            member = await guild.fetch_member(user_id)
+    except Exception as e:
+        if is_rate_limited(e):
+            raise
+        return False
     # Can't force-connect users to voice; only move if already in a voice channel
     if not member or not member.voice or not member.voice.channel:
-        return
+        return False
+    voice = member.voice
+    # Only send what actually differs from the current server mute/deafen state
     kwargs = {}
-    if mute is not None:
+    if mute is not None and bool(voice.mute) != mute:
         kwargs["mute"] = mute
-    if deafen is not None:
+    if deafen is not None and bool(voice.deaf) != deafen:
         kwargs["deafen"] = deafen
-    try:
-        await member.move_to(guild.get_channel(channel_id), reason="ProxChat move")
-    except Exception as e:
-        # Missing permissions or hierarchy issue; ignore to avoid spam
-        return
-    if kwargs:
+    if channel_id is not None and voice.channel.id != channel_id:
+        channel = guild.get_channel(channel_id)
         try:
-            await member.edit(**kwargs, reason="ProxChat voice policy")
-        except Exception:
-            pass
-
-
-async def bulk_move(
-    guild: discord.Guild,
-    moves: Iterable[tuple[int, int]],
-) -> None:
-    # moves: [(user_id, channel_id)]
-    tasks = [
-        ensure_in_channel(guild, uid, cid) for uid, cid in moves
-    ]
-    if tasks:
-        await asyncio.gather(*tasks, return_exceptions=True)
-
-
-async def set_voice_policy(
-    guild: discord.Guild, user_id: int, *, mute: Optional[bool] = None, deafen: Optional[bool] = None
-) -> None:
-    try:
-        member = guild.get_member(user_id) or await guild.fetch_member(user_id)
-    except Exception:
-        return
-    kwargs = {}
-    if mute is not None:
-        kwargs["mute"] = mute
-    if deafen is not None:
-        kwargs["deafen"] = deafen
+            if kwargs:
+                # One PATCH for move + mute/deafen instead of two calls
+                with DISCORD_CALL_SECONDS.time("move_edit"):
+                    await member.edit(voice_channel=channel, **kwargs, reason="ProxChat move")
+                return True
+            with DISCORD_CALL_SECONDS.time("move"):
+                await member.move_to(channel, reason="ProxChat move")
+            return True
+        except Exception as e:
+            if is_rate_limited(e):
+                raise
+            # Missing permissions or hierarchy issue; still try the voice policy below
+            if not kwargs:
+                return False
+        moved = False
+    else:
+        moved = True
     if kwargs:
         try:
-            await member.edit(**kwargs, reason="ProxChat voice policy")
-        except Exception:
-            pass
\ No newline at end of file
+            with DISCORD_CALL_SECONDS.time("edit"):
+                await member.edit(**kwargs, reason="ProxChat voice policy")
+        except Exception as e:
+            if is_rate_limited(e):
+                raise
+            return False
+    return moved
+
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import discord
+
+from .discord_actions import is_rate_limited, move_member, retry_after
+from .log import get_logger
+
+log = get_logger("Dispatcher")
+
+
+# Lower value runs first
+PRIORITY_DEATH = 0
+PRIORITY_RESET = 1
+PRIORITY_CLUSTER = 2
+
+
+@dataclass
+class MoveIntent:
+    user_id: int
+    channel_id: Optional[int]  # None: only apply mute/deafen
+    priority: int = PRIORITY_CLUSTER
+    mute: Optional[bool] = None
+    deafen: Optional[bool] = None
+    seq: int = 0
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+
+class MoveDispatcher:
+    """Bounded-concurrency executor for voice moves with priorities and per-user supersession.
+
+    Each user has at most one pending intent. A newer intent replaces a pending one of the
+    same or lower importance (e.g. a new cluster target or a death replaces a queued cluster
+    move); a cluster move never replaces a pending death or reset. Replaced intents resolve
+    their future with False. On an HTTP 429 all workers pause for the advertised retry
+    window and the intent is requeued unless it was superseded meanwhile. Lowering
+    `concurrency` retires surplus workers between moves.
+    """
+
+    def __init__(self, get_guild: Callable[[], Optional[discord.Guild]], *, concurrency: int = 4):
+        self._get_guild = get_guild
+        self._concurrency = max(1, concurrency)
+        self._heap: List[Tuple[int, int, int]] = []  # (priority, seq, user_id)
+        self._pending: Dict[int, MoveIntent] = {}
+        self._inflight: Dict[int, MoveIntent] = {}
+        self._seq = itertools.count(1)
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._paused_until = 0.0
+        # Counters for diagnostics
+        self.executed = 0
+        self.superseded = 0
+        self.rate_limited = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def concurrency(self) -> int:
+        return self._concurrency
+
+    @concurrency.setter
+    def concurrency(self, value: int) -> None:
+        self._concurrency = max(1, value)
+        if self._workers:
+            # Wake idle workers so surplus ones exit; start more if the limit was raised
+            self._ensure_workers()
+            self._wakeup.set()
+
+    def submit(self, intent: MoveIntent) -> asyncio.Future:
+        """Queue an intent; the returned future resolves True once applied, False otherwise."""
+        loop = asyncio.get_running_loop()
+        intent.future = loop.create_future()
+        running = self._inflight.get(intent.user_id)
+        if running is not None and intent.priority > running.priority:
+            # Don't chase a death/reset move that is already executing with a cluster move
+            self.superseded += 1
+            intent.future.set_result(False)
+            return intent.future
+        existing = self._pending.get(intent.user_id)
+        if existing is not None:
+            if intent.priority > existing.priority:
+                # Less important than what is already queued for this user
+                self.superseded += 1
+                intent.future.set_result(False)
+                return intent.future
+            self._resolve(existing, False)
+            self.superseded += 1
+        intent.seq = next(self._seq)
+        self._pending[intent.user_id] = intent
+        heapq.heappush(self._heap, (intent.priority, intent.seq, intent.user_id))
+        self._ensure_workers()
+        self._wakeup.set()
+        return intent.future
+
+    def cancel(self, min_priority: int) -> int:
+        """Drop pending intents with priority >= min_priority (e.g. cluster moves at round end)."""
+        dropped = [uid for uid, it in self._pending.items() if it.priority >= min_priority]
+        for uid in dropped:
+            self._resolve(self._pending.pop(uid), False)
+        return len(dropped)
+
+    def _resolve(self, intent: MoveIntent, ok: bool) -> None:
+        if intent.future is not None and not intent.future.done():
+            intent.future.set_result(ok)
+
+    def _ensure_workers(self) -> None:
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self._concurrency:
+            self._workers.append(asyncio.create_task(self._run()))
+
+    def _retire(self) -> bool:
+        """True if the calling worker is over the concurrency limit and has left the pool."""
+        if len(self._workers) <= self._concurrency:
+            return False
+        task = asyncio.current_task()
+        if task in self._workers:
+            self._workers.remove(task)  # type: ignore[arg-type]
+        return True
+
+    def _pop(self) -> Optional[MoveIntent]:
+        deferred: List[Tuple[int, int, int]] = []
+        found: Optional[MoveIntent] = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            _, seq, uid = entry
+            intent = self._pending.get(uid)
+            if intent is None or intent.seq != seq:
+                continue  # superseded or cancelled
+            if uid in self._inflight:
+                # Keep per-user order: wait until the running move for this user finishes
+                deferred.append(entry)
+                continue
+            del self._pending[uid]
+            self._inflight[uid] = intent
+            found = intent
+            break
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return found
+
+    def _finish(self, intent: MoveIntent, ok: bool) -> None:
+        self._inflight.pop(intent.user_id, None)
+        self._resolve(intent, ok)
+        if intent.user_id in self._pending:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            if self._retire():
+                return
+            intent = self._pop()
+            if intent is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if intent.user_id in self._pending:
+                    # A newer, at least as important intent arrived while paused; it wins
+                    self.superseded += 1
+                    self._finish(intent, False)
+                    continue
+            guild = self._get_guild()
+            if guild is None:
+                self._finish(intent, False)
+                continue
+            try:
+                # Members intent keeps the cache complete; never fall back to a REST fetch here
+                ok = await move_member(
+                    guild, intent.user_id, intent.channel_id, mute=intent.mute, deafen=intent.deafen, fetch=False
+                )
+                self.executed += 1
+                self._finish(intent, ok)
+            except Exception as e:
+                if is_rate_limited(e):
+                    wait = retry_after(e)
+                    self.rate_limited += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + wait)
+                    log.warning("Rate limited; pausing moves", wait=round(wait, 2), sample=True)
+                    self._inflight.pop(intent.user_id, None)
+                    if intent.user_id not in self._pending:
+                        self._pending[intent.user_id] = intent
+                        heapq.heappush(self._heap, (intent.priority, intent.seq, intent.user_id))
+                        self._wakeup.set()
+                    else:
+                        self._resolve(intent, False)
+                else:
+                    log.warning(f"Move failed: {e}", uid=intent.user_id)
+                    self._finish(intent, False)
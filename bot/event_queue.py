@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+
+from .position_stream import PositionStream
+from .log import get_logger
+
+log = get_logger("Bridge")
+
+
+# Events whose handler result must go back in the HTTP response (in-game link feedback)
+INLINE_EVENT_TYPES = {"link_attempt"}
+POSITION_EVENT_TYPE = "player_pos_batch"
+
+
+def batch_ts(ev: dict) -> Optional[float]:
+    """Newest sample timestamp in a position batch (None if the batch carries none)."""
+    if ev.get("packed") is not None:
+        # Binary frames carry one batch-level timestamp
+        return ev.get("ts")
+    newest: Optional[float] = None
+    for item in ev.get("positions") or []:
+        try:
+            ts = float(item.get("ts"))
+        except Exception:
+            continue
+        if newest is None or ts > newest:
+            newest = ts
+    return newest
+
+
+class EventQueue:
+    """Single ordered worker per guild with latest-wins coalescing for position batches.
+
+    Control events (round_start, round_end, player_death, ...) are handled strictly in
+    arrival order. Position batches share one slot: a newer batch replaces a pending one
+    (keeping its "unchanged": False, if set), and a batch older than the newest accepted one
+    is dropped. A pending batch keeps its
+    place relative to control events through arrival sequence numbers.
+    """
+
+    def __init__(self, handler: Callable[[dict], Awaitable[Optional[dict]]], *, name: str = "default"):
+        self.name = name
+        self._handler = handler
+        self._seq = itertools.count(1)
+        self._controls: Deque[Tuple[int, dict]] = deque()
+        self._latest_pos: Optional[Tuple[int, dict]] = None
+        self._last_pos_ts: Optional[float] = None
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        # Rebuilds full state from keyframe/delta position batches at ingress
+        self.stream = PositionStream()
+        # Counters for diagnostics
+        self.dropped_superseded = 0
+        self.dropped_out_of_order = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._controls) + (1 if self._latest_pos is not None else 0)
+
+    async def dispatch(self, ev: dict) -> Optional[dict]:
+        """Entry point for the HTTP layer: run inline events, queue everything else and ack."""
+        if ev.get("type") in INLINE_EVENT_TYPES:
+            return await self._handler(ev)
+        resp: dict = {"queued": True}
+        if ev.get("type") == POSITION_EVENT_TYPE:
+            full, need_keyframe = self.stream.apply(ev)
+            if need_keyframe:
+                resp["keyframe"] = True
+            if full is None:
+                resp["queued"] = False
+                return resp
+            ev = full
+        self.submit(ev)
+        return resp
+
+    def submit(self, ev: dict) -> None:
+        seq = next(self._seq)
+        t = ev.get("type")
+        if t == POSITION_EVENT_TYPE:
+            ts = batch_ts(ev)
+            if ts is not None and self._last_pos_ts is not None and ts <= self._last_pos_ts:
+                self.dropped_out_of_order += 1
+                return
+            if ts is not None:
+                self._last_pos_ts = ts
+            if self._latest_pos is not None:
+                self.dropped_superseded += 1
+                if ev.get("unchanged") and not self._latest_pos[1].get("unchanged"):
+                    # The replaced batch carried changes the handler has not seen yet
+                    ev = {**ev, "unchanged": False}
+            self._latest_pos = (seq, ev)
+        else:
+            if t == "round_start":
+                # CurTime() restarts on map change; don't reject the next round's batches as stale
+                self._last_pos_ts = None
+            self._controls.append((seq, ev))
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def _pop_next(self) -> Optional[dict]:
+        ctrl = self._controls[0] if self._controls else None
+        pos = self._latest_pos
+        if ctrl is None and pos is None:
+            return None
+        if pos is None or (ctrl is not None and ctrl[0] < pos[0]):
+            self._controls.popleft()
+            return ctrl[1]  # type: ignore[index]
+        self._latest_pos = None
+        return pos[1]
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                ev = self._pop_next()
+                if ev is None:
+                    break
+                try:
+                    await self._handler(ev)
+                except Exception as e:
+                    log.error(f"Error handling queued event '{ev.get('type')}' (queue={self.name}): {e}")
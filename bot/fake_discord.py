@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+from collections import Counter
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import discord
+
+
+# In-memory stand-in for the parts of a discord.py Guild the bot touches (voice channels,
+# members, moves, mute/deafen, channel create/clone/edit/delete). Every REST-equivalent call
+# goes through FakeAPI, which adds latency, injects 429s and timeouts, and counts calls.
+# Channels subclass the discord.py types so isinstance checks in the bot still pass.
+
+_ids = itertools.count(900_000_000_000_000_000)
+
+VoiceListener = Callable[["FakeMember", "FakeVoiceState", "FakeVoiceState"], Awaitable[None]]
+
+
+def _http_error(status: int, reason: str, message: str, retry_after: Optional[float] = None) -> discord.HTTPException:
+    headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+    response = SimpleNamespace(status=status, reason=reason, headers=headers)
+    if status == 404:
+        return discord.NotFound(response, message)  # type: ignore[arg-type]
+    return discord.HTTPException(response, message)  # type: ignore[arg-type]
+
+
+class FakeAPI:
+    """Latency and fault model plus call accounting, shared by everything in a fake guild.
+
+    Each call sleeps `latency` (+ up to `jitter`) seconds. With probability `rate_limit_rate`
+    it fails with HTTP 429 (Retry-After: `retry_after`); with probability `timeout_rate` it
+    hangs for `timeout_sec` and raises asyncio.TimeoutError. Use a `seed` for repeatable runs.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        timeout_rate: float = 0.0,
+        timeout_sec: float = 5.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.timeout_rate = timeout_rate
+        self.timeout_sec = timeout_sec
+        self._rng = random.Random(seed)
+        # Accounting, keyed by op name (e.g. "member.edit", "guild.create_voice_channel")
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+        self.timeouts: Counter = Counter()
+        self.failed: Counter = Counter()
+        self.busy_sec: Counter = Counter()
+
+    async def call(self, op: str) -> None:
+        """Account for one API call, then sleep or raise according to the fault model."""
+        self.calls[op] += 1
+        roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            self.rate_limited[op] += 1
+            raise _http_error(429, "Too Many Requests", "You are being rate limited.", self.retry_after)
+        if roll < self.rate_limit_rate + self.timeout_rate:
+            self.timeouts[op] += 1
+            await asyncio.sleep(self.timeout_sec)
+            raise asyncio.TimeoutError(f"{op} timed out")
+        delay = self.latency + (self._rng.uniform(0.0, self.jitter) if self.jitter > 0 else 0.0)
+        self.busy_sec[op] += delay
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def fail(self, op: str, status: int = 403, message: str = "Missing Permissions") -> discord.HTTPException:
+        self.failed[op] += 1
+        return _http_error(status, "Forbidden" if status == 403 else "Error", message)
+
+    def summary(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "total_calls": sum(self.calls.values()),
+            "rate_limited": dict(self.rate_limited),
+            "timeouts": dict(self.timeouts),
+            "failed": dict(self.failed),
+        }
+
+
+class FakeVoiceState:
+    def __init__(self, channel: Optional["FakeVoiceChannel"], mute: bool = False, deaf: bool = False):
+        self.channel = channel
+        self.mute = mute
+        self.deaf = deaf
+
+    def copy(self) -> "FakeVoiceState":
+        return FakeVoiceState(self.channel, self.mute, self.deaf)
+
+
+class FakeMember:
+    def __init__(self, guild: "FakeGuild", user_id: int, name: str, permissions: Optional[discord.Permissions] = None):
+        self.guild = guild
+        self.id = user_id
+        self.name = self.display_name = name
+        self.voice: Optional[FakeVoiceState] = None
+        self.guild_permissions = permissions or discord.Permissions.none()
+
+    def __repr__(self) -> str:
+        return f"<FakeMember id={self.id} name={self.name!r}>"
+
+    async def edit(self, *, voice_channel=discord.utils.MISSING, mute: Optional[bool] = None,
+                   deafen: Optional[bool] = None, reason: Optional[str] = None) -> None:
+        op = "member.edit"
+        await self.guild.api.call(op)
+        if voice_channel is not discord.utils.MISSING and voice_channel is not None and voice_channel.id not in self.guild._channels:
+            raise self.guild.api.fail(op, 404, "Unknown Channel")
+        if self.voice is None or self.voice.channel is None:
+            # Discord refuses voice edits for members who are not connected
+            raise self.guild.api.fail(op, 400, "Target user is not connected to voice.")
+        before = self.voice.copy()
+        if voice_channel is not discord.utils.MISSING:
+            self.voice.channel = voice_channel
+        if mute is not None:
+            self.voice.mute = mute
+        if deafen is not None:
+            self.voice.deaf = deafen
+        if self.voice.channel is None:
+            self.voice = None
+        self.guild._voice_changed(self, before)
+
+    async def move_to(self, channel: Optional["FakeVoiceChannel"], *, reason: Optional[str] = None) -> None:
+        await self.edit(voice_channel=channel, reason=reason)
+
+
+class FakeVoiceChannel(discord.VoiceChannel):
+    def __init__(self, guild: "FakeGuild", channel_id: int, name: str, category_id: Optional[int] = None):
+        # Only the slots the bot reads; skips discord.py's gateway-payload constructor
+        self.guild = guild  # type: ignore[assignment]
+        self.id = channel_id
+        self.name = name
+        self.category_id = category_id
+        self.position = len(guild._channels)
+
+    def __repr__(self) -> str:
+        return f"<FakeVoiceChannel id={self.id} name={self.name!r} category_id={self.category_id}>"
+
+    @property
+    def members(self) -> List[FakeMember]:  # type: ignore[override]
+        return [m for m in self.guild._members.values() if m.voice is not None and m.voice.channel is self]
+
+    async def delete(self, *, reason: Optional[str] = None) -> None:
+        await self.guild.api.call("channel.delete")
+        self.guild._channels.pop(self.id, None)
+        for member in self.members:
+            before = member.voice.copy()  # type: ignore[union-attr]
+            member.voice = None
+            self.guild._voice_changed(member, before)
+
+    async def edit(self, *, name: Optional[str] = None, category=discord.utils.MISSING,  # type: ignore[override]
+                   reason: Optional[str] = None) -> "FakeVoiceChannel":
+        await self.guild.api.call("channel.edit")
+        if name is not None:
+            self.name = name
+        if category is not discord.utils.MISSING:
+            self.category_id = category.id if category is not None else None
+        return self
+
+    async def clone(self, *, name: Optional[str] = None, reason: Optional[str] = None) -> "FakeVoiceChannel":  # type: ignore[override]
+        await self.guild.api.call("channel.clone")
+        return self.guild.add_voice_channel(name or self.name, category_id=self.category_id)
+
+
+class FakeCategory(discord.CategoryChannel):
+    def __init__(self, guild: "FakeGuild", channel_id: int, name: str):
+        self.guild = guild  # type: ignore[assignment]
+        self.id = channel_id
+        self.name = name
+        self.category_id = None
+        self.position = len(guild._channels)
+
+    def __repr__(self) -> str:
+        return f"<FakeCategory id={self.id} name={self.name!r}>"
+
+
+class FakeGuild:
+    """Guild stand-in. Set it up synchronously (add_voice_channel, add_member), then hand it to
+    Tenant.attach(). Voice changes made through the API are delivered to `voice_listeners`
+    as (member, before, after) tasks, like gateway VOICE_STATE_UPDATE events."""
+
+    def __init__(self, guild_id: int, name: str = "Fake Guild", *, api: Optional[FakeAPI] = None,
+                 permissions: Optional[discord.Permissions] = None):
+        self.id = guild_id
+        self.name = name
+        self.api = api or FakeAPI()
+        self._channels: Dict[int, discord.abc.GuildChannel] = {}
+        self._members: Dict[int, FakeMember] = {}
+        self.voice_listeners: List[VoiceListener] = []
+        self._tasks: Set[asyncio.Task] = set()
+        # The bot's own member; default permissions cover everything the bot uses
+        self.me = FakeMember(self, next(_ids), "ProxBot", permissions or discord.Permissions(
+            manage_channels=True, move_members=True, mute_members=True, deafen_members=True,
+        ))
+
+    def __repr__(self) -> str:
+        return f"<FakeGuild id={self.id} name={self.name!r}>"
+
+    # Setup (no API calls)
+    def add_voice_channel(self, name: str, *, channel_id: Optional[int] = None,
+                          category_id: Optional[int] = None) -> FakeVoiceChannel:
+        ch = FakeVoiceChannel(self, channel_id or next(_ids), name, category_id)
+        self._channels[ch.id] = ch
+        return ch
+
+    def add_category(self, name: str, *, channel_id: Optional[int] = None) -> FakeCategory:
+        cat = FakeCategory(self, channel_id or next(_ids), name)
+        self._channels[cat.id] = cat
+        return cat
+
+    def add_member(self, user_id: int, *, channel_id: Optional[int] = None, name: Optional[str] = None) -> FakeMember:
+        member = self._members.get(user_id)
+        if member is None:
+            member = self._members[user_id] = FakeMember(self, user_id, name or f"user-{user_id}")
+        if channel_id is not None:
+            member.voice = FakeVoiceState(self._channels[channel_id])  # type: ignore[arg-type]
+        return member
+
+    # discord.Guild surface used by the bot
+    @property
+    def voice_channels(self) -> List[FakeVoiceChannel]:
+        chans = [c for c in self._channels.values() if isinstance(c, FakeVoiceChannel)]
+        chans.sort(key=lambda c: (c.position, c.id))
+        return chans
+
+    @property
+    def stage_channels(self) -> list:
+        return []
+
+    @property
+    def members(self) -> List[FakeMember]:
+        return list(self._members.values())
+
+    def get_channel(self, channel_id: Optional[int]):
+        return self._channels.get(channel_id)  # type: ignore[arg-type]
+
+    def get_member(self, user_id: int) -> Optional[FakeMember]:
+        if user_id == self.me.id:
+            return self.me
+        return self._members.get(user_id)
+
+    async def fetch_member(self, user_id: int) -> FakeMember:
+        await self.api.call("guild.fetch_member")
+        member = self.get_member(user_id)
+        if member is None:
+            raise self.api.fail("guild.fetch_member", 404, "Unknown Member")
+        return member
+
+    async def create_voice_channel(self, name: str, *, category: Optional[FakeCategory] = None,
+                                   reason: Optional[str] = None) -> FakeVoiceChannel:
+        await self.api.call("guild.create_voice_channel")
+        return self.add_voice_channel(name, category_id=category.id if category is not None else None)
+
+    def _voice_changed(self, member: FakeMember, before: FakeVoiceState) -> None:
+        after = member.voice.copy() if member.voice is not None else FakeVoiceState(None)
+        for listener in self.voice_listeners:
+            task = asyncio.get_running_loop().create_task(listener(member, before, after))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
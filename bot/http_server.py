@@ -2,32 +2,104 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import Callable, Awaitable
+from typing import Callable, Awaitable, Dict, Optional, Union
 
 from aiohttp import web
 
+from . import metrics
+from .wire import WIRE_CONTENT_TYPE, PositionDecoder, WireError
+from .log import get_logger
 
-def create_app(secret: str, on_event: Callable[[dict], Awaitable[None]]) -> web.Application:
+log = get_logger("Bridge")
+
+
+# Upper bound on events accepted by one /events/batch request
+MAX_BATCH_EVENTS = 500
+# Binary frames have no JSON body, so the sending server identifies itself here (or ?server=)
+SERVER_HEADER = "x-proxchat-server"
+
+
+def create_app(secret: Union[str, Callable[[], str]], on_event: Callable[[dict], Awaitable[None]],
+               recorder: Optional[Callable[[dict], None]] = None) -> web.Application:
+    # Accept a callable so the secret follows settings reloads
+    get_secret = secret if callable(secret) else (lambda: secret)
     app = web.Application()
+    # Packed position batches keep steamid tables between requests, per sending server
+    decoders: Dict[str, PositionDecoder] = {}
 
     async def health(_: web.Request) -> web.Response:
         return web.json_response({"ok": True})
 
+    async def metrics_endpoint(_: web.Request) -> web.Response:
+        # Gauges are computed here, so an unscraped bridge pays only for counter/histogram updates
+        return web.Response(body=metrics.render().encode("utf-8"), headers={"Content-Type": metrics.CONTENT_TYPE})
+
     async def events(req: web.Request) -> web.Response:
+        with metrics.REQUEST_SECONDS.time("/events"):
+            return await handle_events(req)
+
+    async def events_batch(req: web.Request) -> web.Response:
+        with metrics.REQUEST_SECONDS.time("/events/batch"):
+            return await handle_events_batch(req)
+
+    async def handle_events(req: web.Request) -> web.Response:
+        auth = req.headers.get("x-bridge-secret")
+        if auth != get_secret():
+            return web.json_response({"error": "unauthorized"}, status=401)
+        if req.content_type == WIRE_CONTENT_TYPE:
+            server_id = req.headers.get(SERVER_HEADER) or req.query.get("server") or ""
+            decoder = decoders.get(server_id)
+            if decoder is None:
+                decoder = decoders[server_id] = PositionDecoder()
+            try:
+                payload = decoder.decode(await req.read())
+            except WireError as e:
+                # 409 tells the addon to resend its steamid table
+                status = 409 if e.reason == "unknown_table" else 400
+                return web.json_response({"error": e.reason}, status=status)
+            if server_id:
+                payload["server_id"] = server_id
+        else:
+            try:
+                payload = await req.json()
+            except Exception:
+                return web.json_response({"error": "invalid_json"}, status=400)
+        return web.json_response(await process(payload))
+
+    async def handle_events_batch(req: web.Request) -> web.Response:
+        # Ordered array of events in one request: {"events": [...]} or a bare JSON array
         auth = req.headers.get("x-bridge-secret")
-        if auth != secret:
+        if auth != get_secret():
             return web.json_response({"error": "unauthorized"}, status=401)
         try:
             payload = await req.json()
         except Exception:
             return web.json_response({"error": "invalid_json"}, status=400)
+        items = payload.get("events") if isinstance(payload, dict) else payload
+        if not isinstance(items, list):
+            return web.json_response({"error": "invalid_batch"}, status=400)
+        if len(items) > MAX_BATCH_EVENTS:
+            return web.json_response({"error": "batch_too_large", "max": MAX_BATCH_EVENTS}, status=413)
+        results = []
+        for item in items:
+            if not isinstance(item, dict):
+                results.append({"ok": False, "error": "invalid_event"})
+                continue
+            results.append(await process(item))
+        return web.json_response({"ok": True, "results": results})
+
+    async def process(payload: dict) -> dict:
         try:
             etype = payload.get("type")
+            metrics.EVENTS.inc(str(etype))
+            if recorder is not None:
+                # Authenticated and decoded, before any queueing (see bot/recorder.py)
+                recorder(payload)
             if etype == "link_attempt":
                 player = payload.get("player", {})
                 sid = player.get("steamid64")
                 code = payload.get("code")
-                print(f"[Bridge] Received link_attempt: steamid={sid} code={code}")
+                log.info("Received link_attempt", steamid=sid, code=code)
         except Exception:
             pass
         try:
@@ -35,19 +107,35 @@ def create_app(secret: str, on_event: Callable[[dict], Awaitable[None]]) -> web.
             resp = {"ok": True}
             if isinstance(result, dict):
                 resp.update(result)
-            return web.json_response(resp)
+            return resp
         except Exception as e:
             # Log the exception server-side; return 200 to avoid hammering with retries
-            print(f"[Bridge] Error handling event: {e}")
-            return web.json_response({"ok": False, "error": "handler_exception"}, status=200)
+            log.error(f"Error handling event: {e}")
+            return {"ok": False, "error": "handler_exception"}
 
     app.add_routes([
         web.get("/health", health),
+        web.get("/metrics", metrics_endpoint),
         web.post("/events", events),
+        web.post("/events/batch", events_batch),
     ])
     return app
 
 
+def create_metrics_app() -> web.Application:
+    """/health and /metrics only, for the PROX_MODE=actuator process (which has no event listener)."""
+    app = web.Application()
+
+    async def health(_: web.Request) -> web.Response:
+        return web.json_response({"ok": True})
+
+    async def metrics_endpoint(_: web.Request) -> web.Response:
+        return web.Response(body=metrics.render().encode("utf-8"), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+    app.add_routes([web.get("/health", health), web.get("/metrics", metrics_endpoint)])
+    return app
+
+
 async def run_server(host: str, port: int, app: web.Application) -> None:
     runner = web.AppRunner(app)
     await runner.setup()
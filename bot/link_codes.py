@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import heapq
+import secrets
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .store import MappingStore
+
+
+class LinkCodeStore:
+    """Pending /linksteam codes: code -> (discord_id, expiry).
+
+    Redeem is a dict pop. Expired codes are swept from a min-heap of expiry times on every
+    issue/redeem, so unused codes never pile up. Each Discord user holds at most `per_user`
+    live codes (issuing another revokes their oldest), and at most `max_codes` are live in
+    total (issue refuses when full). With a MappingStore backend (MAPPING_DB), codes are
+    mirrored to SQLite on its writer thread and reloaded at startup, so they survive restarts.
+    """
+
+    def __init__(self, *, ttl: float = 300.0, per_user: int = 3, max_codes: int = 10000,
+                 backend: Optional["MappingStore"] = None, clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.per_user = max(1, per_user)
+        self.max_codes = max(1, max_codes)
+        self.backend = backend
+        self.clock = clock
+        self._codes: Dict[str, Tuple[int, float]] = {}
+        self._by_user: Dict[int, List[str]] = {}  # oldest first
+        # (expiry, code); stale entries (redeemed/revoked codes) are skipped when popped
+        self._expiry: List[Tuple[float, str]] = []
+        # Counters for diagnostics
+        self.expired = 0
+        self.revoked = 0
+        self.refused = 0
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def configure(self, *, ttl: float, per_user: int, max_codes: int) -> None:
+        """Apply reloaded settings; live codes keep their original expiry."""
+        self.ttl = ttl
+        self.per_user = max(1, per_user)
+        self.max_codes = max(1, max_codes)
+
+    def load(self) -> int:
+        """Reload unexpired codes from the backend (startup)."""
+        if self.backend is None:
+            return 0
+        now = self.clock()
+        for code, discord_id, expiry in self.backend.load_codes(now):
+            self._add(code, discord_id, expiry)
+        return len(self._codes)
+
+    def _add(self, code: str, discord_id: int, expiry: float) -> None:
+        self._codes[code] = (discord_id, expiry)
+        self._by_user.setdefault(discord_id, []).append(code)
+        heapq.heappush(self._expiry, (expiry, code))
+
+    def _remove(self, code: str) -> Optional[Tuple[int, float]]:
+        entry = self._codes.pop(code, None)
+        if entry is None:
+            return None
+        codes = self._by_user.get(entry[0])
+        if codes is not None:
+            try:
+                codes.remove(code)  # at most per_user entries
+            except ValueError:
+                pass
+            if not codes:
+                del self._by_user[entry[0]]
+        return entry
+
+    def _forget(self, codes: List[str]) -> None:
+        if self.backend is not None and codes:
+            self.backend.delete_codes(codes)
+
+    def sweep(self) -> int:
+        """Drop expired codes; returns how many were dropped."""
+        now = self.clock()
+        dropped: List[str] = []
+        heap = self._expiry
+        while heap and heap[0][0] <= now:
+            expiry, code = heapq.heappop(heap)
+            entry = self._codes.get(code)
+            if entry is not None and entry[1] == expiry:
+                self._remove(code)
+                dropped.append(code)
+        # Redeemed and revoked codes leave stale heap entries; compact if they dominate
+        if len(heap) > 2 * len(self._codes) + 64:
+            self._expiry = [(exp, code) for code, (_, exp) in self._codes.items()]
+            heapq.heapify(self._expiry)
+        self.expired += len(dropped)
+        self._forget(dropped)
+        return len(dropped)
+
+    def issue(self, discord_id: int) -> Optional[str]:
+        """New 6-hex-char code for discord_id, or None when the store is full."""
+        self.sweep()
+        revoked: List[str] = []
+        codes = self._by_user.get(discord_id, [])
+        while len(codes) >= self.per_user:
+            revoked.append(codes[0])
+            self._remove(codes[0])
+        self.revoked += len(revoked)
+        self._forget(revoked)
+        if len(self._codes) >= self.max_codes:
+            self.refused += 1
+            return None
+        code = secrets.token_hex(3).upper()
+        while code in self._codes:
+            code = secrets.token_hex(3).upper()
+        expiry = self.clock() + self.ttl
+        self._add(code, discord_id, expiry)
+        if self.backend is not None:
+            self.backend.save_code(code, discord_id, expiry)
+        return code
+
+    def redeem(self, code: str) -> Tuple[Optional[int], Optional[str]]:
+        """(discord_id, None) and the code is consumed, or (None, "code_not_found"/"code_expired")."""
+        entry = self._remove(code)
+        self.sweep()
+        if entry is None:
+            return None, "code_not_found"
+        self._forget([code])
+        discord_id, expiry = entry
+        if self.clock() > expiry:
+            self.expired += 1
+            return None, "code_expired"
+        return discord_id, None
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from typing import Dict, Optional, Tuple, Union
+
+# Logging for bot/: "[Tag] message key=value" lines (or JSON lines) written by a background
+# thread. Callers only enqueue a record, so a slow stdout/journald never stalls the event loop.
+# Hot-path messages pass sample=True to log at most once per LOG_SAMPLE_SEC per message,
+# reporting how many were suppressed in between.
+
+ROOT = "proxchat"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["_DroppingQueueHandler"] = None
+# Default interval for sample=True
+_sample_sec = 5.0
+# Sampling keys remembered per Logger; beyond this, keys idle for longer than their interval are evicted
+_MAX_SAMPLE_KEYS = 1024
+
+
+class _Formatter(logging.Formatter):
+    def __init__(self, json_lines: bool = False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        tag = record.name[len(ROOT) + 1:] if record.name.startswith(ROOT + ".") else record.name
+        fields: dict = getattr(record, "fields", None) or {}
+        msg = record.getMessage()
+        if self.json_lines:
+            return json.dumps({"ts": round(record.created, 3), "level": record.levelname.lower(), "tag": tag,
+                               "msg": msg, **fields}, default=str)
+        prefix = "" if record.levelno < logging.WARNING else ("WARN: " if record.levelno == logging.WARNING else "ERROR: ")
+        extra = "".join(f" {k}={v}" for k, v in fields.items())
+        return f"[{tag}] {prefix}{msg}{extra}"
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks: when the writer thread falls behind and the queue is full, records are dropped."""
+
+    def __init__(self, q: "queue.Queue[logging.LogRecord]"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _stdout_handler(json_lines: bool) -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_Formatter(json_lines))
+    return handler
+
+
+# Until setup_logging() runs (scripts, the load generator), write directly so nothing is lost
+_root = logging.getLogger(ROOT)
+_root.setLevel(logging.INFO)
+_root.propagate = False
+_root.addHandler(_stdout_handler(False))
+
+
+def setup_logging(level: str = "INFO", fmt: str = "text", sample_sec: float = 5.0, queue_size: int = 10000) -> None:
+    """Route bot logging through a bounded queue to a writer thread. Safe to call again on reload."""
+    global _listener, _queue_handler, _sample_sec
+    _sample_sec = sample_sec
+    _root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    if _listener is not None:
+        for handler in _listener.handlers:
+            handler.setFormatter(_Formatter(fmt == "json"))
+        return
+    _queue_handler = _DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, _stdout_handler(fmt == "json"))
+    for handler in list(_root.handlers):
+        _root.removeHandler(handler)
+    _root.addHandler(_queue_handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def silence() -> None:
+    """Discard all bot log output, e.g. in tools that print their own report to stdout."""
+    _root.setLevel(logging.CRITICAL + 1)
+
+
+def dropped() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+class Logger:
+    """Tagged logger: log.info("Moved user", uid=123) -> "[Tag] Moved user uid=123".
+
+    sample=True (or a number of seconds) logs a message at most once per interval, keyed by
+    the message template unless `key` is given.
+    """
+
+    def __init__(self, tag: str):
+        self.tag = tag
+        self._logger = logging.getLogger(f"{ROOT}.{tag}")
+        # key -> (last emitted, suppressed since)
+        self._last: Dict[str, Tuple[float, int]] = {}
+
+    def _log(self, level: int, msg: str, sample: Union[bool, float], key: Optional[str], fields: dict) -> None:
+        if not self._logger.isEnabledFor(level):
+            return
+        if sample:
+            every = _sample_sec if sample is True else float(sample)
+            k = key or msg
+            now = time.monotonic()
+            last, suppressed = self._last.get(k, (0.0, 0))
+            if last and now - last < every:
+                self._last[k] = (last, suppressed + 1)
+                return
+            if k not in self._last and len(self._last) >= _MAX_SAMPLE_KEYS:
+                self._evict(now, every)
+            self._last[k] = (now, 0)
+            if suppressed:
+                fields["suppressed"] = suppressed
+        self._logger.log(level, msg, extra={"fields": fields})
+
+    def _evict(self, now: float, every: float) -> None:
+        # Keys idle for a full interval have nothing left to suppress; if every key is
+        # still active, forget the oldest half (their suppressed counts are lost)
+        idle = [k for k, (last, _) in self._last.items() if now - last >= every]
+        if len(idle) < len(self._last) // 2:
+            idle = sorted(self._last, key=lambda k: self._last[k][0])[:len(self._last) // 2]
+        for k in idle:
+            del self._last[k]
+
+    def debug(self, msg: str, *, sample: Union[bool, float] = False, key: Optional[str] = None, **fields) -> None:
+        self._log(logging.DEBUG, msg, sample, key, fields)
+
+    def info(self, msg: str, *, sample: Union[bool, float] = False, key: Optional[str] = None, **fields) -> None:
+        self._log(logging.INFO, msg, sample, key, fields)
+
+    def warning(self, msg: str, *, sample: Union[bool, float] = False, key: Optional[str] = None, **fields) -> None:
+        self._log(logging.WARNING, msg, sample, key, fields)
+
+    def error(self, msg: str, *, sample: Union[bool, float] = False, key: Optional[str] = None, **fields) -> None:
+        self._log(logging.ERROR, msg, sample, key, fields)
+
+
+def get_logger(tag: str) -> Logger:
+    return Logger(tag)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+
+# Prometheus text exposition (format 0.0.4) without the client library. Updates are a dict
+# lookup and an add; callback metrics (gauges, counters mirrored from existing attributes)
+# are only evaluated when /metrics is scraped.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-ms clustering up to multi-second Discord rate-limit stalls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def samples(self) -> Iterator[str]:
+        return iter(())
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, n: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + n
+
+    def samples(self) -> Iterator[str]:
+        for labels, v in list(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_num(v)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *labels)
+
+    def samples(self) -> Iterator[str]:
+        for labels, (counts, total, count) in list(self._values.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="' + _num(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+
+
+class Callback(_Metric):
+    """Value read from a callable at scrape time, one callable per label set."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self._sources: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def track(self, labels: Tuple[str, ...], fn: Callable[[], float]) -> None:
+        self._sources[labels] = fn
+
+    def samples(self) -> Iterator[str]:
+        for labels, fn in list(self._sources.items()):
+            try:
+                v = fn()
+            except Exception:
+                continue
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_num(v)}"
+
+
+def render() -> str:
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+# Shared hot-path metrics
+EVENTS = Counter("proxchat_events_total", "Events received from GMod, by type.", ["type"])
+REQUEST_SECONDS = Histogram("proxchat_request_seconds", "Bridge HTTP request handling time.", ["path"])
+CLUSTER_SECONDS = Histogram("proxchat_cluster_seconds", "Time to cluster one position batch.", ["mode"])
+CHANNEL_ENSURE_SECONDS = Histogram("proxchat_channel_ensure_seconds", "Time to resolve/ensure cluster channels for a batch.")
+DISCORD_CALL_SECONDS = Histogram("proxchat_discord_call_seconds", "Latency of individual Discord voice move/edit calls.", ["op"])
+MOVES_SUPPRESSED = Counter("proxchat_moves_suppressed_total", "Cluster moves skipped by hysteresis, cooldowns or permissions.", ["reason"])
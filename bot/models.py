@@ -33,6 +33,7 @@ class PlayerPos(TypedDict):
 class Event(TypedDict, total=False):
     type: EventType
     round_id: str
+    map: str
     player: PlayerId
     victim: PlayerId
     ts: float
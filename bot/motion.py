@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional
+
+from .proximity import Pos
+
+
+class MotionTracker:
+    """Per-player velocity from successive position samples, for short-horizon prediction.
+
+    Velocity is an exponentially smoothed finite difference over the samples' `ts` (units
+    per second, horizontal only; jumps and stairs make vertical velocity noise). A gap longer
+    than `max_gap` or a jump faster than twice `max_speed` (respawn, teleport) resets the
+    player's velocity instead of producing a huge estimate. Predictions clamp speed to `max_speed`.
+    A player whose sample stops advancing for longer than `max_gap` (by the `now` clock) is
+    treated as stopped, so a stale velocity never outlives the samples it came from.
+    """
+
+    def __init__(self, horizon: float = 0.0, smoothing: float = 0.5, max_speed: float = 600.0,
+                 still_speed: float = 40.0, max_gap: float = 2.0):
+        self.configure(horizon, smoothing, max_speed, still_speed)
+        self.max_gap = max_gap
+        # uid -> [x, y, z, ts, vx, vy, seen]; seen is `now` at the last new sample
+        self._state: Dict[int, List[float]] = {}
+        # Players above still_speed in the last batch
+        self.moving = 0
+
+    def configure(self, horizon: float, smoothing: float, max_speed: float, still_speed: float) -> None:
+        self.horizon = max(0.0, horizon)
+        self.smoothing = min(1.0, max(0.0, smoothing))
+        self.max_speed = max_speed
+        self.still_speed = still_speed
+
+    def reset(self) -> None:
+        self._state.clear()
+        self.moving = 0
+
+    def speed(self, uid: int) -> float:
+        st = self._state.get(uid)
+        return math.hypot(st[4], st[5]) if st is not None else 0.0
+
+    def is_still(self, uid: int) -> bool:
+        return self.speed(uid) < self.still_speed
+
+    def predict(self, points: Dict[int, Pos], stamps: Dict[int, Optional[float]], now: float) -> Dict[int, Pos]:
+        """Record one batch and return each player's position `horizon` seconds ahead.
+
+        `stamps` holds per-player sample times (None means `now`); players missing from
+        `points` are forgotten.
+        """
+        state = self._state
+        for uid in [u for u in state if u not in points]:
+            del state[uid]
+        alpha = self.smoothing
+        horizon = self.horizon
+        max_speed = self.max_speed
+        out: Dict[int, Pos] = {}
+        moving = 0
+        for uid, p in points.items():
+            ts = stamps.get(uid)
+            if ts is None:
+                ts = now
+            st = state.get(uid)
+            if st is None:
+                state[uid] = [p.x, p.y, p.z, ts, 0.0, 0.0, now]
+                out[uid] = p
+                continue
+            dt = ts - st[3]
+            if dt <= 0.0:
+                # Same sample again (heartbeat or duplicate); keep the estimate until it goes stale
+                if now - st[6] > self.max_gap:
+                    st[4] = st[5] = 0.0
+                vx, vy = st[4], st[5]
+            else:
+                rx, ry = (p.x - st[0]) / dt, (p.y - st[1]) / dt
+                if dt > self.max_gap or rx * rx + ry * ry > 4.0 * max_speed * max_speed:
+                    vx = vy = 0.0
+                else:
+                    vx = st[4] + alpha * (rx - st[4])
+                    vy = st[5] + alpha * (ry - st[5])
+                st[0], st[1], st[2], st[3], st[4], st[5], st[6] = p.x, p.y, p.z, ts, vx, vy, now
+            speed = math.hypot(vx, vy)
+            if speed >= self.still_speed:
+                moving += 1
+            if horizon <= 0.0 or speed == 0.0:
+                out[uid] = p
+                continue
+            if speed > max_speed:
+                scale = max_speed / speed
+                vx, vy = vx * scale, vy * scale
+            out[uid] = Pos(p.x + vx * horizon, p.y + vy * horizon, p.z)
+        self.moving = moving
+        return out
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from typing import AbstractSet, Dict, List, Tuple
+
+
+def with_occupied(
+    channel_ids: List[int], clusters: List[List[int]], current: Dict[int, int], reusable: AbstractSet[int]
+) -> List[int]:
+    """channel_ids followed by any other `reusable` channels the clustered players sit in now.
+
+    The pool hands out the lowest-index channels, so without this a group already together
+    in, say, Cluster-5 would be moved into Cluster-1..n whenever the cluster count drops.
+    The extra channels go last, so clusters with no overlap still take the lowest ones.
+    """
+    have = set(channel_ids)
+    extra = {cid for members in clusters for uid in members
+             for cid in (current.get(uid),) if cid in reusable and cid not in have}
+    return channel_ids + sorted(extra) if extra else channel_ids
+
+
+def assign_channels(
+    clusters: List[List[int]], current: Dict[int, int], channel_ids: List[int]
+) -> Dict[int, int]:
+    """Map cluster index -> channel id so that as many members as possible stay put.
+
+    Greedy matching on overlap: (cluster, channel) pairs are taken by decreasing number of
+    members already in that channel, each cluster and channel used at most once. Ties break
+    by cluster index, then channel order, so the result is deterministic. Clusters with no
+    overlap take the remaining channels in order; clusters beyond len(channel_ids) stay
+    unassigned.
+    """
+    slot = {cid: i for i, cid in enumerate(channel_ids)}
+    pairs: List[Tuple[int, int, int]] = []  # (-overlap, cluster_idx, channel_slot)
+    for idx, members in enumerate(clusters):
+        counts: Dict[int, int] = {}
+        for uid in members:
+            cid = current.get(uid)
+            if cid in slot:
+                counts[cid] = counts.get(cid, 0) + 1
+        for cid, n in counts.items():
+            pairs.append((-n, idx, slot[cid]))
+    pairs.sort()
+
+    assignment: Dict[int, int] = {}
+    used: set[int] = set()
+    for _, idx, s in pairs:
+        if idx in assignment or s in used:
+            continue
+        assignment[idx] = channel_ids[s]
+        used.add(s)
+
+    free = (cid for i, cid in enumerate(channel_ids) if i not in used)
+    for idx in range(len(clusters)):
+        if idx in assignment:
+            continue
+        cid = next(free, None)
+        if cid is None:
+            break
+        assignment[idx] = cid
+    return assignment
+
+
+def plan_moves(
+    clusters: List[List[int]], current: Dict[int, int], channel_ids: List[int]
+) -> Tuple[Dict[int, int], List[Tuple[int, int]]]:
+    """Return (uid -> target channel id, minimal [(uid, channel_id)] moves).
+
+    Users already sitting in their target channel produce no move.
+    """
+    assignment = assign_channels(clusters, current, channel_ids)
+    targets: Dict[int, int] = {}
+    moves: List[Tuple[int, int]] = []
+    for idx, members in enumerate(clusters):
+        cid = assignment.get(idx)
+        if cid is None:
+            continue
+        for uid in members:
+            targets[uid] = cid
+            if current.get(uid) != cid:
+                moves.append((uid, cid))
+    return targets, moves
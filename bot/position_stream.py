@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+from .wire import PackedPos, iter_positions
+
+
+_SEQ_MOD = 2 ** 32
+
+
+class PositionStream:
+    """Rebuilds full position state from keyframe/delta position batches.
+
+    A keyframe ("mode": "keyframe") replaces the state. A delta carries only players whose
+    position changed plus a "removed" list of steamids, and must have seq == last + 1
+    (mod 2^32). On a gap the delta is still applied best-effort, but every response asks
+    the sender for a keyframe until one arrives. Deltas older than the last applied seq are
+    dropped. Batches without a mode pass through untouched. Players a delta leaves out are
+    re-stamped with the batch ts: they were sampled and had not moved.
+    """
+
+    def __init__(self) -> None:
+        self._state: Dict[str, PackedPos] = {}
+        self._seq: Optional[int] = None
+        self._synced = False
+        self.gaps = 0
+
+    def apply(self, ev: dict) -> Tuple[Optional[dict], bool]:
+        """Return (full-state batch to process or None, whether to request a keyframe)."""
+        mode = ev.get("mode")
+        if mode not in ("keyframe", "delta"):
+            return ev, False
+        seq = ev.get("seq")
+        if mode == "keyframe":
+            self._state = {p[0]: p for p in iter_positions(ev)}
+            self._seq = seq
+            self._synced = True
+            return self._snapshot(ev, changed=True), False
+
+        if self._seq is not None and seq is not None:
+            diff = (int(seq) - self._seq) % _SEQ_MOD
+            if diff == 0 or diff > _SEQ_MOD // 2:
+                # Duplicate or reordered late delta; newer data was already applied
+                return None, not self._synced
+            if diff != 1 and self._synced:
+                self.gaps += 1
+                self._synced = False
+        else:
+            # Delta before any keyframe (e.g. bridge restarted mid-round)
+            self._synced = False
+        if seq is not None:
+            self._seq = int(seq)
+
+        changed = False
+        for sid in ev.get("removed") or []:
+            if self._state.pop(str(sid), None) is not None:
+                changed = True
+        for p in iter_positions(ev):
+            self._state[p[0]] = p
+            changed = True
+        return self._snapshot(ev, changed=changed), not self._synced
+
+    def _snapshot(self, ev: dict, *, changed: bool) -> dict:
+        ts = ev.get("ts")
+        if ts is not None:
+            ts = float(ts)
+            state = self._state
+            for sid, p in state.items():
+                if p[4] != ts:
+                    state[sid] = (sid, p[1], p[2], p[3], ts)
+        return {
+            "type": "player_pos_batch",
+            "seq": self._seq,
+            "ts": ts,
+            "packed": list(self._state.values()),
+            # Lets the clustering stage reuse the previous result
+            "unchanged": not changed,
+        }
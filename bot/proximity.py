@@ -1,11 +1,20 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-import time
+import math
 import asyncio
-from typing import Optional, List
+from typing import Optional, List, Callable
 from typing import Dict, List, Tuple
 
+from .log import get_logger
+
+log = get_logger("ProxBot")
+
+try:
+    import numpy as np  # optional: vectorized clustering backend
+except ImportError:  # pragma: no cover - numpy is not a hard dependency
+    np = None
+
 
 @dataclass
 class Pos:
@@ -21,42 +30,309 @@ def dist2(a: Pos, b: Pos) -> float:
     return dx * dx + dy * dy + dz * dz
 
 
+def _finalize_clusters(components: List[List[int]], max_clusters: int) -> List[List[int]]:
+    """Order components deterministically and fold overflow into the last allowed cluster.
+
+    Members are sorted by user id; clusters are ordered by size (largest first), then by
+    their lowest user id. When there are more components than `max_clusters`, the smallest
+    ones are merged into the last cluster to avoid creating more channels.
+    """
+    for c in components:
+        c.sort()
+    components.sort(key=lambda c: (-len(c), c[0]))
+    limit = max(1, max_clusters)
+    if len(components) > limit:
+        overflow = sorted(uid for c in components[limit - 1:] for uid in c)
+        components = components[:limit - 1] + [overflow]
+    return components
+
+
 def cluster_positions(
     points: Dict[int, Pos], radius: float, max_clusters: int
 ) -> List[List[int]]:
-    # Simple greedy clustering: iterate points, assign to existing cluster if within radius of any member, else new cluster.
+    """Radius-connected components using a uniform spatial hash (cell size = radius).
+
+    Two players share a cluster when a chain of players, each within `radius` of the next,
+    links them. Each point is only compared with points in the 27 surrounding cells, so the
+    cost stays close to linear for realistic densities. The result does not depend on dict
+    iteration order.
+    """
+    if not points:
+        return []
+    uids = sorted(points)
+    if radius <= 0:
+        return _finalize_clusters([[uid] for uid in uids], max_clusters)
     r2 = radius * radius
-    clusters: List[List[int]] = []
+    inv = 1.0 / radius
+    parent = list(range(len(uids)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    xs: List[float] = []
+    ys: List[float] = []
+    zs: List[float] = []
+    grid: Dict[Tuple[int, int, int], List[int]] = {}
+    for i, uid in enumerate(uids):
+        p = points[uid]
+        x, y, z = p.x, p.y, p.z
+        xs.append(x)
+        ys.append(y)
+        zs.append(z)
+        cx, cy, cz = math.floor(x * inv), math.floor(y * inv), math.floor(z * inv)
+        # Compare against points already inserted in neighbouring cells (each pair once)
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for gz in (cz - 1, cz, cz + 1):
+                    cell = grid.get((gx, gy, gz))
+                    if not cell:
+                        continue
+                    for j in cell:
+                        dx = x - xs[j]
+                        dy = y - ys[j]
+                        dz = z - zs[j]
+                        if dx * dx + dy * dy + dz * dz <= r2:
+                            ri, rj = find(i), find(j)
+                            if ri != rj:
+                                parent[max(ri, rj)] = min(ri, rj)
+        grid.setdefault((cx, cy, cz), []).append(i)
+
+    groups: Dict[int, List[int]] = {}
+    for i, uid in enumerate(uids):
+        groups.setdefault(find(i), []).append(uid)
+    return _finalize_clusters(list(groups.values()), max_clusters)
+
+
+def cluster_positions_zoned(points: Dict[int, Pos], zones, radius: float, max_clusters: int) -> List[List[int]]:
+    """Room-aware clustering over a ZoneMap (bot/zones.py) instead of raw distance.
+
+    Players in the same zone share a cluster however far apart they stand. Two occupied zones
+    listed as adjacent merge when some pair of their players is within `radius` (talking
+    through a doorway); zones that are not adjacent never merge, so walls separate. Players
+    outside every zone fall back to radius clustering among themselves.
+    """
+    if not points:
+        return []
+    by_zone: Dict[int, List[int]] = {}
+    outside: Dict[int, Pos] = {}
     for uid, p in points.items():
-        placed = False
-        for c in clusters:
-            # check against first member as centroid proxy
-            ref = points[c[0]]
-            if dist2(p, ref) <= r2:
-                c.append(uid)
-                placed = True
-                break
-        if not placed:
-            if len(clusters) >= max_clusters:
-                # Put into the last cluster to avoid creating more channels
-                clusters[-1].append(uid) if clusters else clusters.append([uid])
-            else:
-                clusters.append([uid])
-    return clusters
+        zi = zones.locate(p)
+        if zi is None:
+            outside[uid] = p
+        else:
+            by_zone.setdefault(zi, []).append(uid)
 
+    parent = {zi: zi for zi in by_zone}
 
-_creation_tasks: dict[str, asyncio.Task] = {}
-_last_attempt: dict[str, float] = {}
+    def find(z: int) -> int:
+        while parent[z] != z:
+            parent[z] = parent[parent[z]]
+            z = parent[z]
+        return z
 
+    r2 = radius * radius
+    for zi in sorted(by_zone):
+        for zj in zones.neighbours[zi]:
+            if zj <= zi or zj not in by_zone:
+                continue
+            ri, rj = find(zi), find(zj)
+            if ri == rj:
+                continue
+            others = [points[u] for u in by_zone[zj]]
+            if any(dist2(points[u], q) <= r2 for u in by_zone[zi] for q in others):
+                parent[max(ri, rj)] = min(ri, rj)
+
+    groups: Dict[int, List[int]] = {}
+    for zi, members in by_zone.items():
+        groups.setdefault(find(zi), []).extend(members)
+    comps = list(groups.values())
+    if outside:
+        comps.extend(cluster_positions(outside, radius, len(outside)))
+    return _finalize_clusters(comps, max_clusters)
+
+
+class IncrementalClusterer:
+    """Stateful radius clustering that only revisits players who moved, joined or left.
+
+    Keeps each player's last clustered position in a spatial-hash grid plus per-player
+    neighbour sets. A player who moved less than `epsilon` since their stored position is
+    not touched (slow drift still accumulates until it crosses epsilon). Components are
+    rebuilt from the neighbour sets only when an edge or the player set changed; otherwise
+    the previous result is returned as-is, so callers must not mutate it.
+    """
+
+    def __init__(self, radius: float, max_clusters: int, epsilon: float = 16.0):
+        self.radius = radius
+        self.max_clusters = max_clusters
+        self.epsilon = epsilon
+        self.reset()
+
+    def reset(self) -> None:
+        self._pos: Dict[int, Pos] = {}
+        self._cell_of: Dict[int, Tuple[int, int, int]] = {}
+        self._grid: Dict[Tuple[int, int, int], set[int]] = {}
+        self._nbrs: Dict[int, set[int]] = {}
+        self._clusters: List[List[int]] = []
+        self.last_touched = 0
+
+    def configure(self, radius: float, max_clusters: int, epsilon: float) -> None:
+        """Apply (possibly reloaded) settings; a radius change invalidates the grid."""
+        if radius != self.radius:
+            self.radius = radius
+            self.reset()
+        if max_clusters != self.max_clusters:
+            self.max_clusters = max_clusters
+            self._clusters = self._components()
+        self.epsilon = epsilon
+
+    def _cell(self, p: Pos) -> Tuple[int, int, int]:
+        inv = 1.0 / self.radius
+        return (math.floor(p.x * inv), math.floor(p.y * inv), math.floor(p.z * inv))
+
+    def _detach(self, uid: int) -> None:
+        cell = self._cell_of.pop(uid, None)
+        if cell is not None:
+            members = self._grid.get(cell)
+            if members is not None:
+                members.discard(uid)
+                if not members:
+                    del self._grid[cell]
+        for other in self._nbrs.pop(uid, ()):
+            self._nbrs[other].discard(uid)
+
+    def _components(self) -> List[List[int]]:
+        seen: set[int] = set()
+        comps: List[List[int]] = []
+        for uid in sorted(self._pos):
+            if uid in seen:
+                continue
+            seen.add(uid)
+            comp = [uid]
+            stack = [uid]
+            while stack:
+                for other in self._nbrs[stack.pop()]:
+                    if other not in seen:
+                        seen.add(other)
+                        comp.append(other)
+                        stack.append(other)
+            comps.append(comp)
+        return _finalize_clusters(comps, self.max_clusters)
 
-async def _delete_channel(ch):
-    """Background delete a channel, with safe logging."""
-    try:
-        print(f"[ProxBot] cleanup: deleting empty cluster channel '{ch.name}' (id={ch.id})")
-        await ch.delete(reason="ProxChat cleanup: too many clusters")
-        print(f"[ProxBot] cleanup: deleted '{ch.name}'")
-    except Exception as e:
-        print(f"[ProxBot] WARN: Failed to delete cluster channel '{getattr(ch,'name',str(ch))}': {type(e).__name__}: {e}")
+    def update(self, points: Dict[int, Pos]) -> List[List[int]]:
+        if self.radius <= 0:
+            return cluster_positions(points, self.radius, self.max_clusters)
+        eps2 = self.epsilon * self.epsilon
+        left = [uid for uid in self._pos if uid not in points]
+        touched = [
+            uid for uid, p in points.items()
+            if uid not in self._pos or dist2(self._pos[uid], p) > eps2
+        ]
+        self.last_touched = len(touched) + len(left)
+        if not touched and not left:
+            return self._clusters
+        structural = bool(left) or any(uid not in self._pos for uid in touched)
+        # Snapshot edges of moved players before detaching anything
+        before = {uid: set(self._nbrs[uid]) for uid in touched if uid in self._pos}
+        for uid in left:
+            self._detach(uid)
+            del self._pos[uid]
+        for uid in touched:
+            self._detach(uid)
+            p = points[uid]
+            self._pos[uid] = p
+            cell = self._cell(p)
+            self._cell_of[uid] = cell
+            self._grid.setdefault(cell, set()).add(uid)
+            self._nbrs[uid] = set()
+        r2 = self.radius * self.radius
+        for uid in touched:
+            p = self._pos[uid]
+            cx, cy, cz = self._cell_of[uid]
+            nbrs = self._nbrs[uid]
+            for gx in (cx - 1, cx, cx + 1):
+                for gy in (cy - 1, cy, cy + 1):
+                    for gz in (cz - 1, cz, cz + 1):
+                        for other in self._grid.get((gx, gy, gz), ()):
+                            if other != uid and dist2(p, self._pos[other]) <= r2:
+                                nbrs.add(other)
+                                self._nbrs[other].add(uid)
+        if not structural:
+            # Every changed edge has a moved endpoint, so comparing their sets is sufficient
+            structural = any(before[uid] != self._nbrs[uid] for uid in before)
+        if structural:
+            self._clusters = self._components()
+        return self._clusters
+
+
+def cluster_coords_numpy(uids: List[int], coords, radius: float, max_clusters: int) -> List[List[int]]:
+    """Cluster an (n, 3) float64 array whose rows belong to `uids`; same output as cluster_positions.
+
+    Candidate pairs come from one matrix product (|a|^2 + |b|^2 - 2ab) with a small slack,
+    and are then confirmed with exact per-pair distances so ties at the radius match the
+    grid backend. Components are labelled by min-label propagation with pointer jumping.
+    """
+    n = len(uids)
+    if n == 0:
+        return []
+    if radius <= 0:
+        return _finalize_clusters([[uid] for uid in uids], max_clusters)
+    r2 = radius * radius
+    sq = np.einsum("ij,ij->i", coords, coords)
+    approx = sq[:, None] + sq[None, :] - 2.0 * (coords @ coords.T)
+    slack = 1e-9 * (4.0 * float(sq.max()) + r2) + 1e-6
+    ii, jj = np.nonzero(np.triu(approx <= r2 + slack, 1))
+    d = coords[ii] - coords[jj]
+    keep = (d[:, 0] ** 2 + d[:, 1] ** 2 + d[:, 2] ** 2) <= r2
+    ii, jj = ii[keep], jj[keep]
+    labels = np.arange(n)
+    while True:
+        new = labels.copy()
+        np.minimum.at(new, ii, labels[jj])
+        np.minimum.at(new, jj, labels[ii])
+        new = new[new]
+        if np.array_equal(new, labels):
+            break
+        labels = new
+    groups: Dict[int, List[int]] = {}
+    for uid, label in zip(uids, labels.tolist()):
+        groups.setdefault(label, []).append(uid)
+    return _finalize_clusters(list(groups.values()), max_clusters)
+
+
+def cluster_positions_numpy(
+    points: Dict[int, Pos], radius: float, max_clusters: int
+) -> List[List[int]]:
+    """NumPy backend for cluster_positions: loads the batch into one contiguous float64 array."""
+    uids = sorted(points)
+    coords = np.fromiter(
+        (c for uid in uids for c in (points[uid].x, points[uid].y, points[uid].z)),
+        dtype=np.float64,
+        count=3 * len(uids),
+    ).reshape(-1, 3)
+    return cluster_coords_numpy(uids, coords, radius, max_clusters)
+
+
+Clusterer = Callable[[Dict[int, Pos], float, int], List[List[int]]]
+_backend_warned = False
+
+
+def get_clusterer(backend: str) -> Clusterer:
+    """Resolve PROX_CLUSTER_BACKEND to a clustering function, falling back to pure Python."""
+    global _backend_warned
+    name = (backend or "grid").strip().lower()
+    if name == "numpy":
+        if np is not None:
+            return cluster_positions_numpy
+        if not _backend_warned:
+            log.warning("PROX_CLUSTER_BACKEND=numpy but NumPy is not installed; using grid backend.")
+            _backend_warned = True
+    elif name != "grid" and not _backend_warned:
+        log.warning(f"Unknown PROX_CLUSTER_BACKEND '{backend}'; using grid backend.")
+        _backend_warned = True
+    return cluster_positions
 
 
 async def _create_channel(guild, name: str, *, category_id: Optional[int] = None):
@@ -73,11 +349,11 @@ async def _create_channel(guild, name: str, *, category_id: Optional[int] = None
                 kwargs["category"] = cat
                 cat_ok = True
                 try:
-                    print(f"[ProxBot] ensure_cluster_channels(bg): using category '{cat.name}' ({category_id}) for '{name}'")
+                    log.debug(f"create: using category '{cat.name}' ({category_id}) for '{name}'")
                 except Exception:
                     pass
             else:
-                print(f"[ProxBot] WARN: PROX_CATEGORY_ID={category_id} not a category; creating '{name}' at root.")
+                log.warning(f"PROX_CATEGORY_ID={category_id} not a category; creating '{name}' at root.")
         except Exception:
             pass
     
@@ -88,20 +364,20 @@ async def _create_channel(guild, name: str, *, category_id: Optional[int] = None
                 guild.create_voice_channel(name, **kwargs, reason="ProxChat create cluster"),
                 timeout=TIMEOUT,
             )
-            print(f"[ProxBot] Created voice channel '{ch.name}' (id={ch.id})" + (f" in category '{kwargs['category'].name}'" if cat_ok else ""))
+            log.info(f"Created voice channel '{ch.name}' (id={ch.id})" + (f" in category '{kwargs['category'].name}'" if cat_ok else ""))
             return ch
         except asyncio.TimeoutError:
             if attempt < MAX_RETRIES:
                 wait = 2 ** attempt  # exponential backoff: 2s, 4s
-                print(f"[ProxBot] Create '{name}' timed out (attempt {attempt}/{MAX_RETRIES}), retrying in {wait}s...")
+                log.warning(f"Create '{name}' timed out (attempt {attempt}/{MAX_RETRIES}), retrying in {wait}s...")
                 await asyncio.sleep(wait)
             else:
-                print(f"[ProxBot] Create '{name}' timed out after {MAX_RETRIES} attempts")
+                log.warning(f"Create '{name}' timed out after {MAX_RETRIES} attempts")
                 break
         except Exception as e:
-            print(f"[ProxBot] ERROR: Failed to create cluster channel '{name}' with category: {type(e).__name__}: {e}")
+            log.error(f"Failed to create cluster channel '{name}' with category: {type(e).__name__}: {e}")
             if hasattr(e, 'status') and hasattr(e, 'code'):
-                print(f"[ProxBot] HTTP {e.status}, code={e.code}, text={getattr(e, 'text', '?')}")
+                log.error(f"HTTP {e.status}, code={e.code}, text={getattr(e, 'text', '?')}")
             break  # Don't retry on non-timeout errors
     
     # Fallback: try creating at guild root (with retries)
@@ -112,7 +388,7 @@ async def _create_channel(guild, name: str, *, category_id: Optional[int] = None
                     guild.create_voice_channel(name, reason="ProxChat create cluster (fallback)"),
                     timeout=TIMEOUT,
                 )
-                print(f"[ProxBot] Created voice channel '{ch.name}' at guild root (fallback)")
+                log.info(f"Created voice channel '{ch.name}' at guild root (fallback)")
                 # If a category was desired, attempt to move it into that category now
                 if category_id:
                     try:
@@ -123,22 +399,22 @@ async def _create_channel(guild, name: str, *, category_id: Optional[int] = None
                                 ch.edit(category=cat, reason="ProxChat move to category after fallback create"),
                                 timeout=TIMEOUT,
                             )
-                            print(f"[ProxBot] Moved '{ch.name}' into category '{cat.name}' after fallback create")
+                            log.info(f"Moved '{ch.name}' into category '{cat.name}' after fallback create")
                     except Exception as e3:
-                        print(f"[ProxBot] WARN: Could not move '{ch.name}' into category: {type(e3).__name__}: {e3}")
+                        log.warning(f"Could not move '{ch.name}' into category: {type(e3).__name__}: {e3}")
                 return ch
             except asyncio.TimeoutError:
                 if attempt < MAX_RETRIES:
                     wait = 2 ** attempt
-                    print(f"[ProxBot] Create '{name}' at root timed out (attempt {attempt}/{MAX_RETRIES}), retrying in {wait}s...")
+                    log.warning(f"Create '{name}' at root timed out (attempt {attempt}/{MAX_RETRIES}), retrying in {wait}s...")
                     await asyncio.sleep(wait)
                 else:
-                    print(f"[ProxBot] Create '{name}' at root timed out after {MAX_RETRIES} attempts")
+                    log.warning(f"Create '{name}' at root timed out after {MAX_RETRIES} attempts")
                     break
             except Exception as e2:
-                print(f"[ProxBot] ERROR: Failed to create cluster channel '{name}' at root: {type(e2).__name__}: {e2}")
+                log.error(f"Failed to create cluster channel '{name}' at root: {type(e2).__name__}: {e2}")
                 if hasattr(e2, 'status') and hasattr(e2, 'code'):
-                    print(f"[ProxBot] HTTP {e2.status}, code={e2.code}, text={getattr(e2, 'text', '?')}")
+                    log.error(f"HTTP {e2.status}, code={e2.code}, text={getattr(e2, 'text', '?')}")
                 break  # Don't retry on non-timeout errors
     
     # Last resort: clone an existing channel (e.g., '{prefix}-1') if present
@@ -146,17 +422,17 @@ async def _create_channel(guild, name: str, *, category_id: Optional[int] = None
     template_name = f"{prefix}-1"
     template = next((vc for vc in guild.voice_channels if vc.name == template_name), None)
     if template is None:
-        print(f"[ProxBot] No template channel '{template_name}' found for clone fallback")
+        log.warning(f"No template channel '{template_name}' found for clone fallback")
         return None
     
-    print(f"[ProxBot] Attempting clone fallback from '{template.name}' → '{name}'")
+    log.info(f"Attempting clone fallback from '{template.name}' → '{name}'")
     for attempt in range(1, MAX_RETRIES + 1):
         try:
             cloned = await asyncio.wait_for(
                 template.clone(name=name, reason="ProxChat clone fallback for cluster"),
                 timeout=TIMEOUT,
             )
-            print(f"[ProxBot] Cloned '{template.name}' to '{cloned.name}' as fallback")
+            log.info(f"Cloned '{template.name}' to '{cloned.name}' as fallback")
             if category_id:
                 try:
                     cat = guild.get_channel(category_id)
@@ -166,147 +442,21 @@ async def _create_channel(guild, name: str, *, category_id: Optional[int] = None
                             cloned.edit(category=cat, reason="ProxChat move cloned channel to category"),
                             timeout=TIMEOUT,
                         )
-                        print(f"[ProxBot] Moved cloned '{cloned.name}' into category '{cat.name}'")
+                        log.info(f"Moved cloned '{cloned.name}' into category '{cat.name}'")
                 except Exception as e4:
-                    print(f"[ProxBot] WARN: Could not move cloned '{cloned.name}' into category: {type(e4).__name__}: {e4}")
+                    log.warning(f"Could not move cloned '{cloned.name}' into category: {type(e4).__name__}: {e4}")
             return cloned
         except asyncio.TimeoutError:
             if attempt < MAX_RETRIES:
                 wait = 2 ** attempt
-                print(f"[ProxBot] Clone '{name}' timed out (attempt {attempt}/{MAX_RETRIES}), retrying in {wait}s...")
+                log.warning(f"Clone '{name}' timed out (attempt {attempt}/{MAX_RETRIES}), retrying in {wait}s...")
                 await asyncio.sleep(wait)
             else:
-                print(f"[ProxBot] Clone '{name}' timed out after {MAX_RETRIES} attempts")
+                log.warning(f"Clone '{name}' timed out after {MAX_RETRIES} attempts")
                 return None
         except Exception as e5:
-            print(f"[ProxBot] ERROR: Clone fallback failed for '{name}': {type(e5).__name__}: {e5}")
+            log.error(f"Clone fallback failed for '{name}': {type(e5).__name__}: {e5}")
             if hasattr(e5, 'status') and hasattr(e5, 'code'):
-                print(f"[ProxBot] HTTP {e5.status}, code={e5.code}, text={getattr(e5, 'text', '?')}")
+                log.error(f"HTTP {e5.status}, code={e5.code}, text={getattr(e5, 'text', '?')}")
             return None
     return None
-
-
-async def ensure_cluster_channels(
-    guild, prefix: str, category_id: int | None, count: int
-):
-    # Channels the bot can see
-    existing = [ch for ch in guild.voice_channels if ch.name.startswith(prefix)]
-    try:
-        names = ", ".join([f"{ch.name}({ch.id})" for ch in existing]) or "<none>"
-        print(f"[ProxBot] ensure_cluster_channels: found {len(existing)} existing for prefix '{prefix}': {names}")
-    except Exception:
-        pass
-    # Deterministically ensure names prefix-1..prefix-count exist
-    existing_by_name = {ch.name: ch for ch in existing}
-    # Determine missing desired names and schedule background creates
-    for i in range(1, count + 1):
-        name = f"{prefix}-{i}"
-        if name in existing_by_name:
-            continue
-        now = time.time()
-        last = _last_attempt.get(name, 0)
-        if now - last < 15:
-            try:
-                print(f"[ProxBot] ensure_cluster_channels: skipping create for '{name}' (last attempt {int(now-last)}s ago)")
-            except Exception:
-                pass
-            continue
-        _last_attempt[name] = now
-        if name in _creation_tasks and not _creation_tasks[name].done():
-            # Already creating
-            continue
-        try:
-            print(f"[ProxBot] ensure_cluster_channels: creating missing '{name}' (target count={count}, have={len(existing_by_name)})")
-        except Exception:
-            pass
-        # Fire-and-forget background creation; do not block event processing
-        _creation_tasks[name] = asyncio.create_task(_create_channel(guild, name, category_id=category_id))
-    # Refresh list (only channels the bot can see)
-    existing = [ch for ch in guild.voice_channels if ch.name.startswith(prefix)]
-    existing.sort(key=lambda c: c.name)
-    try:
-        names = ", ".join([f"{ch.name}({ch.id})" for ch in existing]) or "<none>"
-        print(f"[ProxBot] ensure_cluster_channels: returning first {min(len(existing), count)}: {names}")
-    except Exception:
-        pass
-    
-    # --- Automatic cleanup of extra empty cluster channels beyond `count` ---
-    def _parse_index(ch_name: str, prefix: str) -> int:
-        try:
-            part = ch_name[len(prefix) + 1:]
-            return int(part)
-        except Exception:
-            return 0
-    
-    extra_channels: List = []
-    for ch in existing:
-        idx = _parse_index(ch.name, prefix)
-        if idx > count:
-            # if category_id specified, only consider channels in that category for deletion
-            if category_id is not None and getattr(ch, "category_id", None) != category_id:
-                continue
-            extra_channels.append((idx, ch))
-    # Sort extra channels descending by index (delete highest indices first)
-    extra_channels.sort(reverse=True, key=lambda t: t[0])
-    for idx, ch in extra_channels:
-        try:
-            # Only delete if empty and not currently being created
-            if len(ch.members) == 0:
-                name = ch.name
-                # if a creation task for this name is running, skip deletion
-                if name in _creation_tasks and not _creation_tasks[name].done():
-                    print(f"[ProxBot] cleanup: skipping deletion for '{name}' because creation is in-flight")
-                    continue
-                # avoid immediate delete of a channel we just tried to create very recently
-                last_attempt_time = _last_attempt.get(name, 0)
-                if time.time() - last_attempt_time < 20:
-                    print(f"[ProxBot] cleanup: skipping deletion for '{name}' (recently created/attempted)")
-                    continue
-                # schedule background delete
-                asyncio.create_task(_delete_channel(ch))
-            else:
-                print(f"[ProxBot] cleanup: not deleting '{ch.name}' because it has members")
-        except Exception as e:
-            print(f"[ProxBot] WARN: error during cleanup check for '{getattr(ch,'name',str(ch))}': {type(e).__name__}: {e}")
-    # --- END cleanup logic ---
-    
-    return existing[:count]
-
-
-async def create_cluster_channels(
-    guild, prefix: str, category_id: int | None, count: int
-) -> List:
-    """Synchronously ensure up to 'count' cluster channels exist, returning the list of channels created in this call."""
-    created: List = []
-    # Refresh existing
-    existing = {ch.name: ch for ch in guild.voice_channels if ch.name.startswith(prefix)}
-    for i in range(1, count + 1):
-        name = f"{prefix}-{i}"
-        if name in existing:
-            continue
-        ch = await _create_channel(guild, name, category_id=category_id)
-        if ch:
-            created.append(ch)
-            existing[name] = ch
-    return created
-
-
-async def cleanup_cluster_channels(guild, prefix: str, *, category_id: int | None = None, exclude_ids: set[int] | None = None) -> int:
-    # Only delete empty channels with our prefix, optionally scoped to a category, and not in the exclude list
-    exclude_ids = exclude_ids or set()
-    deleted = 0
-    for ch in list(guild.voice_channels):
-        if not ch.name.startswith(prefix):
-            continue
-        if ch.id in exclude_ids:
-            continue
-        if category_id is not None and getattr(ch, "category_id", None) != category_id:
-            continue
-        if len(ch.members) == 0:
-            try:
-                await ch.delete(reason="ProxChat cleanup")
-                print(f"[ProxBot] Deleted empty cluster channel '{ch.name}' (id={ch.id})")
-                deleted += 1
-            except Exception as e:
-                print(f"[ProxBot] WARN: Failed to delete cluster channel '{ch.name}': {e}")
-    return deleted
\ No newline at end of file
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import gzip
+import json
+import queue
+import threading
+import time
+import zlib
+from typing import Iterator, Tuple
+
+from .log import get_logger
+
+log = get_logger("Recorder")
+
+
+_STOP = object()
+
+
+class EventRecorder:
+    """Appends every authenticated event, with its arrival time, to a gzip JSON-lines log.
+
+    Each line is {"t": <unix time>, "ev": <payload>}. record() only enqueues; serialization,
+    compression and file I/O run on a background thread. Each process start appends a new
+    gzip member, which gzip readers treat as one continuous stream.
+    """
+
+    def __init__(self, path: str, *, flush_sec: float = 1.0):
+        self.path = path
+        self.flush_sec = flush_sec
+        self.recorded = 0
+        self._q: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="event-recorder", daemon=True)
+        self._thread.start()
+        log.info(f"Recording events to {path}")
+
+    def record(self, ev: dict) -> None:
+        self._q.put((time.time(), ev))
+
+    def close(self) -> None:
+        self._q.put(_STOP)
+        self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        try:
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                last_flush = time.monotonic()
+                while True:
+                    try:
+                        item = self._q.get(timeout=self.flush_sec)
+                    except queue.Empty:
+                        item = None
+                    if item is _STOP:
+                        break
+                    if item is not None:
+                        t, ev = item
+                        f.write(json.dumps({"t": t, "ev": ev}, separators=(",", ":")) + "\n")
+                        self.recorded += 1
+                    if time.monotonic() - last_flush >= self.flush_sec:
+                        # Sync flush: a crash loses at most flush_sec of events
+                        f.flush()
+                        last_flush = time.monotonic()
+        except Exception as e:
+            log.warning(f"Recording stopped: {e}")
+
+
+def iter_recording(path: str) -> Iterator[Tuple[float, dict]]:
+    """Yield (arrival time, event) from a recorder log, stopping quietly at a truncated tail."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                yield float(item["t"]), item["ev"]
+    except (EOFError, gzip.BadGzipFile, zlib.error):
+        # Process was killed mid-write; everything before the last sync flush is intact
+        return
@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+import sqlite3
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Set, Tuple
+
+from .log import get_logger
+
+log = get_logger("Store")
 
 
 def load_mapping(path: str) -> Dict[str, int]:
@@ -37,4 +45,137 @@ def save_mapping(path: str, mapping: Dict[str, int]) -> None:
             if os.path.exists(tmp_path):
                 os.remove(tmp_path)
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+
+class MappingStore:
+    """SQLite-backed SteamID64 <-> Discord id links (MAPPING_DB).
+
+    The database runs in WAL mode with one row per SteamID, indexed by Discord id too. Reads
+    come from an in-memory cache: the shared steam_to_discord dict plus a reverse index.
+    Each link is a single upsert, run on the store's own writer thread so link bursts never
+    block the event loop. An existing MAPPING_FILE is imported once per path, the first
+    time it is found. Also persists pending link codes for LinkCodeStore.
+    """
+
+    def __init__(self, path: str, mapping: Optional[Dict[str, int]] = None):
+        self.path = path
+        # Shared with the bot and tenants; updated in place
+        self.mapping: Dict[str, int] = mapping if mapping is not None else {}
+        self._by_discord: Dict[int, Set[str]] = {}
+        # One thread owns the connection, which also serializes writes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mapping-store")
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: durable across process crashes, one fsync per checkpoint
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS links ("
+                " steamid TEXT PRIMARY KEY,"
+                " discord_id INTEGER NOT NULL,"
+                " linked_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS links_discord_id ON links(discord_id)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            # Pending /linksteam codes (see link_codes.LinkCodeStore)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS link_codes ("
+                " code TEXT PRIMARY KEY,"
+                " discord_id INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._db = db
+        return self._db
+
+    def load(self, import_json: Optional[str] = None) -> Dict[str, int]:
+        """Open the database (importing `import_json` the first time it is seen) and fill the cache."""
+        db = self._connect()
+        if import_json and Path(import_json).exists():
+            self._import_json(db, import_json)
+        self.mapping.clear()
+        self._by_discord.clear()
+        for sid, uid in db.execute("SELECT steamid, discord_id FROM links"):
+            self._cache(str(sid), int(uid))
+        return self.mapping
+
+    def _import_json(self, db: sqlite3.Connection, path: str) -> None:
+        # Recorded per file, and only once an import has run; links already in the database win
+        key = f"json_imported:{Path(path).resolve()}"
+        if db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone() is not None:
+            return
+        legacy = load_mapping(path)
+        now = time.time()
+        db.execute("BEGIN")
+        db.executemany(
+            "INSERT OR IGNORE INTO links (steamid, discord_id, linked_at) VALUES (?, ?, ?)",
+            [(sid, uid, now) for sid, uid in legacy.items()],
+        )
+        db.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(len(legacy))))
+        db.execute("COMMIT")
+        log.info(f"Imported {len(legacy)} links from {path} into {self.path}")
+
+    def _cache(self, steamid: str, discord_id: int) -> None:
+        prev = self.mapping.get(steamid)
+        if prev is not None and prev != discord_id:
+            self._by_discord.get(prev, set()).discard(steamid)
+        self.mapping[steamid] = discord_id
+        self._by_discord.setdefault(discord_id, set()).add(steamid)
+
+    def steamids_for(self, discord_id: int) -> Set[str]:
+        return set(self._by_discord.get(discord_id, ()))
+
+    def _upsert(self, steamid: str, discord_id: int, ts: float) -> None:
+        self._connect().execute(
+            "INSERT INTO links (steamid, discord_id, linked_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(steamid) DO UPDATE SET discord_id = excluded.discord_id, linked_at = excluded.linked_at",
+            (steamid, discord_id, ts),
+        )
+
+    def link(self, steamid: str, discord_id: int) -> asyncio.Future:
+        """Update the cache (and the shared mapping) immediately; the returned future resolves
+        once the row is written on the store thread."""
+        self._cache(steamid, discord_id)
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, self._upsert, steamid, discord_id, time.time())
+
+    def _background(self, fn, *args) -> None:
+        """Fire-and-forget write on the store thread; failures are logged, not raised."""
+        fut = self._executor.submit(fn, *args)
+
+        def _done(f) -> None:
+            if f.exception() is not None:
+                log.error(f"Background write failed: {f.exception()}")
+
+        fut.add_done_callback(_done)
+
+    def load_codes(self, now: float) -> List[Tuple[str, int, float]]:
+        """Unexpired link codes (startup); expired rows are deleted."""
+        db = self._connect()
+        db.execute("DELETE FROM link_codes WHERE expires_at <= ?", (now,))
+        return [(str(c), int(u), float(e)) for c, u, e in db.execute("SELECT code, discord_id, expires_at FROM link_codes")]
+
+    def save_code(self, code: str, discord_id: int, expires_at: float) -> None:
+        self._background(
+            lambda: self._connect().execute(
+                "INSERT OR REPLACE INTO link_codes (code, discord_id, expires_at) VALUES (?, ?, ?)",
+                (code, discord_id, expires_at),
+            )
+        )
+
+    def delete_codes(self, codes: List[str]) -> None:
+        rows = [(c,) for c in codes]
+        self._background(lambda: self._connect().executemany("DELETE FROM link_codes WHERE code = ?", rows))
+
+    def close(self) -> None:
+        def _close() -> None:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+        self._executor.submit(_close).result()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,501 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import discord
+from pydantic import BaseModel
+
+from .channel_pool import STATES, ChannelPool
+from .config import Settings
+from .dispatcher import MoveDispatcher, MoveIntent, PRIORITY_CLUSTER, PRIORITY_DEATH, PRIORITY_RESET
+from .cluster_pool import get_cluster_pool
+from .event_queue import EventQueue
+from .motion import MotionTracker
+from .metrics import CHANNEL_ENSURE_SECONDS, CLUSTER_SECONDS, MOVES_SUPPRESSED, Callback
+from .proximity import Pos, IncrementalClusterer, cluster_positions_zoned
+from .planner import plan_moves, with_occupied
+from .voice_index import VoiceIndex
+from .wire import iter_positions
+from .zones import invalidate_zones, zones_for
+from .log import get_logger
+
+if TYPE_CHECKING:
+    from .actuator import ActuatorLink
+
+log = get_logger("Tenant")
+
+
+# Server id used for events without "server_id" (single-server setups, older addons)
+DEFAULT_SERVER_ID = "default"
+
+
+class TenantConfig(BaseModel):
+    """One GMod server's Discord target. Unset fields fall back to the global settings."""
+
+    server_id: str
+    guild_id: Optional[int] = None
+    living_channel_id: Optional[int] = None
+    dead_channel_id: Optional[int] = None
+    prox_radius: Optional[float] = None
+    max_clusters: Optional[int] = None
+    channel_prefix: Optional[str] = None
+    category_id: Optional[int] = None
+    cluster_static_ids: Optional[str] = None
+
+
+def load_tenants(path: Optional[str], settings: Optional[Settings] = None) -> List[TenantConfig]:
+    """Read TENANTS_FILE (a JSON list of tenant objects). The env-configured server is always
+    present as "default" unless the file defines that id itself. With `settings`, tenants that
+    would share cluster channels (same guild and channel prefix) are rejected."""
+    tenants: List[TenantConfig] = []
+    if path:
+        p = Path(path)
+        if p.exists():
+            data = json.loads(p.read_text(encoding="utf-8"))
+            for item in data.get("tenants", []) if isinstance(data, dict) else data:
+                cfg = TenantConfig(**item)
+                if cfg.server_id != DEFAULT_SERVER_ID and None in (cfg.guild_id, cfg.living_channel_id, cfg.dead_channel_id):
+                    raise ValueError(f"tenant '{cfg.server_id}' needs guild_id, living_channel_id and dead_channel_id")
+                tenants.append(cfg)
+        else:
+            log.warning(f"TENANTS_FILE {path} not found; running single-server")
+    if not any(t.server_id == DEFAULT_SERVER_ID for t in tenants):
+        tenants.insert(0, TenantConfig(server_id=DEFAULT_SERVER_ID))
+    if settings is not None:
+        seen: Dict[Tuple[Optional[int], str], str] = {}
+        for cfg in tenants:
+            guild_id = cfg.guild_id if cfg.guild_id is not None else settings.GUILD_ID
+            prefix = cfg.channel_prefix if cfg.channel_prefix is not None else settings.PROX_CHANNEL_PREFIX
+            other = seen.setdefault((guild_id, prefix), cfg.server_id)
+            if other != cfg.server_id:
+                # Both pools would adopt (and delete) the same "{prefix}-N" channels
+                raise ValueError(f"tenants '{other}' and '{cfg.server_id}' share guild {guild_id} and "
+                                 f"channel_prefix '{prefix}'; give each a different channel_prefix")
+    return tenants
+
+
+class Tenant:
+    """Per-server proximity state: guild, channels, voice index, move dispatcher, clustering and
+    hysteresis, plus its own ordered event queue. The Discord client, the SteamID mapping and
+    pending link codes are shared between tenants."""
+
+    def __init__(self, client: Optional[discord.Client], cfg: TenantConfig, settings: Settings, mapping: Dict[str, int]):
+        self.client = client
+        self.cfg = cfg
+        self.server_id = cfg.server_id
+        # Shared with the client and every other tenant; replaced in place on reload
+        self.steam_to_discord = mapping
+        self._guild: Optional[discord.Guild] = None
+        self.log = get_logger(f"Tenant:{self.server_id}")
+        # Hysteresis state
+        self._last_cluster: Dict[int, int] = {}  # user_id -> target cluster channel id
+        self._stable_count: Dict[int, int] = {}
+        self._last_move_ts: Dict[int, float] = {}  # per-user move cooldown
+        self._last_cluster_move_ts: Dict[int, float] = {}  # per-cluster cooldown (channel_id -> ts)
+        # Last clustering result, reused for position batches flagged unchanged (delta stream)
+        self._last_clusters: Optional[list[list[int]]] = None
+        self._last_clustered: set[int] = set()
+        # uid -> voice channel id, fed by gateway voice/member events
+        self.voice = VoiceIndex()
+        # Permission/cache flags
+        self._perm_warned = False
+        self._can_manage_channels = False
+        self._can_move_members = False
+        self._can_mute_members = False
+        # Wall clock for cooldowns; the replay harness substitutes recorded arrival times
+        self.clock: Callable[[], float] = time.time
+        # Set in PROX_MODE=ingress: Discord work happens in the actuator process over this link
+        self.remote: Optional["ActuatorLink"] = None
+        # Ingress only: the actuator's pool channel ids, pushed with tenant state
+        self.remote_cluster_ids: Set[int] = set()
+        # Cluster channels, kept warm ahead of demand (used where Discord work happens)
+        self.pool = ChannelPool(self.server_id)
+        # Map of the current round (from round_start), for per-map zones
+        self.map_name: Optional[str] = None
+        # Per-player velocity for predictive clustering (PROX_PREDICT_HORIZON_SEC > 0)
+        self.motion = MotionTracker()
+        self.apply_settings(settings)
+        # Incremental clustering state (used when PROX_CLUSTER_INCREMENTAL is on)
+        self._incremental = IncrementalClusterer(self.prox_radius, self.max_clusters)
+        # All voice moves go through the dispatcher (priorities, supersession, 429 backoff)
+        self.dispatcher = MoveDispatcher(lambda: self._guild, concurrency=settings.PROX_MOVE_CONCURRENCY)
+        # Position batches are acked immediately and coalesced; control events stay ordered
+        self.queue = EventQueue(self.handle_event, name=self.server_id)
+
+    def apply_settings(self, settings: Settings) -> None:
+        """Adopt a settings snapshot; tenant-file values win over the global ones."""
+        cfg = self.cfg
+        self.settings = settings
+        guild_id = cfg.guild_id if cfg.guild_id is not None else settings.GUILD_ID
+        if getattr(self, "guild_id", guild_id) != guild_id:
+            self.log.warning(f"GUILD_ID changed to {guild_id}; restart required to switch guilds")
+        else:
+            self.guild_id = guild_id
+        self.living_channel = cfg.living_channel_id if cfg.living_channel_id is not None else settings.LIVING_CHANNEL_ID
+        self.dead_channel = cfg.dead_channel_id if cfg.dead_channel_id is not None else settings.DEAD_CHANNEL_ID
+        self.prox_radius = cfg.prox_radius if cfg.prox_radius is not None else settings.PROX_RADIUS
+        self.max_clusters = cfg.max_clusters if cfg.max_clusters is not None else settings.PROX_MAX_CLUSTERS
+        self.cluster_prefix = cfg.channel_prefix if cfg.channel_prefix is not None else settings.PROX_CHANNEL_PREFIX
+        self.cluster_category_id = cfg.category_id if cfg.category_id is not None else settings.PROX_CATEGORY_ID
+        self.cluster_static_ids = cfg.cluster_static_ids if cfg.cluster_static_ids is not None else settings.PROX_CLUSTER_STATIC_IDS
+        # Zones are re-read from PROX_ZONES_FILE on next use
+        invalidate_zones()
+        self.pool.configure(
+            prefix=self.cluster_prefix, category_id=self.cluster_category_id, static_ids=self.cluster_static_ids,
+            max_channels=self.max_clusters, spare=settings.PROX_SPARE_CHANNELS, drain_sec=settings.PROX_CHANNEL_DRAIN_SEC,
+        )
+        self.motion.configure(settings.PROX_PREDICT_HORIZON_SEC, settings.PROX_PREDICT_SMOOTHING,
+                              settings.PROX_PREDICT_MAX_SPEED, settings.PROX_PREDICT_STILL_SPEED)
+        if hasattr(self, "dispatcher"):
+            self.dispatcher.concurrency = settings.PROX_MOVE_CONCURRENCY
+
+    @property
+    def guild(self) -> discord.Guild:
+        assert self._guild is not None
+        return self._guild
+
+    @property
+    def ready(self) -> bool:
+        if self.remote is not None:
+            return self.remote.is_ready(self.server_id)
+        return self._guild is not None
+
+    def attach(self, guild: discord.Guild) -> None:
+        """Bind the resolved guild and seed the voice index from its cached voice states."""
+        self._guild = guild
+        self.voice.rebuild(guild)
+        self.voice.set_linked(self.steam_to_discord.values())
+        self.pool.attach(guild)
+
+    def refresh_perms(self) -> None:
+        try:
+            # Remote tenants get permission flags pushed by the actuator process
+            if not self._guild or self.remote is not None:
+                return
+            me = self.guild.me  # type: ignore
+            if not me:
+                return
+            perms = me.guild_permissions
+            before = (self._can_manage_channels, self._can_move_members, self._can_mute_members)
+            self._can_manage_channels = bool(perms.manage_channels)
+            self._can_move_members = bool(perms.move_members)
+            self._can_mute_members = bool(perms.mute_members or perms.deafen_members)
+            after = (self._can_manage_channels, self._can_move_members, self._can_mute_members)
+            # If permissions improved, clear warn flag so we can log future issues if they regress
+            if after > before and self._perm_warned and (self._can_manage_channels and self._can_move_members):
+                self._perm_warned = False
+        except Exception:
+            pass
+
+    async def resolve_cluster_channels(self, n: int) -> List[Tuple[int, str]]:
+        """(id, name) of the voice channels for n clusters from the channel pool; no Discord calls.
+        May return fewer than n while the pool is still creating channels."""
+        return self.pool.acquire(n)
+
+    async def _cluster_channels(self, n: int) -> List[Tuple[int, str]]:
+        if self.remote is None:
+            return await self.resolve_cluster_channels(n)
+        got = await self.remote.request({"op": "channels", "server_id": self.server_id, "count": n})
+        if got is None:
+            raise RuntimeError("actuator unavailable")
+        out = [(int(cid), str(name)) for cid, name in got]
+        self.remote_cluster_ids.update(cid for cid, _ in out)
+        return out
+
+    def cluster_channel_ids(self) -> Set[int]:
+        """Every cluster channel of this tenant, not just the ones handed out for this batch."""
+        return self.pool.channel_ids() if self.remote is None else self.remote_cluster_ids
+
+    def own_channels(self) -> Set[int]:
+        """Voice channels this tenant manages: Living, Dead and its cluster channels."""
+        return {cid for cid in (self.living_channel, self.dead_channel) if cid} | self.cluster_channel_ids()
+
+    async def _cleanup_clusters(self) -> int:
+        """Delete empty cluster channels beyond the pool's spares; returns how many were deleted."""
+        if self.remote is None:
+            return await self.pool.release()
+        return int(await self.remote.request({"op": "cleanup", "server_id": self.server_id}) or 0)
+
+    async def _reset_wave(self, reason: str, *, clear_policy: bool) -> None:
+        """Return linked users in this tenant's channels to Living (optionally unmuting), plus
+        unmute anyone in Dead.
+
+        Users elsewhere in the guild (other channels, another tenant sharing the guild) are left
+        alone. Move and unmute are merged into one intent per user and run with the dispatcher's
+        bounded parallelism.
+        """
+        t0 = time.perf_counter()
+        policy = False if clear_policy else None
+        linked = self.voice.linked_in_voice
+        targets: Dict[int, Optional[int]] = {
+            uid: self.living_channel
+            for cid in self.own_channels() for uid in self.voice.members_of(cid) if uid in linked
+        }
+        if clear_policy:
+            # Also clear anyone left in Dead, even if not mapped (unmute only)
+            for uid in self.voice.members_of(self.dead_channel):
+                targets.setdefault(uid, None)
+        futures = [
+            self.dispatcher.submit(MoveIntent(uid, cid, PRIORITY_RESET, mute=policy, deafen=policy))
+            for uid, cid in targets.items()
+        ]
+        results = await asyncio.gather(*futures) if futures else []
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        self.log.info(f"{reason}: reset wave applied {sum(1 for r in results if r)}/{len(results)} users in {elapsed_ms:.0f} ms")
+
+    async def handle_event(self, ev: dict):
+        t = ev.get("type")
+        # Ignore until the Discord client is ready and this tenant's guild is set
+        if not self.ready:
+            self.log.info("Received event before guild ready; ignoring", type=t if t is not None else "?", sample=True)
+            return
+
+        s = self.settings
+        # Refresh permissions to pick up mid-run role changes
+        self.refresh_perms()
+
+        if t == "player_death":
+            player = ev.get("player", {})
+            steamid = player.get("steamid64")
+            if steamid and steamid in self.steam_to_discord:
+                uid = self.steam_to_discord[steamid]
+                self.log.info("player_death", steamid=steamid, uid=uid)
+                # Move to Dead channel and optionally server mute/deafen (jumps ahead of other moves)
+                self.dispatcher.submit(MoveIntent(
+                    uid,
+                    self.dead_channel,
+                    PRIORITY_DEATH,
+                    mute=s.PROX_DEAD_MUTE,
+                    deafen=s.PROX_DEAD_DEAFEN,
+                ))
+        elif t == "round_end":
+            self.log.info("round_end: returning mapped users to Living and clearing mute/deafen")
+            # Clear all hysteresis and cooldown state to prevent carryover into next round
+            self._last_cluster.clear()
+            self._stable_count.clear()
+            self.motion.reset()
+            self._last_move_ts.clear()
+            self._last_cluster_move_ts.clear()
+            self._incremental.reset()
+            self._last_clusters = None
+            # Pending cluster moves are stale now
+            self.dispatcher.cancel(PRIORITY_CLUSTER)
+            # Return users to Living and clear mute/deafen; wait so cleanup sees empty cluster channels
+            await self._reset_wave("round_end", clear_policy=True)
+            # Optional cleanup of empty cluster channels
+            if self._can_manage_channels and s.PROX_CLEANUP_CLUSTERS:
+                self.log.info("round_end: cleaning up empty cluster channels")
+                try:
+                    await self._cleanup_clusters()
+                except Exception as e:
+                    self.log.error(f"Cleanup error: {e}")
+        elif t == "round_start":
+            self.map_name = ev.get("map") or self.map_name
+            self.log.info("round_start: normalizing users to Living", map=self.map_name)
+            # Optional: move mapped users that are already in voice to Living (normalize state)
+            if s.PROX_MOVE_TO_LIVING_ON_START:
+                # Don't hold up the first position batches; queued resets outrank cluster moves anyway
+                asyncio.create_task(self._reset_wave("round_start", clear_policy=False))
+        elif t == "player_pos_batch":
+            # Respect config toggle
+            if not s.PROX_ENABLE_CLUSTERING:
+                return
+            # Build a map of discord user -> last position (JSON or packed batch)
+            count = len(ev.get("packed") or ev.get("positions") or [])
+            self.log.debug("player_pos_batch received", positions=count, sample=True)
+            pts: Dict[int, Pos] = {}
+            current_channel: Dict[int, int] = {}  # uid -> voice channel id at batch time
+            stamps: Dict[int, Optional[float]] = {}
+            for sid, x, y, z, ts in iter_positions(ev):
+                uid = self.steam_to_discord.get(sid)
+                if not uid:
+                    continue
+                # Not in voice; clustering won't move them (index lookup, no member cache/network)
+                cid = self.voice.channel_of(uid)
+                if cid is None:
+                    continue
+                current_channel[uid] = cid
+                pts[uid] = Pos(x, y, z)
+                stamps[uid] = ts
+
+            if not pts:
+                # Nothing to do because no mapped users currently in voice
+                return
+
+            # Predictive mode clusters on where players will be in PROX_PREDICT_HORIZON_SEC
+            predicting = s.PROX_PREDICT_HORIZON_SEC > 0
+            if predicting:
+                pts = self.motion.predict(pts, stamps, self.clock())
+
+            # Room-aware clustering when the zones file covers this round's map
+            zmap = zones_for(s.PROX_ZONES_FILE, self.map_name) if s.PROX_ZONES_FILE else None
+            if (ev.get("unchanged") and self._last_clusters is not None and self._last_clustered == pts.keys()
+                    and not (predicting and self.motion.moving)):
+                # Nobody moved and nobody joined/left voice; skip clustering, keep hysteresis ticking
+                clusters = self._last_clusters
+            elif zmap is not None:
+                with CLUSTER_SECONDS.time("zones"):
+                    clusters = cluster_positions_zoned(pts, zmap, self.prox_radius, self.max_clusters)
+            elif s.PROX_CLUSTER_INCREMENTAL:
+                self._incremental.configure(self.prox_radius, self.max_clusters, s.PROX_INCREMENTAL_EPSILON)
+                with CLUSTER_SECONDS.time("incremental"):
+                    clusters = self._incremental.update(pts)
+            else:
+                # Inline for small batches; large ones go to the process pool via shared memory
+                pool = get_cluster_pool(s.PROX_CLUSTER_WORKERS, s.PROX_CLUSTER_POOL_MIN_PLAYERS)
+                with CLUSTER_SECONDS.time(s.PROX_CLUSTER_BACKEND):
+                    clusters = await pool.cluster(pts, self.prox_radius, self.max_clusters, s.PROX_CLUSTER_BACKEND)
+            self._last_clusters = clusters
+            self._last_clustered = set(pts)
+            if not clusters:
+                return
+
+            # Ensure enough cluster channels exist (requires Manage Channels)
+            if not self._can_manage_channels:
+                if not self._perm_warned:
+                    self.log.warning("Missing 'Manage Channels' permission; clustering disabled.")
+                    self._perm_warned = True
+                return
+            try:
+                # Static channels if configured, else the warm pool
+                with CHANNEL_ENSURE_SECONDS.time():
+                    channels = await self._cluster_channels(len(clusters))
+            except Exception as e:
+                if not self._perm_warned:
+                    self.log.warning(f"Could not get cluster channels: {e}")
+                    self._perm_warned = True
+                return
+
+            # Keep clusters in the channel most of their members already occupy, including
+            # cluster channels beyond the first len(clusters)
+            channel_ids = with_occupied([cid for cid, _ in channels], clusters, current_channel,
+                                        self.cluster_channel_ids())
+            names = dict(channels)
+            targets, moves = plan_moves(clusters, current_channel, channel_ids)
+
+            # Hysteresis and throttling
+            now = self.clock()
+            # Allow faster moves when configured for static clusters
+            if s.PROX_FAST_MOVE_ON_CHANGE:
+                stability_needed = 1
+            else:
+                stability_needed = s.PROX_STABILITY_BATCHES
+            # With prediction, a player who has stopped is where they mean to be: one batch is
+            # enough. Moving players still need the full count, and are only moved into a
+            # cluster someone has stopped in; players in transit (alone or with other movers)
+            # stay where they are until they arrive.
+            fast_if_still = predicting and stability_needed > 1
+            anchored = {target for uid, target in targets.items() if self.motion.is_still(uid)} if predicting else None
+            min_interval = s.PROX_MIN_MOVE_INTERVAL_SEC
+            cluster_cooldown = s.PROX_CLUSTER_COOLDOWN_SEC
+            # Only users currently in Living or a cluster channel are moveable
+            # This prevents moving spectators or users in Dead, AFK or unrelated channels
+            valid_channel_ids = {self.living_channel, *channel_ids}
+
+            # Track stability of every user's target, including those already in place
+            for uid, target in targets.items():
+                if current_channel.get(uid) not in valid_channel_ids:
+                    continue
+                if self._last_cluster.get(uid) == target:
+                    self._stable_count[uid] = self._stable_count.get(uid, 0) + 1
+                else:
+                    self._last_cluster[uid] = target
+                    self._stable_count[uid] = 1
+
+            # Move users that stabilized into a cluster and passed min interval
+            submitted = 0
+            for uid, target in moves:
+                if current_channel.get(uid) not in valid_channel_ids:
+                    MOVES_SUPPRESSED.inc("not_moveable")
+                    continue
+
+                # Check per-user cooldown
+                last_move = self._last_move_ts.get(uid, 0.0)
+                if (now - last_move) < min_interval:
+                    MOVES_SUPPRESSED.inc("user_cooldown")
+                    continue
+
+                # Check per-channel cooldown to avoid rapid reassignments into the same cluster
+                last_cluster_move = self._last_cluster_move_ts.get(target, 0.0)
+                if (now - last_cluster_move) < cluster_cooldown:
+                    MOVES_SUPPRESSED.inc("cluster_cooldown")
+                    continue
+
+                # Check stability threshold
+                if anchored is not None and target not in anchored:
+                    MOVES_SUPPRESSED.inc("in_transit")
+                    continue
+                needed = 1 if fast_if_still and self.motion.is_still(uid) else stability_needed
+                if self._stable_count.get(uid, 0) >= needed:
+                    if not self._can_move_members:
+                        if not self._perm_warned:
+                            self.log.warning("Missing 'Move Members' permission; cannot move users between channels.")
+                            self._perm_warned = True
+                        MOVES_SUPPRESSED.inc("no_permission")
+                        continue
+                    self.log.debug("Moving user", uid=uid, channel=names.get(target, target))
+                    submitted += 1
+                    # Fire and forget: a newer target or a death supersedes this while queued
+                    self.dispatcher.submit(MoveIntent(uid, target, PRIORITY_CLUSTER))
+                    self._last_move_ts[uid] = now
+                    self._last_cluster_move_ts[target] = now
+                else:
+                    MOVES_SUPPRESSED.inc("unstable")
+            if submitted:
+                self.log.info("Cluster moves submitted", moves=submitted, clusters=len(clusters), sample=True)
+        else:
+            # Unknown event type ignored
+            pass
+
+
+# Per-tenant gauges, read only when /metrics is scraped
+QUEUE_DEPTH = Callback("proxchat_queue_depth", "Events waiting in the tenant's event queue.", ["server"])
+MOVE_QUEUE_DEPTH = Callback("proxchat_move_queue_depth", "Move intents waiting in the tenant's dispatcher.", ["server"])
+TRACKED_PLAYERS = Callback("proxchat_tracked_players", "Linked players in voice in the last clustered batch.", ["server"])
+CLUSTERS = Callback("proxchat_clusters", "Clusters in the last clustered batch.", ["server"])
+CLUSTER_CHANNELS = Callback("proxchat_cluster_channels", "Pooled cluster channels by state.", ["server", "state"])
+VOICE_USERS = Callback("proxchat_voice_users", "Users in voice in the tenant's guild.", ["server"])
+MOVES = Callback("proxchat_dispatcher_moves_total", "Dispatcher outcomes (in the process running Discord).", ["server", "outcome"], kind="counter")
+POS_DROPPED = Callback("proxchat_position_batches_dropped_total", "Position batches dropped before handling.", ["server", "reason"], kind="counter")
+
+
+def _track(tenant: Tenant) -> None:
+    sid = (tenant.server_id,)
+    QUEUE_DEPTH.track(sid, lambda: tenant.queue.depth)
+    MOVE_QUEUE_DEPTH.track(sid, lambda: tenant.dispatcher.depth)
+    TRACKED_PLAYERS.track(sid, lambda: len(tenant._last_clustered))
+    CLUSTERS.track(sid, lambda: len(tenant._last_clusters or []))
+    VOICE_USERS.track(sid, lambda: len(tenant.voice))
+    for state in STATES:
+        CLUSTER_CHANNELS.track(sid + (state,), lambda state=state: tenant.pool.counts()[state])
+    for outcome in ("executed", "superseded", "rate_limited"):
+        MOVES.track(sid + (outcome,), lambda outcome=outcome: getattr(tenant.dispatcher, outcome))
+    POS_DROPPED.track(sid + ("superseded",), lambda: tenant.queue.dropped_superseded)
+    POS_DROPPED.track(sid + ("out_of_order",), lambda: tenant.queue.dropped_out_of_order)
+
+
+def build_tenants(configs: List[TenantConfig], settings: Settings, mapping: Dict[str, int],
+                  client: Optional[discord.Client] = None) -> Dict[str, Tenant]:
+    tenants = {cfg.server_id: Tenant(client, cfg, settings, mapping) for cfg in configs}
+    for tenant in tenants.values():
+        _track(tenant)
+    return tenants
+
+
+async def route_event(tenants: Dict[str, Tenant], ev: dict,
+                      handle_link: Callable[[dict], Awaitable[Optional[dict]]]) -> Optional[dict]:
+    """HTTP entry point: links are handled inline and shared; everything else goes to the
+    event queue of the tenant named by "server_id" (missing means the default tenant)."""
+    if ev.get("type") == "link_attempt":
+        return await handle_link(ev)
+    server_id = str(ev.get("server_id") or DEFAULT_SERVER_ID)
+    tenant = tenants.get(server_id)
+    if tenant is None:
+        log.warning("Event for unknown server_id; add it to TENANTS_FILE", server_id=server_id,
+                    key=f"unknown-server:{server_id}", sample=True)
+        return {"queued": False, "reason": "unknown_server"}
+    return await tenant.queue.dispatch(ev)
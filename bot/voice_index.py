@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+
+class VoiceIndex:
+    """uid -> current voice channel id, maintained from gateway events instead of per-batch lookups.
+
+    Also tracks the set of linked users (those with a SteamID mapping) who are in voice right
+    now, so position batches can filter and resolve each player in O(1) without touching the
+    member cache or the network.
+    """
+
+    def __init__(self) -> None:
+        self._channel_of: Dict[int, int] = {}
+        self._members_of: Dict[int, Set[int]] = {}
+        self._linked: Set[int] = set()
+        self.linked_in_voice: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._channel_of)
+
+    def rebuild(self, guild) -> None:
+        """Reseed from the guild's cached voice states (on ready/resume)."""
+        channels = list(getattr(guild, "voice_channels", [])) + list(getattr(guild, "stage_channels", []))
+        self.reset((m.id, ch.id) for ch in channels for m in ch.members)
+
+    def reset(self, states: Iterable[Tuple[int, int]]) -> None:
+        """Replace all state with (uid, channel_id) pairs, e.g. a snapshot from the actuator process."""
+        self._channel_of.clear()
+        self._members_of.clear()
+        self.linked_in_voice.clear()
+        for uid, channel_id in states:
+            self.update(uid, channel_id)
+
+    def states(self) -> list:
+        """Current (uid, channel_id) pairs."""
+        return list(self._channel_of.items())
+
+    def set_linked(self, uids: Iterable[int]) -> None:
+        self._linked = set(uids)
+        self.linked_in_voice = {uid for uid in self._channel_of if uid in self._linked}
+
+    def link(self, uid: int) -> None:
+        self._linked.add(uid)
+        if uid in self._channel_of:
+            self.linked_in_voice.add(uid)
+
+    def unlink(self, uid: int) -> None:
+        """uid lost its last SteamID link (relinked to another account)."""
+        self._linked.discard(uid)
+        self.linked_in_voice.discard(uid)
+
+    def update(self, uid: int, channel_id: Optional[int]) -> None:
+        prev = self._channel_of.get(uid)
+        if prev == channel_id:
+            return
+        if prev is not None:
+            members = self._members_of.get(prev)
+            if members is not None:
+                members.discard(uid)
+                if not members:
+                    del self._members_of[prev]
+        if channel_id is None:
+            self._channel_of.pop(uid, None)
+            self.linked_in_voice.discard(uid)
+            return
+        self._channel_of[uid] = channel_id
+        self._members_of.setdefault(channel_id, set()).add(uid)
+        if uid in self._linked:
+            self.linked_in_voice.add(uid)
+
+    def channel_of(self, uid: int) -> Optional[int]:
+        return self._channel_of.get(uid)
+
+    def members_of(self, channel_id: int) -> Set[int]:
+        return self._members_of.get(channel_id, set())
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import math
+import struct
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+
+# Packed position batches (see docs/events.md, "Binary position batches")
+WIRE_CONTENT_TYPE = "application/x-proxchat-pos"
+WIRE_MAGIC = b"PXPB"
+WIRE_VERSION = 1
+FLAG_TABLE = 0x01  # frame carries the full steamid table for table_id
+FLAG_KEYFRAME = 0x02  # delta stream: full state
+FLAG_DELTA = 0x04  # delta stream: changed players only; NaN coordinates mark removed players
+
+# magic, version, flags, table_count, record_count, table_id, seq, ts_ms
+HEADER = struct.Struct("<4sBBHHIII")
+# Steam account id (SteamID64 minus STEAMID64_BASE)
+TABLE_ENTRY = struct.Struct("<I")
+# slot, x, y, z
+RECORD = struct.Struct("<Hfff")
+
+STEAMID64_BASE = 76561197960265728
+
+# (steamid64, x, y, z, ts)
+PackedPos = Tuple[str, float, float, float, Optional[float]]
+
+
+class WireError(ValueError):
+    """Malformed or undecodable frame; `reason` is returned to the sender."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class PositionDecoder:
+    """Decodes packed position frames, remembering recent steamid tables by table_id.
+
+    Works directly on a memoryview of the request body; the only objects created per
+    record are the resulting tuples.
+    """
+
+    def __init__(self, max_tables: int = 4):
+        self.max_tables = max_tables
+        self._tables: "OrderedDict[int, List[str]]" = OrderedDict()
+
+    def decode(self, body: bytes) -> dict:
+        mv = memoryview(body)
+        if len(mv) < HEADER.size:
+            raise WireError("short_frame")
+        magic, version, flags, table_count, record_count, table_id, seq, ts_ms = HEADER.unpack_from(mv, 0)
+        if magic != WIRE_MAGIC:
+            raise WireError("bad_magic")
+        if version != WIRE_VERSION:
+            raise WireError("unsupported_version")
+        off = HEADER.size
+        if flags & FLAG_TABLE:
+            end = off + table_count * TABLE_ENTRY.size
+            if len(mv) < end:
+                raise WireError("short_frame")
+            self._tables[table_id] = [str(STEAMID64_BASE + acct) for (acct,) in TABLE_ENTRY.iter_unpack(mv[off:end])]
+            self._tables.move_to_end(table_id)
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+            off = end
+        table = self._tables.get(table_id)
+        if table is None:
+            # Sender must resend the table (e.g. after a bridge restart)
+            raise WireError("unknown_table")
+        end = off + record_count * RECORD.size
+        if len(mv) < end:
+            raise WireError("short_frame")
+        ts = ts_ms / 1000.0
+        n = len(table)
+        packed: List[PackedPos] = []
+        removed: List[str] = []
+        for slot, x, y, z in RECORD.iter_unpack(mv[off:end]):
+            if slot >= n:
+                continue
+            if math.isnan(x):
+                removed.append(table[slot])
+            else:
+                packed.append((table[slot], x, y, z, ts))
+        ev = {"type": "player_pos_batch", "seq": seq, "ts": ts, "packed": packed}
+        if flags & FLAG_KEYFRAME:
+            ev["mode"] = "keyframe"
+        elif flags & FLAG_DELTA:
+            ev["mode"] = "delta"
+            ev["removed"] = removed
+        return ev
+
+
+def iter_positions(ev: dict) -> Iterator[PackedPos]:
+    """Yield (steamid64, x, y, z, ts) from a position batch in either JSON or packed form."""
+    packed = ev.get("packed")
+    if packed is not None:
+        yield from packed
+        return
+    for item in ev.get("positions") or []:
+        sid = (item.get("player") or {}).get("steamid64")
+        if not sid:
+            continue
+        pos = item.get("pos") or {}
+        ts = item.get("ts")
+        yield (
+            str(sid),
+            float(pos.get("x", 0)),
+            float(pos.get("y", 0)),
+            float(pos.get("z", 0)),
+            float(ts) if ts is not None else None,
+        )
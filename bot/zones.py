@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from .log import get_logger
+from .proximity import Pos
+
+log = get_logger("Zones")
+
+
+# Per-map zone definitions (PROX_ZONES_FILE), e.g.
+#   { "maps": { "ttt_minecraft_b5": {
+#       "zones": [ { "name": "lobby", "min": [0, 0, 0], "max": [512, 1024, 256] },
+#                  { "name": "hall", "polygon": [[512, 0], [2048, 0], [2048, 256]], "z": [0, 256] } ],
+#       "adjacent": [ ["lobby", "hall"] ] } } }
+# Boxes are axis-aligned; polygons are XY outlines with an optional [zmin, zmax] range. Where
+# zones overlap, the one listed first wins, so list small rooms before the areas around them.
+
+
+class Zone:
+    __slots__ = ("name", "xmin", "ymin", "zmin", "xmax", "ymax", "zmax", "poly")
+
+    def __init__(self, name: str, lo: Sequence[float], hi: Sequence[float],
+                 poly: Optional[List[Tuple[float, float]]] = None):
+        self.name = name
+        self.xmin, self.ymin, self.zmin = lo
+        self.xmax, self.ymax, self.zmax = hi
+        self.poly = poly
+
+    def contains(self, x: float, y: float, z: float) -> bool:
+        if not (self.xmin <= x <= self.xmax and self.ymin <= y <= self.ymax and self.zmin <= z <= self.zmax):
+            return False
+        poly = self.poly
+        if poly is None:
+            return True
+        # Even-odd ray cast along +x
+        inside = False
+        x1, y1 = poly[-1]
+        for x2, y2 in poly:
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+            x1, y1 = x2, y2
+        return inside
+
+
+class ZoneMap:
+    """Zones of one map plus their adjacency, indexed by a uniform XY grid.
+
+    Each grid cell lists the zones whose bounding box overlaps it, in file order, so
+    locating a point is one dict lookup and a few containment tests.
+    """
+
+    def __init__(self, name: str, zones: List[Zone], adjacent: List[Tuple[int, int]], cell: Optional[float] = None):
+        self.name = name
+        self.zones = zones
+        self.neighbours: List[Set[int]] = [set() for _ in zones]
+        for a, b in adjacent:
+            self.neighbours[a].add(b)
+            self.neighbours[b].add(a)
+        if cell is None:
+            # About one cell per typical zone
+            extents = [max(z.xmax - z.xmin, z.ymax - z.ymin) for z in zones]
+            cell = max(64.0, sum(extents) / len(extents)) if extents else 1024.0
+        self.cell = cell
+        inv = self._inv = 1.0 / cell
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        for i, z in enumerate(zones):
+            for gx in range(math.floor(z.xmin * inv), math.floor(z.xmax * inv) + 1):
+                for gy in range(math.floor(z.ymin * inv), math.floor(z.ymax * inv) + 1):
+                    self._grid.setdefault((gx, gy), []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.zones)
+
+    def locate(self, p: Pos) -> Optional[int]:
+        """Index of the first zone containing p, or None outside every zone."""
+        inv = self._inv
+        cell = self._grid.get((math.floor(p.x * inv), math.floor(p.y * inv)))
+        if cell:
+            for i in cell:
+                if self.zones[i].contains(p.x, p.y, p.z):
+                    return i
+        return None
+
+
+def _vec(value, n: int, what: str) -> List[float]:
+    if not isinstance(value, (list, tuple)) or len(value) != n:
+        raise ValueError(f"{what} must be a list of {n} numbers")
+    return [float(v) for v in value]
+
+
+def parse_zone_map(name: str, data: dict) -> ZoneMap:
+    zones: List[Zone] = []
+    index: Dict[str, int] = {}
+    for i, z in enumerate(data.get("zones") or []):
+        zname = str(z.get("name") or f"zone{i}")
+        if zname in index:
+            raise ValueError(f"{name}: duplicate zone name '{zname}'")
+        if "polygon" in z:
+            poly = [tuple(_vec(pt, 2, f"{name}/{zname} polygon point")) for pt in z["polygon"]]
+            if len(poly) < 3:
+                raise ValueError(f"{name}/{zname}: polygon needs at least 3 points")
+            zlo, zhi = _vec(z["z"], 2, f"{name}/{zname} z") if "z" in z else (-math.inf, math.inf)
+            lo = (min(x for x, _ in poly), min(y for _, y in poly), zlo)
+            hi = (max(x for x, _ in poly), max(y for _, y in poly), zhi)
+            zones.append(Zone(zname, lo, hi, poly))  # type: ignore[arg-type]
+        else:
+            a, b = _vec(z.get("min"), 3, f"{name}/{zname} min"), _vec(z.get("max"), 3, f"{name}/{zname} max")
+            zones.append(Zone(zname, [min(u, v) for u, v in zip(a, b)], [max(u, v) for u, v in zip(a, b)]))
+        index[zname] = i
+    adjacent: List[Tuple[int, int]] = []
+    for pair in data.get("adjacent") or []:
+        if len(pair) != 2 or pair[0] not in index or pair[1] not in index:
+            raise ValueError(f"{name}: adjacency {pair!r} names an unknown zone")
+        adjacent.append((index[pair[0]], index[pair[1]]))
+    cell = data.get("cell")
+    return ZoneMap(name, zones, adjacent, float(cell) if cell else None)
+
+
+def load_zones(path: str) -> Dict[str, ZoneMap]:
+    """Map name -> ZoneMap from a PROX_ZONES_FILE."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {str(name): parse_zone_map(str(name), m) for name, m in (data.get("maps") or {}).items()}
+
+
+# Loaded once per path; dropped on settings reload so edits to the file are picked up
+_cache: Dict[str, Dict[str, ZoneMap]] = {}
+
+
+def zones_for(path: str, map_name: Optional[str]) -> Optional[ZoneMap]:
+    """Zones for map_name from the zones file, or None (no map known, or none defined for it)."""
+    maps = _cache.get(path)
+    if maps is None:
+        try:
+            maps = load_zones(path)
+            log.info(f"Loaded zones for {len(maps)} map(s) from {path}")
+        except Exception as e:
+            # Cached empty, so a broken file is reported once rather than every batch
+            maps = {}
+            log.error(f"Could not load zones from {path}: {e}; using radius clustering")
+        _cache[path] = maps
+    if not map_name:
+        return None
+    zmap = maps.get(map_name)
+    return zmap if zmap is not None and len(zmap) else None
+
+
+def invalidate_zones() -> None:
+    _cache.clear()
@@ -0,0 +1,270 @@
+"""Benchmark the clustering engines in bot/proximity.py against stored baselines.
+
+Each case is a synthetic player distribution (uniform, tight groups, corridor chains) at
+16-256 players, replayed as a short walk of batches. Every engine's output is checked
+against a brute-force connected-components reference, and its per-batch time is compared
+with scripts/clustering_baselines.json. The script exits 1 on a wrong result. Timing
+regressions (slower than the baseline by more than --tolerance) are reported as warnings,
+and only fail the run with --check-timing, since timings on shared machines are noisy.
+
+    python scripts/bench_clustering.py                  # check results, compare timings
+    python scripts/bench_clustering.py --check-timing   # also fail on timing regressions
+    python scripts/bench_clustering.py --save           # record new baselines
+    python scripts/bench_clustering.py --radius 600 --engines grid,incremental --json
+
+Each case is timed interleaved with a fixed pure-Python calibration loop, and baselines are
+stored relative to it, so they survive CPU frequency swings and stay roughly comparable
+across machines. Re-run --save after an intentional engine change.
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bot.proximity import (  # noqa: E402
+    IncrementalClusterer,
+    Pos,
+    _finalize_clusters,
+    cluster_positions,
+    cluster_positions_numpy,
+    dist2,
+    np,
+)
+
+BASELINE_FILE = Path(__file__).resolve().with_name("clustering_baselines.json")
+SIZES = (16, 32, 64, 128, 256)
+DISTRIBUTIONS = ("uniform", "groups", "corridor")
+# Map extent (Source units) for uniform and group layouts; roughly a mid-sized TTT map
+EXTENT = 8000.0
+
+
+def reference(points: Dict[int, Pos], radius: float, max_clusters: int) -> List[List[int]]:
+    """O(n^2) connected components over every pair; slow but obviously correct."""
+    uids = sorted(points)
+    parent = {uid: uid for uid in uids}
+
+    def find(u: int) -> int:
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    if radius > 0:
+        r2 = radius * radius
+        for i, a in enumerate(uids):
+            for b in uids[i + 1:]:
+                if dist2(points[a], points[b]) <= r2:
+                    ra, rb = find(a), find(b)
+                    if ra != rb:
+                        parent[max(ra, rb)] = min(ra, rb)
+    groups: Dict[int, List[int]] = {}
+    for uid in uids:
+        groups.setdefault(find(uid), []).append(uid)
+    return _finalize_clusters(list(groups.values()), max_clusters)
+
+
+def layout(dist: str, n: int, radius: float, rng: random.Random) -> List[Tuple[float, float, float]]:
+    if dist == "uniform":
+        return [(rng.uniform(0, EXTENT), rng.uniform(0, EXTENT), rng.uniform(0, 300)) for _ in range(n)]
+    if dist == "groups":
+        # Squads of 3-8 standing within a fraction of the radius of each other
+        out: List[Tuple[float, float, float]] = []
+        while len(out) < n:
+            cx, cy = rng.uniform(0, EXTENT), rng.uniform(0, EXTENT)
+            for _ in range(min(rng.randint(3, 8), n - len(out))):
+                out.append((cx + rng.gauss(0, radius * 0.2), cy + rng.gauss(0, radius * 0.2), rng.uniform(0, 64)))
+        return out
+    if dist == "corridor":
+        # Lines of players just under `radius` apart: long single-linkage chains, the worst
+        # case for union-find depth and for the incremental engine's component rebuilds
+        out = []
+        per = max(2, int(math.sqrt(n)))
+        while len(out) < n:
+            x, y = rng.uniform(0, EXTENT), rng.uniform(0, EXTENT)
+            angle = rng.uniform(0, 2 * math.pi)
+            for _ in range(min(per, n - len(out))):
+                out.append((x, y, 0.0))
+                step = radius * rng.uniform(0.7, 0.98)
+                x += step * math.cos(angle)
+                y += step * math.sin(angle)
+        return out
+    raise ValueError(dist)
+
+
+def frames(dist: str, n: int, radius: float, count: int, seed: int) -> List[Dict[int, Pos]]:
+    """A walk of `count` batches: everyone drifts a little each batch, a few players sprint."""
+    rng = random.Random(f"{dist}/{n}/{seed}")
+    coords = layout(dist, n, radius, rng)
+    uids = [76561198000000000 + i for i in range(n)]
+    out = []
+    for _ in range(count):
+        out.append({uid: Pos(x, y, z) for uid, (x, y, z) in zip(uids, coords)})
+        moved = []
+        for x, y, z in coords:
+            d = radius * 0.5 if rng.random() < 0.05 else 12.0
+            moved.append((x + rng.uniform(-d, d), y + rng.uniform(-d, d), z))
+        coords = moved
+    return out
+
+
+def make_engines(names: List[str], epsilon: float) -> Dict[str, Callable[[bool], Callable]]:
+    """Engine name -> factory(exact) returning a fresh (points, radius, max_clusters) callable.
+
+    The incremental engine skips players who moved less than `epsilon`, so its timed runs can
+    legitimately differ from the reference; with exact=True it runs with epsilon 0 and must match.
+    """
+    engines: Dict[str, Callable[[bool], Callable]] = {}
+    for name in names:
+        if name == "grid":
+            engines[name] = lambda exact: cluster_positions
+        elif name == "numpy":
+            if np is None:
+                print("[Bench] NumPy not installed; skipping numpy engine")
+                continue
+            engines[name] = lambda exact: cluster_positions_numpy
+        elif name == "incremental":
+            def factory(exact: bool):
+                state: Dict[str, IncrementalClusterer] = {}
+
+                def run(points, radius, max_clusters):
+                    inc = state.get("inc")
+                    if inc is None:
+                        inc = state["inc"] = IncrementalClusterer(radius, max_clusters, 0.0 if exact else epsilon)
+                    # Callers must not mutate the (possibly shared) result; copy for checking
+                    return [list(c) for c in inc.update(points)]
+                return run
+            engines[name] = factory
+        else:
+            raise SystemExit(f"Unknown engine '{name}' (grid, numpy, incremental)")
+    return engines
+
+
+def calibration_pass() -> float:
+    """Seconds for a fixed pure-Python workload (dict/float/loop mix like the grid engine)."""
+    t0 = time.perf_counter()
+    acc: Dict[Tuple[int, int], float] = {}
+    for i in range(5000):
+        x = i * 0.37
+        key = (int(x) % 97, i % 13)
+        acc[key] = acc.get(key, 0.0) + math.floor(x) * 0.5
+    return time.perf_counter() - t0
+
+
+def bench_case(factory, batches: List[Dict[int, Pos]], expected: List[List[List[int]]],
+               radius: float, max_clusters: int, repeat: int) -> Tuple[float, float, int]:
+    """Best-of-`repeat` microseconds per batch, best calibration pass (us), wrong batches."""
+    check = factory(True)
+    wrong = sum(1 for points, want in zip(batches, expected) if check(points, radius, max_clusters) != want)
+    best = best_calib = float("inf")
+    for _ in range(repeat):
+        # Interleaved, so both see the same CPU speed
+        best_calib = min(best_calib, calibration_pass())
+        fn = factory(False)
+        t0 = time.perf_counter()
+        for points in batches:
+            fn(points, radius, max_clusters)
+        best = min(best, (time.perf_counter() - t0) / len(batches))
+    return best * 1e6, best_calib * 1e6, wrong
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark bot/proximity.py clustering engines")
+    ap.add_argument("--engines", default="grid,numpy,incremental", help="comma-separated: grid, numpy, incremental")
+    ap.add_argument("--sizes", default=",".join(map(str, SIZES)), help="player counts")
+    ap.add_argument("--distributions", default=",".join(DISTRIBUTIONS))
+    ap.add_argument("--radius", type=float, default=800.0, help="PROX_RADIUS")
+    ap.add_argument("--max-clusters", type=int, default=10, help="PROX_MAX_CLUSTERS")
+    ap.add_argument("--epsilon", type=float, default=16.0, help="PROX_INCREMENTAL_EPSILON for timed incremental runs")
+    ap.add_argument("--batches", type=int, default=20, help="batches per case (a short walk)")
+    ap.add_argument("--repeat", type=int, default=7, help="timing repeats; the best is kept")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown vs baseline (0.3 = 30%%)")
+    ap.add_argument("--check-timing", action="store_true", help="exit 1 on timing regressions too (wrong results always fail)")
+    ap.add_argument("--confirm", type=int, default=2, help="re-measure a case up to N times before calling it a regression")
+    ap.add_argument("--min-slack-us", type=float, default=20.0, help="ignore regressions smaller than this")
+    ap.add_argument("--baselines", default=str(BASELINE_FILE))
+    ap.add_argument("--save", action="store_true", help="write the measured times as the new baselines")
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args()
+
+    engines = make_engines([e.strip() for e in args.engines.split(",") if e.strip()], args.epsilon)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    dists = [d.strip() for d in args.distributions.split(",") if d.strip()]
+    stored: dict = {}
+    path = Path(args.baselines)
+    if path.exists() and not args.save:
+        stored = json.loads(path.read_text(encoding="utf-8"))
+    # Per-batch time divided by the calibration pass time
+    baselines: Dict[str, float] = stored.get("relative", {})
+
+    results: Dict[str, dict] = {}
+    failures: List[str] = []
+    slow: List[str] = []
+    for dist in dists:
+        for n in sizes:
+            batches = frames(dist, n, args.radius, args.batches, args.seed)
+            expected = [reference(p, args.radius, args.max_clusters) for p in batches]
+            for name, factory in engines.items():
+                key = f"{name}/{dist}/{n}"
+                us, calib_us, wrong = bench_case(factory, batches, expected, args.radius, args.max_clusters, args.repeat)
+                base = baselines.get(key)
+                for _ in range(args.confirm if args.save or base is not None else 0):
+                    if not args.save and us / calib_us <= base * (1.0 + args.tolerance):
+                        break
+                    # Baselines keep the best of several runs; a case that looks slower is measured
+                    # again so a noisy burst doesn't fail the run
+                    us2, calib2, _ = bench_case(factory, batches, expected, args.radius, args.max_clusters, args.repeat)
+                    if us2 / calib2 < us / calib_us:
+                        us, calib_us = us2, calib2
+                entry = {"per_batch_us": round(us, 1), "relative": round(us / calib_us, 5), "wrong_batches": wrong}
+                if wrong:
+                    failures.append(f"{key}: {wrong}/{len(batches)} batches differ from the reference")
+                if base is not None and not args.save:
+                    # Baseline expressed at this machine's current speed
+                    base_us = base * calib_us
+                    entry["baseline_us"] = round(base_us, 1)
+                    entry["ratio"] = round(us / base_us, 2)
+                    if us > base_us * (1.0 + args.tolerance) and us - base_us > args.min_slack_us:
+                        slow.append(f"{key}: {us:.1f} us/batch vs baseline {base_us:.1f} us (+{(entry['ratio'] - 1) * 100:.0f}%)")
+                results[key] = entry
+                if not args.json:
+                    vs = f"  baseline {entry['baseline_us']:>9.1f} us  x{entry['ratio']:.2f}" if "baseline_us" in entry else ""
+                    flag = "  WRONG" if wrong else ""
+                    print(f"{key:<28} {us:>9.1f} us/batch{vs}{flag}")
+
+    if args.save:
+        data = {
+            "note": "relative = per-batch time / calibration pass time; per_batch_us is informational. Regenerate with --save.",
+            "radius": args.radius,
+            "max_clusters": args.max_clusters,
+            "epsilon": args.epsilon,
+            "batches": args.batches,
+            "relative": {k: v["relative"] for k, v in results.items() if not v["wrong_batches"]},
+            "per_batch_us": {k: v["per_batch_us"] for k, v in results.items() if not v["wrong_batches"]},
+        }
+        path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"[Bench] Saved {len(data['relative'])} baselines to {path}")
+    elif stored and (stored.get("radius"), stored.get("max_clusters"), stored.get("epsilon")) != (args.radius, args.max_clusters, args.epsilon):
+        print("[Bench] WARN: baselines were recorded with a different radius/max_clusters/epsilon", file=sys.stderr)
+
+    if args.check_timing:
+        failures.extend(slow)
+        slow = []
+    if args.json:
+        print(json.dumps({"results": results, "failures": failures, "slow": slow}, indent=2))
+    for s in slow:
+        print(f"[Bench] WARN slower than baseline: {s}", file=sys.stderr)
+    for f in failures:
+        print(f"[Bench] FAIL {f}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
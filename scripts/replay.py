@@ -0,0 +1,231 @@
+"""Replay a recorded event log (PROX_RECORD_FILE) offline through the tenant event handler.
+
+No Discord connection or GMod server is needed. Moves are applied to an in-memory voice
+index, cluster channels get synthetic ids, and cooldowns run on the recorded arrival times,
+so results are deterministic for a given log and settings.
+
+    python scripts/replay.py events.jsonl.gz                  # as fast as possible
+    python scripts/replay.py events.jsonl.gz --speed 1        # original timing, reports lag
+    python scripts/replay.py events.jsonl.gz --env-file .env --set PROX_RADIUS=600 --json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from dotenv import dotenv_values  # noqa: E402
+
+from bot.config import Settings  # noqa: E402
+from bot.dispatcher import MoveIntent, PRIORITY_CLUSTER, PRIORITY_DEATH, PRIORITY_RESET  # noqa: E402
+from bot.log import silence  # noqa: E402
+from bot.metrics import MOVES_SUPPRESSED  # noqa: E402
+from bot.position_stream import PositionStream  # noqa: E402
+from bot.recorder import iter_recording  # noqa: E402
+from bot.store import load_mapping  # noqa: E402
+from bot.tenant import DEFAULT_SERVER_ID, Tenant, TenantConfig  # noqa: E402
+from bot.wire import iter_positions  # noqa: E402
+
+# Synthetic channel ids
+LIVING = 1
+DEAD = 2
+CLUSTER_BASE = 1000
+PRIORITY_NAMES = {PRIORITY_DEATH: "death", PRIORITY_RESET: "reset", PRIORITY_CLUSTER: "cluster"}
+
+
+class OfflineDispatcher:
+    """Applies intents to the tenant's voice index immediately and counts them."""
+
+    concurrency = 1
+    depth = 0
+
+    def __init__(self, tenant: "OfflineTenant"):
+        self.tenant = tenant
+        self.moves: Counter = Counter()
+        self.executed = 0
+        self.superseded = 0
+        self.rate_limited = 0
+
+    def submit(self, intent: MoveIntent) -> asyncio.Future:
+        voice = self.tenant.voice
+        if intent.channel_id is not None and voice.channel_of(intent.user_id) not in (None, intent.channel_id):
+            voice.update(intent.user_id, intent.channel_id)
+            self.moves[PRIORITY_NAMES.get(intent.priority, str(intent.priority))] += 1
+        self.executed += 1
+        fut = asyncio.get_running_loop().create_future()
+        fut.set_result(True)
+        return fut
+
+    def cancel(self, min_priority: int) -> int:
+        return 0
+
+
+class OfflineTenant(Tenant):
+    def __init__(self, cfg: TenantConfig, settings: Settings, mapping: Dict[str, int], synthesize: bool):
+        super().__init__(None, cfg, settings, mapping)
+        self.dispatcher = OfflineDispatcher(self)  # type: ignore[assignment]
+        self.stream = PositionStream()
+        self._can_manage_channels = self._can_move_members = self._can_mute_members = True
+        self.synthesize = synthesize
+        self.rounds = 0
+
+    @property
+    def ready(self) -> bool:
+        return True
+
+    def refresh_perms(self) -> None:
+        pass
+
+    async def _cluster_channels(self, n: int):
+        return [(CLUSTER_BASE + i, f"{self.cluster_prefix}-{i + 1}") for i in range(n)]
+
+    async def _cleanup_clusters(self) -> None:
+        pass
+
+    def seat_players(self, ev: dict) -> None:
+        """Put every player the log mentions into Living voice the first time they appear."""
+        sids = [p[0] for p in iter_positions(ev)]
+        player = ev.get("player") or {}
+        if player.get("steamid64"):
+            sids.append(str(player["steamid64"]))
+        for sid in sids:
+            uid = self.steam_to_discord.get(sid)
+            if uid is None:
+                if not self.synthesize:
+                    continue
+                uid = self.steam_to_discord[sid] = int(sid) if sid.isdigit() else zlib.crc32(sid.encode())
+            if self.voice.channel_of(uid) is None:
+                self.voice.link(uid)
+                self.voice.update(uid, LIVING)
+
+
+def build_settings(env_file: Optional[str], overrides: List[str]) -> Settings:
+    values = {"DISCORD_TOKEN": "offline", "GUILD_ID": 1, "BRIDGE_SECRET": "offline"}
+    if env_file:
+        values.update({k: v for k, v in dotenv_values(env_file).items() if v is not None})
+    for item in overrides:
+        key, _, value = item.partition("=")
+        values[key.strip()] = value
+    # Channel ids are synthetic offline; static cluster channels don't exist here
+    values.update({"LIVING_CHANNEL_ID": LIVING, "DEAD_CHANNEL_ID": DEAD, "PROX_CLUSTER_STATIC_IDS": None})
+    return Settings(**values)
+
+
+def pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+async def replay(args) -> dict:
+    settings = build_settings(args.env_file, args.set)
+    mapping: Dict[str, int] = load_mapping(args.mapping) if args.mapping else {}
+    tenants: Dict[str, OfflineTenant] = {}
+    cpu: Dict[str, List[float]] = {}
+    wall: Dict[str, List[float]] = {}
+    lags: List[float] = []
+    first_t: Optional[float] = None
+    last_t: Optional[float] = None
+    start = time.perf_counter()
+    if not args.verbose:
+        # Handler log lines would interleave with (and corrupt) the --json summary
+        silence()
+    for t, ev in iter_recording(args.log):
+        if first_t is None:
+            first_t = t
+        last_t = t
+        if args.speed > 0:
+            delay = start + (t - first_t) / args.speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                lags.append(-delay)
+        etype = str(ev.get("type"))
+        if etype == "link_attempt":
+            continue
+        server_id = str(ev.get("server_id") or DEFAULT_SERVER_ID)
+        tenant = tenants.get(server_id)
+        if tenant is None:
+            tenant = tenants[server_id] = OfflineTenant(TenantConfig(server_id=server_id), settings, mapping, not args.mapping)
+        tenant.clock = lambda t=t: t
+        if etype == "player_pos_batch":
+            full, _ = tenant.stream.apply(ev)
+            if full is None:
+                continue
+            ev = full
+        elif etype == "round_start":
+            tenant.rounds += 1
+        tenant.seat_players(ev)
+        c0, w0 = time.process_time(), time.perf_counter()
+        await tenant.handle_event(ev)
+        # Let fire-and-forget work (round_start reset waves) run before the next event
+        await asyncio.sleep(0)
+        cpu.setdefault(etype, []).append(time.process_time() - c0)
+        wall.setdefault(etype, []).append(time.perf_counter() - w0)
+
+    return {
+        "log": args.log,
+        "replay_sec": round(time.perf_counter() - start, 3),
+        "recorded_sec": round((last_t or 0.0) - (first_t or 0.0), 3),
+        "events": {
+            etype: {
+                "count": len(v),
+                "cpu_ms_total": round(sum(v) * 1000, 3),
+                "wall_ms_p50": round(pct(wall[etype], 0.5) * 1000, 3),
+                "wall_ms_p99": round(pct(wall[etype], 0.99) * 1000, 3),
+                "wall_ms_max": round(max(wall[etype]) * 1000, 3),
+            }
+            for etype, v in sorted(cpu.items())
+        },
+        "cpu_ms_total": round(sum(sum(v) for v in cpu.values()) * 1000, 3),
+        "tenants": {
+            sid: {
+                "rounds": t.rounds,
+                "moves": dict(t.dispatcher.moves),
+                "cluster_moves_per_round": round(t.dispatcher.moves["cluster"] / max(1, t.rounds), 2),
+            }
+            for sid, t in tenants.items()
+        },
+        "suppressed": {labels[0]: int(v) for labels, v in MOVES_SUPPRESSED._values.items()},
+        "lag_ms": {
+            "p50": round(pct(lags, 0.5) * 1000, 3),
+            "p99": round(pct(lags, 0.99) * 1000, 3),
+            "max": round(max(lags, default=0.0) * 1000, 3),
+        } if args.speed > 0 else None,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Replay a ProxChat event recording offline")
+    ap.add_argument("log", help="gzip JSON-lines file written via PROX_RECORD_FILE")
+    ap.add_argument("--speed", type=float, default=0.0, help="0 = as fast as possible, 1 = original timing, 2 = twice as fast")
+    ap.add_argument("--env-file", help="start from this .env (e.g. production tuning)")
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="override a setting; repeatable")
+    ap.add_argument("--mapping", help="SteamID mapping file; default links every player seen in the log")
+    ap.add_argument("--json", action="store_true", help="print the summary as JSON (for diffing runs)")
+    ap.add_argument("--verbose", action="store_true", help="show the handler's own log output")
+    args = ap.parse_args()
+    summary = asyncio.run(replay(args))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"Replayed {summary['recorded_sec']}s of events in {summary['replay_sec']}s; handler CPU {summary['cpu_ms_total']} ms")
+    for etype, st in summary["events"].items():
+        print(f"  {etype:<18} n={st['count']:<7} cpu={st['cpu_ms_total']:>10.2f} ms  p50={st['wall_ms_p50']:.3f} ms  p99={st['wall_ms_p99']:.3f} ms  max={st['wall_ms_max']:.3f} ms")
+    for sid, st in summary["tenants"].items():
+        print(f"  tenant {sid}: rounds={st['rounds']} moves={st['moves']} cluster moves/round={st['cluster_moves_per_round']}")
+    print(f"  suppressed: {summary['suppressed']}")
+    if summary["lag_ms"]:
+        lag = summary["lag_ms"]
+        print(f"  lag behind original timing: p50={lag['p50']} ms p99={lag['p99']} ms max={lag['max']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,33 @@
-import os
+"""Send a test event to the bridge, or generate position load.
+
+    python scripts/send_event.py [event_type]          # one event (default player_death)
+    python scripts/send_event.py load --players 40 --hz 4 --duration 30
+    python scripts/send_event.py load --fake --players 60 --hz 5 --latency-ms 80 --rate-limit 0.02
+
+`load` simulates N players in groups at M Hz; every --shuffle-sec some players teleport to
+another group (or walk there at --walk-speed units/s, passing other groups on the way). By default it posts to BRIDGE_URL and reports request latency. With --fake
+it starts the real bridge app and ProxBot in this process against an in-memory guild
+(bot/fake_discord.py), and also reports event-to-move latency and Discord API call counts.
+"""
+import argparse
+import asyncio
 import json
+import os
+import random
 import sys
+import time
 import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
 
 BASE = os.environ.get("BRIDGE_URL", "http://127.0.0.1:8080")
 SECRET = os.environ.get("BRIDGE_SECRET", "")
 
+STEAMID64_BASE = 76561197960265728
+# Synthetic Discord user ids for --fake
+FAKE_UID_BASE = 800_000_000_000_000_000
+
+
 def post(path: str, payload: dict):
     url = BASE.rstrip("/") + path
     req = urllib.request.Request(url, method="POST")
@@ -16,7 +38,295 @@ def post(path: str, payload: dict):
     with urllib.request.urlopen(req, data=data, timeout=3) as resp:
         print(resp.status, resp.read().decode("utf-8"))
 
+
+def pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+def ms_stats(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": round(pct(values, 0.5) * 1000, 2),
+        "p99_ms": round(pct(values, 0.99) * 1000, 2),
+        "max_ms": round(max(values, default=0.0) * 1000, 2),
+    }
+
+
+class Swarm:
+    """N players split over groups spaced well beyond the proximity radius."""
+
+    def __init__(self, players: int, groups: int, radius: float, seed: Optional[int], walk_speed: float = 0.0):
+        self.rng = random.Random(seed)
+        self.radius = radius
+        self.groups = max(1, groups)
+        self.walk_speed = walk_speed
+        self.steamids = [str(STEAMID64_BASE + 1000 + i) for i in range(players)]
+        self.group_of = {sid: i % self.groups for i, sid in enumerate(self.steamids)}
+        self.offset = {sid: self._scatter() for sid in self.steamids}
+        self.pos = {sid: self.home(sid) for sid in self.steamids}
+        self._last_ts: Optional[float] = None
+
+    def _scatter(self):
+        r = self.radius * 0.3
+        return (self.rng.uniform(-r, r), self.rng.uniform(-r, r))
+
+    def center(self, group: int):
+        # Groups on a grid, 3 radii apart, so they never chain into one cluster
+        side = max(1, int(self.groups ** 0.5 + 0.999))
+        step = self.radius * 3
+        return (group % side) * step, (group // side) * step
+
+    def home(self, sid: str):
+        cx, cy = self.center(self.group_of[sid])
+        ox, oy = self.offset[sid]
+        return cx + ox, cy + oy
+
+    def shuffle(self, fraction: float) -> List[str]:
+        """Send a fraction of players to another group; returns who moved."""
+        if self.groups < 2:
+            return []
+        moved = self.rng.sample(self.steamids, max(1, int(len(self.steamids) * fraction)))
+        for sid in moved:
+            self.group_of[sid] = (self.group_of[sid] + self.rng.randrange(1, self.groups)) % self.groups
+            self.offset[sid] = self._scatter()
+        return moved
+
+    def batch(self, ts: float, server_id: Optional[str]) -> dict:
+        step = self.walk_speed * (ts - self._last_ts) if self._last_ts is not None else 0.0
+        self._last_ts = ts
+        positions = []
+        for sid in self.steamids:
+            hx, hy = self.home(sid)
+            if self.walk_speed > 0:
+                # Straight line towards the group at walk_speed
+                x, y = self.pos[sid]
+                dx, dy = hx - x, hy - y
+                d = (dx * dx + dy * dy) ** 0.5
+                if d > step:
+                    hx, hy = x + dx / d * step, y + dy / d * step
+            self.pos[sid] = (hx, hy)
+            # Small per-tick wander, like players walking around within their group
+            positions.append({
+                "player": {"steamid64": sid},
+                "pos": {"x": hx + self.rng.uniform(-10, 10), "y": hy + self.rng.uniform(-10, 10), "z": 0.0},
+                "ts": ts,
+            })
+        ev = {"type": "player_pos_batch", "positions": positions}
+        if server_id:
+            ev["server_id"] = server_id
+        return ev
+
+
+class FakeBridge:
+    """Bridge app + ProxBot running in this process against a FakeGuild."""
+
+    def __init__(self, args, swarm: Swarm):
+        self.args = args
+        self.swarm = swarm
+        self.pending: Dict[int, float] = {}  # uid -> when its new position was first sent
+        self.latencies: List[float] = []
+        self.runner = None
+
+    async def start(self) -> str:
+        sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+        from aiohttp import web
+        from dotenv import dotenv_values
+
+        # Offline placeholders for required settings that neither .env nor the environment sets
+        file_env = dotenv_values()
+        placeholders = {"DISCORD_TOKEN": "fake", "GUILD_ID": "1", "LIVING_CHANNEL_ID": "2", "DEAD_CHANNEL_ID": "3", "BRIDGE_SECRET": "load"}
+        for key, value in placeholders.items():
+            if key not in os.environ and not file_env.get(key):
+                os.environ[key] = value
+
+        from bot.__main__ import ProxBot
+        from bot.config import get_settings
+        from bot.fake_discord import FakeAPI, FakeGuild
+        from bot.http_server import create_app
+        from bot.tenant import DEFAULT_SERVER_ID, TenantConfig
+
+        settings = get_settings()
+        self.bot = ProxBot([TenantConfig(server_id=DEFAULT_SERVER_ID)])
+        tenant = self.tenant = self.bot.tenants[DEFAULT_SERVER_ID]
+        a = self.args
+        self.api = FakeAPI(
+            latency=a.latency_ms / 1000.0,
+            jitter=a.jitter_ms / 1000.0,
+            rate_limit_rate=a.rate_limit,
+            retry_after=a.retry_after,
+            timeout_rate=a.timeout_rate,
+            timeout_sec=a.timeout_sec,
+            seed=a.seed,
+        )
+        guild = self.guild = FakeGuild(tenant.guild_id, api=self.api)
+        guild.add_voice_channel("Living", channel_id=tenant.living_channel)
+        guild.add_voice_channel("Dead", channel_id=tenant.dead_channel)
+        if tenant.cluster_category_id:
+            guild.add_category("ProxChat", channel_id=tenant.cluster_category_id)
+        for i, sid in enumerate(self.swarm.steamids):
+            uid = FAKE_UID_BASE + i
+            self.bot.steam_to_discord[sid] = uid
+            guild.add_member(uid, channel_id=tenant.living_channel)
+        # Gateway voice updates go through the bot's real handler, then into the latency probe
+        guild.voice_listeners.append(self.bot.on_voice_state_update)
+        guild.voice_listeners.append(self._on_voice)
+        tenant.attach(guild)
+        tenant.refresh_perms()
+
+        app = create_app(lambda: settings.BRIDGE_SECRET, self.bot.route_event)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host="127.0.0.1", port=0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.secret = settings.BRIDGE_SECRET
+        return f"http://{host}:{port}"
+
+    def expect_move(self, steamids: List[str], t: float) -> None:
+        for sid in steamids:
+            self.pending.setdefault(self.bot.steam_to_discord[sid], t)
+
+    async def _on_voice(self, member, before, after) -> None:
+        ch = after.channel
+        if ch is None or ch.id in (self.tenant.living_channel, self.tenant.dead_channel):
+            return
+        t0 = self.pending.pop(member.id, None)
+        if t0 is not None:
+            self.latencies.append(time.perf_counter() - t0)
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def summary(self) -> dict:
+        d = self.tenant.dispatcher
+        return {
+            "event_to_move": ms_stats(self.latencies),
+            "never_moved": len(self.pending),
+            "dispatcher": {"executed": d.executed, "superseded": d.superseded, "rate_limited": d.rate_limited},
+            "queue": {"superseded": self.tenant.queue.dropped_superseded, "out_of_order": self.tenant.queue.dropped_out_of_order},
+            "api": self.api.summary(),
+        }
+
+
+async def run_load(args) -> dict:
+    import aiohttp
+
+    swarm = Swarm(args.players, args.groups, args.radius, args.seed, args.walk_speed)
+    fake: Optional[FakeBridge] = None
+    base, secret = BASE, SECRET
+    if args.fake:
+        fake = FakeBridge(args, swarm)
+        base = await fake.start()
+        secret = fake.secret
+    headers = {"x-bridge-secret": secret} if secret else {}
+    http: List[float] = []
+    errors = 0
+    not_queued = 0
+    interval = 1.0 / args.hz
+    async with aiohttp.ClientSession(base_url=base, headers=headers) as session:
+
+        async def send(ev: dict) -> None:
+            nonlocal errors, not_queued
+            t0 = time.perf_counter()
+            try:
+                async with session.post("/events", json=ev, timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                    body = await resp.json(content_type=None)
+                    if resp.status != 200:
+                        errors += 1
+                    elif not body.get("queued", True):
+                        not_queued += 1
+            except Exception:
+                errors += 1
+            http.append(time.perf_counter() - t0)
+
+        start = time.perf_counter()
+        await send({"type": "round_start", "server_id": args.server} if args.server else {"type": "round_start"})
+        if fake is not None:
+            # Everyone starts in Living and should end up in their group's cluster channel
+            fake.expect_move(swarm.steamids, time.perf_counter())
+        next_shuffle = start + args.shuffle_sec
+        ticks = 0
+        while True:
+            now = time.perf_counter()
+            if now - start >= args.duration:
+                break
+            if args.shuffle_sec > 0 and now >= next_shuffle:
+                moved = swarm.shuffle(args.churn)
+                if fake is not None:
+                    fake.expect_move(moved, now)
+                next_shuffle += args.shuffle_sec
+            await send(swarm.batch(round(now - start, 3), args.server))
+            ticks += 1
+            delay = start + ticks * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elapsed = time.perf_counter() - start
+        if fake is not None:
+            # Let queued moves drain before measuring
+            await asyncio.sleep(args.drain_sec)
+    summary = {
+        "players": args.players,
+        "target_hz": args.hz,
+        "achieved_hz": round(ticks / elapsed, 2) if elapsed > 0 else 0.0,
+        "batches": ticks,
+        "http": ms_stats(http),
+        "http_errors": errors,
+        "not_queued": not_queued,
+    }
+    if fake is not None:
+        summary["fake"] = fake.summary()
+        await fake.stop()
+    return summary
+
+
+def load_main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(prog="send_event.py load", description="Generate player_pos_batch load")
+    ap.add_argument("--players", type=int, default=40)
+    ap.add_argument("--hz", type=float, default=4.0, help="position batches per second")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds")
+    ap.add_argument("--groups", type=int, default=6, help="player groups (keep <= PROX_MAX_CLUSTERS)")
+    ap.add_argument("--radius", type=float, default=800.0, help="PROX_RADIUS the groups are laid out for")
+    ap.add_argument("--shuffle-sec", type=float, default=5.0, help="teleport players between groups this often (0 = never)")
+    ap.add_argument("--churn", type=float, default=0.1, help="fraction of players teleported per shuffle")
+    ap.add_argument("--walk-speed", type=float, default=0.0, help="walk to the new group at this speed (units/s) instead of teleporting")
+    ap.add_argument("--server", help="server_id to tag events with (multi-server bridges)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true", help="print the summary as JSON")
+    fake = ap.add_argument_group("in-process fake Discord (--fake)")
+    fake.add_argument("--fake", action="store_true", help="run the bridge and bot here against an in-memory guild")
+    fake.add_argument("--latency-ms", type=float, default=50.0, help="per API call latency")
+    fake.add_argument("--jitter-ms", type=float, default=20.0, help="extra random latency, 0..N ms")
+    fake.add_argument("--rate-limit", type=float, default=0.0, help="probability an API call answers 429")
+    fake.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on injected 429s")
+    fake.add_argument("--timeout-rate", type=float, default=0.0, help="probability an API call hangs and times out")
+    fake.add_argument("--timeout-sec", type=float, default=5.0, help="how long an injected timeout hangs")
+    fake.add_argument("--drain-sec", type=float, default=3.0, help="wait for queued moves after the last batch")
+    args = ap.parse_args(argv)
+    if args.hz <= 0 or args.players <= 0:
+        ap.error("--hz and --players must be positive")
+    summary = asyncio.run(run_load(args))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    h = summary["http"]
+    print(f"{summary['batches']} batches of {summary['players']} players at {summary['achieved_hz']} Hz (target {summary['target_hz']})")
+    print(f"  request: p50={h['p50_ms']} ms p99={h['p99_ms']} ms max={h['max_ms']} ms errors={summary['http_errors']} not_queued={summary['not_queued']}")
+    f = summary.get("fake")
+    if f:
+        m = f["event_to_move"]
+        print(f"  event->move: n={m['count']} p50={m['p50_ms']} ms p99={m['p99_ms']} ms max={m['max_ms']} ms never_moved={f['never_moved']}")
+        print(f"  dispatcher: {f['dispatcher']}  queue drops: {f['queue']}")
+        print(f"  discord api: {f['api']['total_calls']} calls {f['api']['calls']} 429={f['api']['rate_limited']} timeouts={f['api']['timeouts']}")
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "load":
+        load_main(sys.argv[2:])
+        sys.exit(0)
     ev = {
         "type": "player_death",
         "ts": 1.0,
@@ -24,4 +334,4 @@ if __name__ == "__main__":
     }
     if len(sys.argv) > 1:
         ev["type"] = sys.argv[1]
-    post("/events", ev)
\ No newline at end of file
+    post("/events", ev)
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+from bot.actuator import ActuatorLink, ActuatorServer, encode, open_connection
+
+
+class _Bot:
+    def __init__(self):
+        self.steam_to_discord = {"76561197960265729": 42}
+        self.tenants = {}
+
+    async def handle_link(self, ev):
+        return {"linked": True, "code": ev.get("code")}
+
+
+async def _serve(secret: str):
+    server = ActuatorServer("tcp:127.0.0.1:0", _Bot(), secret)
+    srv = await asyncio.start_server(server._on_client, "127.0.0.1", 0)
+    port = srv.sockets[0].getsockname()[1]
+    return server, srv, f"tcp:127.0.0.1:{port}"
+
+
+def test_link_with_right_secret_gets_snapshot_and_results():
+    async def run():
+        server, srv, addr = await _serve("s3cret")
+        mapping = {}
+        link = ActuatorLink(addr, {}, mapping, lambda: "s3cret")
+        task = asyncio.create_task(link.run())
+        try:
+            for _ in range(100):
+                if mapping:
+                    break
+                await asyncio.sleep(0.01)
+            assert mapping == {"76561197960265729": 42}
+            result = await asyncio.wait_for(link.request({"op": "link", "event": {"code": "ABC"}}), 2)
+            assert result == {"linked": True, "code": "ABC"}
+        finally:
+            task.cancel()
+            srv.close()
+    asyncio.run(run())
+
+
+def test_wrong_or_missing_secret_is_rejected_before_snapshot():
+    async def run():
+        server, srv, addr = await _serve("s3cret")
+        try:
+            for first in (encode({"op": "hello", "secret": "nope"}), encode({"op": "link", "id": 1, "event": {}})):
+                reader, writer = await open_connection(addr)
+                writer.write(first)
+                assert await asyncio.wait_for(reader.read(), 2) == b""
+                writer.close()
+            assert not server._writers
+        finally:
+            srv.close()
+    asyncio.run(run())
+
+
+def test_hello_then_request():
+    async def run():
+        server, srv, addr = await _serve("s3cret")
+        try:
+            reader, writer = await open_connection(addr)
+            writer.write(encode({"op": "hello", "secret": "s3cret"}))
+            writer.write(encode({"op": "link", "id": 7, "event": {"code": "X"}}))
+            msgs = []
+            while not any(m.get("op") == "result" for m in msgs):
+                msgs.append(json.loads(await asyncio.wait_for(reader.readline(), 2)))
+            assert msgs[0]["op"] == "mapping"
+            assert msgs[-1] == {"op": "result", "id": 7, "value": {"linked": True, "code": "X"}}
+            writer.close()
+        finally:
+            srv.close()
+    asyncio.run(run())
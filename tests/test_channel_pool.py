@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from bot import channel_pool
+from bot.channel_pool import DRAINING, READY, ChannelPool
+from bot.fake_discord import FakeGuild
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(channel_pool.time, "monotonic", lambda: now[0])
+    return now
+
+
+async def _settle(pool: ChannelPool) -> None:
+    while pool._tasks:
+        await asyncio.gather(*list(pool._tasks))
+
+
+def _names(guild: FakeGuild):
+    return sorted(ch.name for ch in guild.voice_channels)
+
+
+def _pool(**kw) -> ChannelPool:
+    kw.setdefault("spare", 1)
+    kw.setdefault("drain_sec", 30.0)
+    return ChannelPool("test", **kw)
+
+
+def test_warm_and_acquire(clock):
+    async def run():
+        guild = FakeGuild(1)
+        pool = _pool()
+        pool.attach(guild)
+        pool.warm(2)
+        await _settle(pool)
+        assert _names(guild) == ["Cluster-1", "Cluster-2"]
+        got = pool.acquire(2)
+        assert [name for _, name in got] == ["Cluster-1", "Cluster-2"]
+        # Demand grew: spare is topped up in the background
+        clock[0] += 1.0
+        pool.acquire(3)
+        await _settle(pool)
+        assert _names(guild) == ["Cluster-1", "Cluster-2", "Cluster-3", "Cluster-4"]
+        assert len(pool.acquire(3)) == 3
+    asyncio.run(run())
+
+
+def test_adopts_existing_channels(clock):
+    async def run():
+        guild = FakeGuild(1)
+        guild.add_voice_channel("Cluster-1")
+        guild.add_voice_channel("Cluster-2")
+        guild.add_voice_channel("Lobby")
+        pool = _pool()
+        pool.attach(guild)
+        assert pool.counts()[READY] == 2
+        assert guild.api.calls["guild.create_voice_channel"] == 0
+    asyncio.run(run())
+
+
+def test_surplus_drains_then_deletes(clock):
+    async def run():
+        guild = FakeGuild(1)
+        pool = _pool(spare=0)
+        pool.attach(guild)
+        pool.warm(4)
+        await _settle(pool)
+        clock[0] += 1.0
+        pool.acquire(1)
+        assert pool.counts()[DRAINING] == 3
+        # Demand returns before drain_sec: drained channels are reused
+        clock[0] += 5.0
+        assert len(pool.acquire(2)) == 2
+        assert pool.counts()[DRAINING] == 2
+        clock[0] += 31.0
+        pool.acquire(1)
+        clock[0] += 31.0
+        pool.acquire(1)
+        await _settle(pool)
+        assert _names(guild) == ["Cluster-1"]
+    asyncio.run(run())
+
+
+def test_occupied_surplus_is_pinned(clock, monkeypatch):
+    async def run():
+        guild = FakeGuild(1)
+        pool = _pool(spare=0)
+        pool.attach(guild)
+        pool.warm(3)
+        await _settle(pool)
+        busy = next(ch for ch in guild.voice_channels if ch.name == "Cluster-3")
+        guild.add_member(42, channel_id=busy.id)
+        clock[0] += 1.0
+        pool.acquire(1)
+        assert pool.counts()[DRAINING] == 1
+        # Cluster-2 drains; Cluster-3 has a member and stays
+        clock[0] += 31.0
+        pool.acquire(1)
+        clock[0] += 1.0
+        pool.acquire(1)
+        await _settle(pool)
+        assert _names(guild) == ["Cluster-1", "Cluster-3"]
+        # Nothing left to do while Cluster-3 is occupied: no maintenance passes
+        assert not pool._off_target()
+        passes = []
+        monkeypatch.setattr(pool, "_maintain", lambda *a, **kw: passes.append(1))
+        for _ in range(5):
+            clock[0] += 1.0
+            pool.acquire(1)
+        assert passes == []
+        # Once it empties it drains like any other surplus channel
+        guild.add_member(42).voice = None
+        assert pool._off_target()
+    asyncio.run(run())
+
+
+def test_release_keeps_first_channels(clock):
+    async def run():
+        guild = FakeGuild(1)
+        pool = _pool(spare=0)
+        pool.attach(guild)
+        pool.warm(4)
+        await _settle(pool)
+        assert await pool.release(keep=1) == 3
+        assert _names(guild) == ["Cluster-1"]
+    asyncio.run(run())
+
+
+def test_static_ids(clock):
+    async def run():
+        guild = FakeGuild(1)
+        a = guild.add_voice_channel("Squad A")
+        b = guild.add_voice_channel("Squad B")
+        pool = _pool(static_ids=f"{a.id}, {b.id}, 999")
+        pool.attach(guild)
+        assert pool.acquire(5) == [(a.id, "Squad A"), (b.id, "Squad B")]
+        pool.warm(3)
+        assert guild.api.calls["guild.create_voice_channel"] == 0
+    asyncio.run(run())
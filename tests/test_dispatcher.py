@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import discord
+import pytest
+
+from bot import dispatcher as dispatcher_mod
+from bot.dispatcher import PRIORITY_CLUSTER, PRIORITY_DEATH, PRIORITY_RESET, MoveDispatcher, MoveIntent
+
+
+class _Moves:
+    """Stands in for discord_actions.move_member: records calls, optionally slow or rate-limited."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+        self.fail_with = []
+
+    async def __call__(self, guild, user_id, channel_id, **kw):
+        self.calls.append((user_id, channel_id, time.monotonic()))
+        if self.fail_with:
+            raise self.fail_with.pop(0)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return True
+
+
+@pytest.fixture
+def moves(monkeypatch):
+    m = _Moves()
+    monkeypatch.setattr(dispatcher_mod, "move_member", m)
+    return m
+
+
+def _dispatcher(concurrency: int = 1) -> MoveDispatcher:
+    return MoveDispatcher(lambda: object(), concurrency=concurrency)
+
+
+def test_priority_order(moves):
+    async def run():
+        d = _dispatcher()
+        futs = [
+            d.submit(MoveIntent(1, 10, PRIORITY_CLUSTER)),
+            d.submit(MoveIntent(2, 10, PRIORITY_RESET)),
+            d.submit(MoveIntent(3, 10, PRIORITY_DEATH)),
+            d.submit(MoveIntent(4, 10, PRIORITY_RESET)),
+        ]
+        assert await asyncio.gather(*futs) == [True] * 4
+        assert [c[0] for c in moves.calls] == [3, 2, 4, 1]
+    asyncio.run(run())
+
+
+def test_newer_intent_supersedes_pending(moves):
+    async def run():
+        d = _dispatcher()
+        first = d.submit(MoveIntent(1, 10, PRIORITY_CLUSTER))
+        second = d.submit(MoveIntent(1, 11, PRIORITY_CLUSTER))
+        assert await asyncio.gather(first, second) == [False, True]
+        assert [c[:2] for c in moves.calls] == [(1, 11)]
+        assert d.superseded == 1
+    asyncio.run(run())
+
+
+def test_cluster_move_never_replaces_death(moves):
+    async def run():
+        d = _dispatcher()
+        death = d.submit(MoveIntent(1, 99, PRIORITY_DEATH))
+        cluster = d.submit(MoveIntent(1, 10, PRIORITY_CLUSTER))
+        assert await asyncio.gather(death, cluster) == [True, False]
+        assert [c[:2] for c in moves.calls] == [(1, 99)]
+    asyncio.run(run())
+
+
+def test_rate_limit_pauses_and_retries(moves):
+    async def run():
+        d = _dispatcher(concurrency=2)
+        moves.fail_with.append(discord.RateLimited(0.2))
+        ok = await asyncio.wait_for(d.submit(MoveIntent(1, 10)), 2)
+        assert ok and d.rate_limited == 1
+        (_, _, t0), (_, _, t1) = moves.calls
+        assert t1 - t0 >= 0.19
+    asyncio.run(run())
+
+
+def test_intent_superseded_during_pause(moves):
+    async def run():
+        d = _dispatcher()
+        moves.fail_with.append(discord.RateLimited(0.2))
+        cluster = d.submit(MoveIntent(1, 10, PRIORITY_CLUSTER))
+        await asyncio.sleep(0.05)
+        death = d.submit(MoveIntent(1, 99, PRIORITY_DEATH))
+        assert await asyncio.wait_for(asyncio.gather(cluster, death), 2) == [False, True]
+        assert [c[:2] for c in moves.calls] == [(1, 10), (1, 99)]
+    asyncio.run(run())
+
+
+def test_lowering_concurrency_retires_workers(moves):
+    async def run():
+        moves.delay = 0.02
+        d = _dispatcher(concurrency=4)
+        await asyncio.gather(*(d.submit(MoveIntent(uid, 10)) for uid in range(4)))
+        assert moves.peak == 4 and len(d._workers) == 4
+        d.concurrency = 1
+        await asyncio.sleep(0)
+        assert len(d._workers) == 1
+        moves.peak = 0
+        await asyncio.gather(*(d.submit(MoveIntent(uid, 11)) for uid in range(4)))
+        assert moves.peak == 1
+        d.concurrency = 3
+        await asyncio.gather(*(d.submit(MoveIntent(uid, 12)) for uid in range(6)))
+        assert moves.peak == 3
+    asyncio.run(run())
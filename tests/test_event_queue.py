@@ -0,0 +1,135 @@
+import asyncio
+
+from bot.event_queue import EventQueue, batch_ts
+
+
+class _Recorder:
+    def __init__(self):
+        self.events = []
+
+    async def __call__(self, ev):
+        self.events.append(ev)
+        return None
+
+
+async def _drain(queue: EventQueue) -> None:
+    # The recorder never awaits, so a few loop turns let the worker empty the queue
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert queue.depth == 0
+
+
+def test_coalesced_heartbeat_keeps_pending_changes():
+    async def run():
+        rec = _Recorder()
+        queue = EventQueue(rec)
+        sid = "76561197960265729"
+        # Keyframe, then a delta that moves the player, then an empty heartbeat delta, all
+        # arriving before the worker runs
+        await queue.dispatch({"type": "player_pos_batch", "mode": "keyframe", "seq": 1, "ts": 1.0,
+                              "packed": [(sid, 0.0, 0.0, 0.0, 1.0)]})
+        await _drain(queue)
+        await queue.dispatch({"type": "player_pos_batch", "mode": "delta", "seq": 2, "ts": 1.2,
+                              "packed": [(sid, 5000.0, 0.0, 0.0, 1.2)], "removed": []})
+        await queue.dispatch({"type": "player_pos_batch", "mode": "delta", "seq": 3, "ts": 1.4,
+                              "packed": [], "removed": []})
+        await _drain(queue)
+        last = rec.events[-1]
+        assert (last["seq"], last["unchanged"], [p[1] for p in last["packed"]]) == (3, False, [5000.0])
+        # A heartbeat replacing another heartbeat stays unchanged
+        await queue.dispatch({"type": "player_pos_batch", "mode": "delta", "seq": 4, "ts": 1.6, "packed": []})
+        await queue.dispatch({"type": "player_pos_batch", "mode": "delta", "seq": 5, "ts": 1.8, "packed": []})
+        await _drain(queue)
+        assert rec.events[-1]["seq"] == 5 and rec.events[-1]["unchanged"]
+    asyncio.run(run())
+
+
+def _batch(ts, x=0.0):
+    return {"type": "player_pos_batch", "positions": [{"steamid": "1", "x": x, "y": 0.0, "z": 0.0, "ts": ts}]}
+
+
+def _kinds(events):
+    return [ev["type"] if ev["type"] != "player_pos_batch" else ("pos", batch_ts(ev)) for ev in events]
+
+
+def test_latest_position_batch_wins():
+    async def run():
+        rec = _Recorder()
+        queue = EventQueue(rec)
+        for ts in (1.0, 2.0, 3.0):
+            queue.submit(_batch(ts, x=ts))
+        assert queue.depth == 1
+        await _drain(queue)
+        assert _kinds(rec.events) == [("pos", 3.0)]
+        assert rec.events[0]["positions"][0]["x"] == 3.0
+        assert queue.dropped_superseded == 2
+    asyncio.run(run())
+
+
+def test_controls_keep_order_relative_to_pending_batch():
+    async def run():
+        rec = _Recorder()
+        queue = EventQueue(rec)
+        queue.submit({"type": "round_end"})
+        queue.submit(_batch(1.0))
+        queue.submit({"type": "player_death", "steamid": "1"})
+        queue.submit({"type": "player_spawn", "steamid": "1"})
+        await _drain(queue)
+        assert _kinds(rec.events) == ["round_end", ("pos", 1.0), "player_death", "player_spawn"]
+        # A superseding batch takes the newer arrival slot, behind controls queued before it
+        queue.submit(_batch(2.0))
+        queue.submit({"type": "player_death", "steamid": "1"})
+        queue.submit(_batch(3.0))
+        await _drain(queue)
+        assert _kinds(rec.events[4:]) == ["player_death", ("pos", 3.0)]
+    asyncio.run(run())
+
+
+def test_out_of_order_batches_are_dropped():
+    async def run():
+        rec = _Recorder()
+        queue = EventQueue(rec)
+        queue.submit(_batch(5.0))
+        await _drain(queue)
+        queue.submit(_batch(4.0))
+        queue.submit(_batch(5.0))
+        # Batches without timestamps are never treated as stale
+        queue.submit({"type": "player_pos_batch", "positions": []})
+        await _drain(queue)
+        assert queue.dropped_out_of_order == 2
+        assert _kinds(rec.events) == [("pos", 5.0), ("pos", None)]
+        # The stale check also applies to a batch that would replace a pending one
+        queue.submit(_batch(6.0))
+        queue.submit(_batch(5.5))
+        await _drain(queue)
+        assert queue.dropped_out_of_order == 3
+        assert _kinds(rec.events[2:]) == [("pos", 6.0)]
+    asyncio.run(run())
+
+
+def test_round_start_resets_batch_clock():
+    async def run():
+        rec = _Recorder()
+        queue = EventQueue(rec)
+        queue.submit(_batch(500.0))
+        await _drain(queue)
+        # Map change: CurTime() starts over, so the next round's batches look older
+        queue.submit({"type": "round_start"})
+        queue.submit(_batch(2.0))
+        await _drain(queue)
+        assert queue.dropped_out_of_order == 0
+        assert _kinds(rec.events) == [("pos", 500.0), "round_start", ("pos", 2.0)]
+        queue.submit(_batch(1.0))
+        assert queue.dropped_out_of_order == 1
+    asyncio.run(run())
+
+
+def test_inline_events_bypass_the_queue():
+    async def run():
+        async def handler(ev):
+            return {"ok": ev["type"]}
+        queue = EventQueue(handler)
+        assert await queue.dispatch({"type": "link_attempt", "code": "x"}) == {"ok": "link_attempt"}
+        assert queue.depth == 0
+        assert await queue.dispatch({"type": "round_end"}) == {"queued": True}
+    asyncio.run(run())
@@ -0,0 +1,88 @@
+import asyncio
+
+from bot.link_codes import LinkCodeStore
+from bot.store import MappingStore
+
+
+class _Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_issue_and_redeem_once():
+    codes = LinkCodeStore(ttl=60.0, clock=_Clock())
+    code = codes.issue(42)
+    assert code is not None and len(code) == 6
+    assert codes.redeem(code) == (42, None)
+    assert codes.redeem(code) == (None, "code_not_found")
+    assert len(codes) == 0
+
+
+def test_expired_codes_are_swept():
+    clock = _Clock()
+    codes = LinkCodeStore(ttl=60.0, clock=clock)
+    stale = [codes.issue(uid) for uid in range(5)]
+    clock.now += 61.0
+    fresh = codes.issue(99)
+    assert len(codes) == 1 and codes.expired == 5
+    assert codes.redeem(stale[0]) == (None, "code_not_found")
+    assert codes.redeem(fresh) == (99, None)
+
+
+def test_expired_at_redeem():
+    clock = _Clock()
+    codes = LinkCodeStore(ttl=60.0, clock=clock)
+    code = codes.issue(1)
+    clock.now += 60.5
+    # Swept on redeem either way; never links
+    assert codes.redeem(code)[0] is None
+
+
+def test_per_user_limit_revokes_oldest():
+    codes = LinkCodeStore(per_user=2, clock=_Clock())
+    first, second, third = codes.issue(7), codes.issue(7), codes.issue(7)
+    assert codes.revoked == 1
+    assert codes.redeem(first) == (None, "code_not_found")
+    assert codes.redeem(second) == (7, None)
+    assert codes.redeem(third) == (7, None)
+
+
+def test_full_store_refuses():
+    codes = LinkCodeStore(max_codes=3, clock=_Clock())
+    assert all(codes.issue(uid) for uid in range(3))
+    assert codes.issue(3) is None
+    assert codes.refused == 1
+
+
+def test_heap_is_compacted():
+    codes = LinkCodeStore(clock=_Clock())
+    for uid in range(500):
+        codes.redeem(codes.issue(uid))
+    assert len(codes) == 0
+    assert len(codes._expiry) <= 64 + 2
+
+
+def test_codes_survive_restart_with_backend(tmp_path):
+    clock = _Clock()
+    path = str(tmp_path / "links.sqlite")
+
+    async def issue():
+        store = MappingStore(path)
+        store.load()
+        codes = LinkCodeStore(ttl=60.0, backend=store, clock=clock)
+        live, doomed = codes.issue(1), codes.issue(2)
+        codes.redeem(doomed)
+        store.close()
+        return live, doomed
+
+    live, doomed = asyncio.run(issue())
+    store = MappingStore(path)
+    store.load()
+    codes = LinkCodeStore(ttl=60.0, backend=store, clock=clock)
+    assert codes.load() == 1
+    assert codes.redeem(doomed) == (None, "code_not_found")
+    assert codes.redeem(live) == (1, None)
+    store.close()
@@ -0,0 +1,92 @@
+import logging
+
+import pytest
+
+from bot import log as botlog
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(botlog.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def logger():
+    lg = botlog.get_logger("Test")
+    handler = _Collect()
+    lg._logger.addHandler(handler)
+    lg.records = handler.records
+    yield lg
+    lg._logger.removeHandler(handler)
+
+
+def test_sampled_message_reports_suppressed_count(clock, logger):
+    for _ in range(5):
+        logger.warning("Rate limited", sample=10.0)
+    assert len(logger.records) == 1
+    clock[0] += 10.0
+    logger.warning("Rate limited", sample=10.0)
+    assert len(logger.records) == 2
+    assert logger.records[1].fields == {"suppressed": 4}
+
+
+def test_fields_do_not_split_sampling(clock, logger):
+    for wait in (0.5, 1.25, 2.0):
+        logger.warning("Rate limited; pausing moves", wait=wait, sample=10.0)
+    assert len(logger.records) == 1
+    assert logger.records[0].fields == {"wait": 0.5}
+
+
+def test_key_samples_separately(clock, logger):
+    for sid in ("a", "b", "a"):
+        logger.warning("Unknown server", key=f"unknown-server:{sid}", sample=10.0)
+    assert [r.fields.get("suppressed") for r in logger.records] == [None, None]
+    assert len(logger._last) == 2
+
+
+def test_unsampled_always_logs(clock, logger):
+    for _ in range(3):
+        logger.info("Hello", uid=1)
+    assert len(logger.records) == 3
+
+
+def test_sample_keys_are_bounded(clock, monkeypatch, logger):
+    monkeypatch.setattr(botlog, "_MAX_SAMPLE_KEYS", 8)
+    for i in range(100):
+        clock[0] += 0.01
+        logger.info("Event", key=f"k{i}", sample=10.0)
+    assert len(logger.records) == 100
+    assert len(logger._last) <= 8
+    # Idle keys go first
+    clock[0] += 20.0
+    logger.info("Event", key="fresh", sample=10.0)
+    assert len(logger._last) <= 8
+
+
+def test_formatter_text_and_json():
+    record = logging.LogRecord("proxchat.Tenant:1", logging.WARNING, __file__, 1, "Moved", None, None)
+    record.fields = {"uid": 5}
+    assert botlog._Formatter().format(record) == "[Tenant:1] WARN: Moved uid=5"
+    assert '"tag": "Tenant:1"' in botlog._Formatter(json_lines=True).format(record)
+
+
+def test_silence(logger):
+    root = logging.getLogger(botlog.ROOT)
+    level = root.level
+    try:
+        botlog.silence()
+        logger.error("Not shown")
+        assert logger.records == []
+    finally:
+        root.setLevel(level)
@@ -0,0 +1,75 @@
+from bot.motion import MotionTracker
+from bot.position_stream import PositionStream
+from bot.proximity import Pos
+
+
+def _tracker(**kw) -> MotionTracker:
+    kw.setdefault("horizon", 0.5)
+    return MotionTracker(**kw)
+
+
+def test_walking_player_is_predicted_ahead():
+    m = _tracker(smoothing=1.0)
+    m.predict({1: Pos(0, 0, 0)}, {1: 0.0}, 0.0)
+    out = m.predict({1: Pos(100, 0, 0)}, {1: 0.5}, 0.5)
+    assert m.speed(1) == 200.0
+    assert out[1].x == 200.0
+    assert m.moving == 1
+
+
+def test_teleport_resets_velocity():
+    m = _tracker(smoothing=1.0, max_speed=600.0)
+    m.predict({1: Pos(0, 0, 0)}, {1: 0.0}, 0.0)
+    out = m.predict({1: Pos(5000, 0, 0)}, {1: 0.5}, 0.5)
+    assert m.speed(1) == 0.0
+    assert out[1].x == 5000
+
+
+def test_stopped_player_becomes_still():
+    m = _tracker(smoothing=0.5)
+    for i in range(4):
+        m.predict({1: Pos(i * 100.0, 0, 0)}, {1: i * 0.5}, i * 0.5)
+    assert not m.is_still(1)
+    # Stops at x=300: same position, new sample times
+    for i in range(4, 12):
+        m.predict({1: Pos(300.0, 0, 0)}, {1: i * 0.5}, i * 0.5)
+    assert m.is_still(1)
+    assert m.moving == 0
+
+
+def test_repeated_stale_sample_goes_still():
+    m = _tracker(smoothing=1.0, max_gap=2.0)
+    m.predict({1: Pos(0, 0, 0)}, {1: 0.0}, 0.0)
+    m.predict({1: Pos(100, 0, 0)}, {1: 0.5}, 0.5)
+    # The same sample keeps arriving (sender stopped stamping new ones)
+    m.predict({1: Pos(100, 0, 0)}, {1: 0.5}, 1.0)
+    assert not m.is_still(1)
+    out = m.predict({1: Pos(100, 0, 0)}, {1: 0.5}, 3.0)
+    assert m.is_still(1)
+    assert out[1].x == 100
+
+
+def test_delta_stream_player_left_out_becomes_still():
+    stream = PositionStream()
+    m = _tracker(smoothing=0.5)
+    sid = "76561197960265729"
+    batch, _ = stream.apply({"mode": "keyframe", "seq": 1, "ts": 0.0, "packed": [(sid, 0.0, 0.0, 0.0, 0.0)]})
+    for seq in range(2, 6):
+        t = (seq - 1) * 0.2
+        batch, _ = stream.apply({"mode": "delta", "seq": seq, "ts": t, "packed": [(sid, t * 300, 0.0, 0.0, t)]})
+        m.predict({1: Pos(*batch["packed"][0][1:4])}, {1: batch["packed"][0][4]}, t)
+    assert not m.is_still(1)
+    # Player stops: deltas no longer mention them
+    for seq in range(6, 16):
+        t = (seq - 1) * 0.2
+        batch, _ = stream.apply({"mode": "delta", "seq": seq, "ts": t, "packed": []})
+        assert batch["packed"][0][4] == t
+        m.predict({1: Pos(*batch["packed"][0][1:4])}, {1: batch["packed"][0][4]}, t)
+    assert m.is_still(1)
+
+
+def test_players_missing_from_batch_are_forgotten():
+    m = _tracker()
+    m.predict({1: Pos(0, 0, 0), 2: Pos(0, 0, 0)}, {}, 0.0)
+    m.predict({1: Pos(0, 0, 0)}, {}, 0.5)
+    assert 2 not in m._state
@@ -0,0 +1,48 @@
+from bot.planner import assign_channels, plan_moves, with_occupied
+
+C1, C2, C3, C4, C5 = 11, 12, 13, 14, 15
+LIVING = 2
+
+
+def test_clusters_stay_where_most_members_are():
+    clusters = [[1, 2, 3], [4, 5]]
+    current = {1: C2, 2: C2, 3: C1, 4: C1, 5: LIVING}
+    targets, moves = plan_moves(clusters, current, [C1, C2])
+    assert targets == {1: C2, 2: C2, 3: C2, 4: C1, 5: C1}
+    assert sorted(moves) == [(3, C2), (5, C1)]
+
+
+def test_unmatched_clusters_take_lowest_free_channels():
+    assert assign_channels([[1], [2], [3]], {1: C2}, [C1, C2, C3]) == {0: C2, 1: C1, 2: C3}
+    # More clusters than channels: the rest stay unassigned
+    assert assign_channels([[1], [2], [3]], {}, [C1, C2]) == {0: C1, 1: C2}
+
+
+def test_group_beyond_first_n_channels_is_kept():
+    # Two clusters now; the group of three already sits together in Cluster-5
+    clusters = [[1, 2, 3], [4]]
+    current = {1: C5, 2: C5, 3: C5, 4: C1}
+    pool = {C1, C2, C3, C4, C5}
+    # Without the occupied channel the group would be moved into Cluster-2
+    _, moves = plan_moves(clusters, current, [C1, C2])
+    assert sorted(moves) == [(1, C2), (2, C2), (3, C2)]
+    channel_ids = with_occupied([C1, C2], clusters, current, pool)
+    assert channel_ids == [C1, C2, C5]
+    targets, moves = plan_moves(clusters, current, channel_ids)
+    assert moves == []
+    assert targets == {1: C5, 2: C5, 3: C5, 4: C1}
+
+
+def test_with_occupied_ignores_other_channels():
+    clusters = [[1, 2], [3]]
+    current = {1: LIVING, 2: 999, 3: C4}
+    assert with_occupied([C1, C2], clusters, current, {C1, C2, C3, C4}) == [C1, C2, C4]
+    assert with_occupied([C1, C2], [[1, 2]], current, {C1, C2, C3, C4}) == [C1, C2]
+
+
+def test_new_cluster_still_takes_lowest_channel():
+    clusters = [[1, 2], [3]]
+    current = {1: C5, 2: C5, 3: LIVING}
+    channel_ids = with_occupied([C1, C2], clusters, current, {C1, C2, C5})
+    targets, _ = plan_moves(clusters, current, channel_ids)
+    assert targets[1] == C5 and targets[3] == C1
@@ -0,0 +1,72 @@
+from bot.position_stream import PositionStream
+
+A, B, C = "76561197960265729", "76561197960265730", "76561197960265731"
+
+
+def _keyframe(seq, ts, *players):
+    return {"mode": "keyframe", "seq": seq, "ts": ts, "packed": [(sid, x, 0.0, 0.0, ts) for sid, x in players]}
+
+
+def _delta(seq, ts, *players, removed=()):
+    return {"mode": "delta", "seq": seq, "ts": ts, "removed": list(removed),
+            "packed": [(sid, x, 0.0, 0.0, ts) for sid, x in players]}
+
+
+def _xs(batch):
+    return {p[0]: p[1] for p in batch["packed"]}
+
+
+def test_plain_batches_pass_through():
+    ev = {"type": "player_pos_batch", "positions": []}
+    assert PositionStream().apply(ev) == (ev, False)
+
+
+def test_keyframe_then_deltas():
+    s = PositionStream()
+    batch, resync = s.apply(_keyframe(1, 1.0, (A, 0.0), (B, 0.0)))
+    assert not resync and _xs(batch) == {A: 0.0, B: 0.0}
+    batch, resync = s.apply(_delta(2, 1.2, (A, 5.0), (C, 1.0), removed=[B]))
+    assert not resync
+    assert _xs(batch) == {A: 5.0, C: 1.0}
+    assert batch["seq"] == 2 and not batch["unchanged"]
+
+
+def test_unchanged_delta_restamps_players():
+    s = PositionStream()
+    s.apply(_keyframe(1, 1.0, (A, 0.0)))
+    batch, _ = s.apply(_delta(2, 1.2))
+    assert batch["unchanged"]
+    assert batch["packed"] == [(A, 0.0, 0.0, 0.0, 1.2)]
+
+
+def test_gap_requests_keyframe_until_one_arrives():
+    s = PositionStream()
+    s.apply(_keyframe(1, 1.0, (A, 0.0)))
+    batch, resync = s.apply(_delta(4, 1.6, (A, 3.0)))
+    # Applied best-effort, but the sender is asked for a keyframe
+    assert resync and _xs(batch) == {A: 3.0}
+    assert s.gaps == 1
+    _, resync = s.apply(_delta(5, 1.8, (A, 4.0)))
+    assert resync and s.gaps == 1
+    _, resync = s.apply(_keyframe(6, 2.0, (A, 4.0)))
+    assert not resync
+
+
+def test_duplicate_and_late_deltas_are_dropped():
+    s = PositionStream()
+    s.apply(_keyframe(10, 1.0, (A, 0.0)))
+    s.apply(_delta(11, 1.2, (A, 2.0)))
+    assert s.apply(_delta(11, 1.2, (A, 2.0))) == (None, False)
+    assert s.apply(_delta(9, 0.8, (A, 9.0))) == (None, False)
+
+
+def test_sequence_wraps():
+    s = PositionStream()
+    s.apply(_keyframe(2 ** 32 - 1, 1.0, (A, 0.0)))
+    _, resync = s.apply(_delta(0, 1.2, (A, 1.0)))
+    assert not resync and s.gaps == 0
+
+
+def test_delta_before_keyframe_asks_for_one():
+    batch, resync = PositionStream().apply(_delta(5, 1.0, (A, 1.0)))
+    assert resync and _xs(batch) == {A: 1.0}
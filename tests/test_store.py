@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+from bot.store import MappingStore
+
+
+def _store(tmp_path) -> MappingStore:
+    return MappingStore(str(tmp_path / "links.sqlite"))
+
+
+def test_import_waits_for_the_json_file(tmp_path):
+    legacy = tmp_path / "mapping.json"
+    store = _store(tmp_path)
+    # No JSON file yet: nothing imported, nothing recorded
+    assert store.load(str(legacy)) == {}
+    store.close()
+    legacy.write_text(json.dumps({"76561197960265729": "42"}), encoding="utf-8")
+    store = _store(tmp_path)
+    assert store.load(str(legacy)) == {"76561197960265729": 42}
+    store.close()
+
+
+def test_import_runs_once_per_file(tmp_path):
+    legacy = tmp_path / "mapping.json"
+    legacy.write_text(json.dumps({"76561197960265729": 42}), encoding="utf-8")
+    store = _store(tmp_path)
+    store.load(str(legacy))
+    store.close()
+    legacy.write_text(json.dumps({"76561197960265729": 42, "76561197960265730": 43}), encoding="utf-8")
+    store = _store(tmp_path)
+    assert store.load(str(legacy)) == {"76561197960265729": 42}
+    store.close()
+
+
+def test_links_persist_and_database_wins(tmp_path):
+    legacy = tmp_path / "mapping.json"
+
+    async def link():
+        store = _store(tmp_path)
+        store.load()
+        await store.link("76561197960265729", 7)
+        assert store.steamids_for(7) == {"76561197960265729"}
+        store.close()
+
+    asyncio.run(link())
+    legacy.write_text(json.dumps({"76561197960265729": 42}), encoding="utf-8")
+    store = _store(tmp_path)
+    assert store.load(str(legacy)) == {"76561197960265729": 7}
+    store.close()
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import pytest
+
+from bot.config import Settings
+from bot.fake_discord import FakeGuild
+from bot.tenant import Tenant, TenantConfig, build_tenants, load_tenants
+
+LIVING, DEAD = 2, 3
+
+
+def _settings(**kw) -> Settings:
+    values = {"DISCORD_TOKEN": "test", "GUILD_ID": 1, "LIVING_CHANNEL_ID": LIVING, "DEAD_CHANNEL_ID": DEAD,
+              "BRIDGE_SECRET": "test"}
+    values.update(kw)
+    return Settings(**values)
+
+
+def test_load_tenants_rejects_shared_prefix(tmp_path):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps([
+        {"server_id": "b", "guild_id": 1, "living_channel_id": 12, "dead_channel_id": 13},
+    ]), encoding="utf-8")
+    # Without settings the defaults can't be resolved, so nothing is checked
+    assert [t.server_id for t in load_tenants(str(path))] == ["default", "b"]
+    with pytest.raises(ValueError, match="channel_prefix"):
+        load_tenants(str(path), _settings())
+    path.write_text(json.dumps([
+        {"server_id": "b", "guild_id": 1, "living_channel_id": 12, "dead_channel_id": 13, "channel_prefix": "B"},
+        {"server_id": "c", "guild_id": 9, "living_channel_id": 22, "dead_channel_id": 23},
+    ]), encoding="utf-8")
+    assert len(load_tenants(str(path), _settings())) == 3
+
+
+def test_reset_wave_only_touches_own_channels():
+    async def run():
+        settings = _settings()
+        mapping = {"s1": 101, "s2": 102, "s3": 103, "s4": 104}
+        tenants = build_tenants([
+            TenantConfig(server_id="default"),
+            TenantConfig(server_id="b", guild_id=1, living_channel_id=12, dead_channel_id=13, channel_prefix="B"),
+        ], settings, mapping)
+        guild = FakeGuild(1)
+        for cid, name in ((LIVING, "Living"), (DEAD, "Dead"), (12, "B Living"), (13, "B Dead"), (50, "Lobby")):
+            guild.add_voice_channel(name, channel_id=cid)
+        mine = guild.add_voice_channel("Cluster-1")
+        theirs = guild.add_voice_channel("B-1")
+        guild.add_member(101, channel_id=mine.id)
+        guild.add_member(102, channel_id=theirs.id)
+        guild.add_member(103, channel_id=50)
+        guild.add_member(104, channel_id=13)
+        for t in tenants.values():
+            t.attach(guild)
+        a: Tenant = tenants["default"]
+        await a._reset_wave("round_end", clear_policy=True)
+        assert guild.get_member(101).voice.channel.id == LIVING
+        assert guild.get_member(102).voice.channel.id == theirs.id
+        assert guild.get_member(103).voice.channel.id == 50
+        assert guild.get_member(104).voice.channel.id == 13
+        await tenants["b"]._reset_wave("round_end", clear_policy=True)
+        assert guild.get_member(102).voice.channel.id == 12
+        assert guild.get_member(104).voice.channel.id == 12
+    asyncio.run(run())
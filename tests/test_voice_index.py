@@ -0,0 +1,73 @@
+import asyncio
+
+from bot import config
+from bot.actuator import ActuatorLink
+from bot.config import Settings
+from bot.tenant import TenantConfig, build_tenants
+from bot.voice_index import VoiceIndex
+
+
+def _settings() -> Settings:
+    return Settings(DISCORD_TOKEN="test", GUILD_ID=1, LIVING_CHANNEL_ID=2, DEAD_CHANNEL_ID=3, BRIDGE_SECRET="test")
+
+
+def test_tracks_channels_and_linked_users():
+    v = VoiceIndex()
+    v.set_linked([1, 2])
+    v.update(1, 10)
+    v.update(3, 10)
+    assert v.members_of(10) == {1, 3}
+    assert v.linked_in_voice == {1}
+    v.link(3)
+    v.update(1, 11)
+    assert v.channel_of(1) == 11 and v.members_of(10) == {3}
+    assert v.linked_in_voice == {1, 3}
+    v.update(3, None)
+    assert v.linked_in_voice == {1} and v.members_of(10) == set()
+
+
+def test_unlink():
+    v = VoiceIndex()
+    v.link(1)
+    v.update(1, 10)
+    v.unlink(1)
+    assert v.linked_in_voice == set()
+    # Moving around doesn't bring it back
+    v.update(1, 11)
+    assert v.linked_in_voice == set()
+
+
+def test_relink_unlinks_previous_account_on_ingress():
+    mapping = {"s1": 100, "s2": 200, "s3": 200}
+    tenants = build_tenants([TenantConfig(server_id="default")], _settings(), mapping)
+    voice = tenants["default"].voice
+    link = ActuatorLink("tcp:127.0.0.1:1", tenants, mapping, "test")
+    link._handle({"op": "mapping", "mapping": dict(mapping)})
+    for uid in (100, 200, 300):
+        voice.update(uid, 2)
+    assert voice.linked_in_voice == {100, 200}
+    # s1 moves from 100 to 300: 100 has no SteamID left
+    link._handle({"op": "link", "steamid": "s1", "user_id": 300})
+    assert voice.linked_in_voice == {200, 300}
+    # s2 moves away from 200, which still has s3
+    link._handle({"op": "link", "steamid": "s2", "user_id": 300})
+    assert voice.linked_in_voice == {200, 300}
+
+
+def test_relink_unlinks_previous_account_in_bot(monkeypatch):
+    from bot.__main__ import ProxBot
+
+    monkeypatch.setattr(config, "_current", _settings())
+
+    async def run():
+        bot = ProxBot([TenantConfig(server_id="default")])
+        voice = bot.tenants["default"].voice
+        bot.steam_to_discord["s1"] = 100
+        voice.set_linked([100])
+        for uid in (100, 300):
+            voice.update(uid, 2)
+        code = bot.link_codes.issue(300)
+        assert await bot.handle_link({"code": code, "player": {"steamid64": "s1"}}) == {"linked": True}
+        assert voice.linked_in_voice == {300}
+        await bot.close()
+    asyncio.run(run())
@@ -0,0 +1,79 @@
+import math
+
+import pytest
+
+from bot.wire import (FLAG_DELTA, FLAG_KEYFRAME, FLAG_TABLE, HEADER, RECORD, STEAMID64_BASE, TABLE_ENTRY,
+                      WIRE_MAGIC, WIRE_VERSION, PositionDecoder, WireError, iter_positions)
+
+
+def _frame(records, *, table=None, table_id=1, flags=0, seq=0, ts_ms=0, magic=WIRE_MAGIC, version=WIRE_VERSION):
+    """Build a frame the way the Lua encoder does."""
+    if table is not None:
+        flags |= FLAG_TABLE
+    body = HEADER.pack(magic, version, flags, len(table or ()), len(records), table_id, seq, ts_ms)
+    for acct in table or ():
+        body += TABLE_ENTRY.pack(acct)
+    for rec in records:
+        body += RECORD.pack(*rec)
+    return body
+
+
+def test_decode_with_table():
+    ev = PositionDecoder().decode(_frame([(0, 1.0, 2.0, 3.0), (1, 4.0, 5.0, 6.0)], table=[1, 2], seq=9, ts_ms=1500))
+    assert ev["type"] == "player_pos_batch"
+    assert ev["seq"] == 9 and ev["ts"] == 1.5
+    assert ev["packed"] == [(str(STEAMID64_BASE + 1), 1.0, 2.0, 3.0, 1.5), (str(STEAMID64_BASE + 2), 4.0, 5.0, 6.0, 1.5)]
+    assert "mode" not in ev
+
+
+def test_table_is_remembered_between_frames():
+    dec = PositionDecoder()
+    dec.decode(_frame([], table=[7], table_id=3))
+    ev = dec.decode(_frame([(0, 1.0, 1.0, 1.0), (5, 0.0, 0.0, 0.0)], table_id=3))
+    # Out-of-range slots are skipped
+    assert [p[0] for p in ev["packed"]] == [str(STEAMID64_BASE + 7)]
+
+
+def test_unknown_table_and_eviction():
+    dec = PositionDecoder(max_tables=2)
+    with pytest.raises(WireError) as err:
+        dec.decode(_frame([], table_id=1))
+    assert err.value.reason == "unknown_table"
+    for tid in (1, 2, 3):
+        dec.decode(_frame([], table=[tid], table_id=tid))
+    with pytest.raises(WireError):
+        dec.decode(_frame([], table_id=1))
+    dec.decode(_frame([], table_id=3))
+
+
+@pytest.mark.parametrize("body,reason", [
+    (b"PXPB", "short_frame"),
+    (_frame([], table=[1], magic=b"NOPE"), "bad_magic"),
+    (_frame([], table=[1], version=WIRE_VERSION + 1), "unsupported_version"),
+    (_frame([(0, 1.0, 1.0, 1.0)], table=[1])[:-2], "short_frame"),
+])
+def test_malformed(body, reason):
+    with pytest.raises(WireError) as err:
+        PositionDecoder().decode(body)
+    assert err.value.reason == reason
+
+
+def test_keyframe_and_delta_modes():
+    dec = PositionDecoder()
+    assert dec.decode(_frame([], table=[1, 2], flags=FLAG_KEYFRAME))["mode"] == "keyframe"
+    ev = dec.decode(_frame([(0, math.nan, 0.0, 0.0), (1, 2.0, 2.0, 2.0)], flags=FLAG_DELTA))
+    assert ev["mode"] == "delta"
+    assert ev["removed"] == [str(STEAMID64_BASE + 1)]
+    assert [p[0] for p in ev["packed"]] == [str(STEAMID64_BASE + 2)]
+
+
+def test_iter_positions_json():
+    ev = {"positions": [
+        {"player": {"steamid64": "76561197960265729"}, "pos": {"x": 1, "y": 2, "z": 3}, "ts": 4},
+        {"player": {}, "pos": {"x": 9}},
+        {"player": {"steamid64": 76561197960265730}, "pos": {}},
+    ]}
+    assert list(iter_positions(ev)) == [
+        ("76561197960265729", 1.0, 2.0, 3.0, 4.0),
+        ("76561197960265730", 0.0, 0.0, 0.0, None),
+    ]
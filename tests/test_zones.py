@@ -0,0 +1,82 @@
+import pytest
+
+from bot.proximity import Pos, cluster_positions, cluster_positions_zoned
+from bot.zones import parse_zone_map
+
+RADIUS = 200.0
+
+# closet sits inside lobby and is listed first; hall is a triangle east of lobby; yard is
+# north of lobby behind a wall (not adjacent)
+MAP = {
+    "zones": [
+        {"name": "closet", "min": [0, 0, 0], "max": [100, 100, 256]},
+        {"name": "lobby", "min": [0, 0, 0], "max": [512, 512, 256]},
+        {"name": "hall", "polygon": [[512, 0], [2048, 0], [512, 512]], "z": [0, 256]},
+        {"name": "yard", "min": [0, 520, 0], "max": [512, 2048, 256]},
+    ],
+    "adjacent": [["lobby", "hall"], ["closet", "lobby"]],
+}
+
+
+@pytest.fixture
+def zones():
+    return parse_zone_map("test_map", MAP)
+
+
+def _names(zones, *points):
+    return [None if (i := zones.locate(Pos(*p))) is None else zones.zones[i].name for p in points]
+
+
+def test_zone_membership(zones):
+    assert _names(zones, (300, 300, 10), (1000, 100, 10), (300, 1000, 10)) == ["lobby", "hall", "yard"]
+    # Inside the hall's bounding box but outside the triangle
+    assert _names(zones, (2000, 500, 10)) == [None]
+    # Above the hall's z range, and off the map entirely
+    assert _names(zones, (1000, 100, 300), (-50, -50, 0)) == [None, None]
+
+
+def test_first_listed_zone_wins_on_overlap(zones):
+    assert _names(zones, (50, 50, 10), (150, 50, 10)) == ["closet", "lobby"]
+    reordered = parse_zone_map("test_map", {"zones": [MAP["zones"][1], MAP["zones"][0]]})
+    assert _names(reordered, (50, 50, 10)) == ["lobby"]
+
+
+def test_same_zone_clusters_regardless_of_distance(zones):
+    points = {1: Pos(200, 200, 10), 2: Pos(300, 1900, 10), 3: Pos(400, 600, 10)}
+    # 1 is in the lobby; 2 and 3 are in the yard, far apart
+    assert cluster_positions_zoned(points, zones, RADIUS, 8) == [[2, 3], [1]]
+
+
+def test_adjacent_zones_merge_within_radius(zones):
+    # Lobby and hall players either side of the doorway
+    near = {1: Pos(450, 100, 10), 2: Pos(600, 100, 10), 3: Pos(1500, 50, 10)}
+    assert cluster_positions_zoned(near, zones, RADIUS, 8) == [[1, 2, 3]]
+    # Same rooms, nobody within radius of the other room
+    far = {1: Pos(100 + 50, 300, 10), 2: Pos(1500, 50, 10)}
+    assert cluster_positions_zoned(far, zones, RADIUS, 8) == [[1], [2]]
+
+
+def test_non_adjacent_zones_never_merge(zones):
+    # Lobby and yard players 20 units apart through the wall
+    points = {1: Pos(300, 510, 10), 2: Pos(300, 530, 10)}
+    assert cluster_positions_zoned(points, zones, RADIUS, 8) == [[1], [2]]
+
+
+def test_merges_chain_through_adjacent_zones(zones):
+    # closet - lobby - hall, each pair within radius at its own boundary
+    points = {1: Pos(90, 90, 10), 2: Pos(150, 90, 10), 3: Pos(500, 100, 10), 4: Pos(650, 100, 10)}
+    assert cluster_positions_zoned(points, zones, RADIUS, 8) == [[1, 2, 3, 4]]
+
+
+def test_players_outside_zones_fall_back_to_radius(zones):
+    outside = {5: Pos(5000, 5000, 0), 6: Pos(5100, 5000, 0), 7: Pos(9000, 5000, 0)}
+    assert cluster_positions_zoned(outside, zones, RADIUS, 8) == cluster_positions(outside, RADIUS, 8)
+    # Outside players never join a zone cluster, even within radius of its members
+    points = {1: Pos(1000, 100, 250), 2: Pos(1000, 100, 300), **outside}
+    assert cluster_positions_zoned(points, zones, RADIUS, 8) == [[5, 6], [1], [2], [7]]
+
+
+def test_max_clusters_folds_overflow(zones):
+    points = {1: Pos(300, 300, 10), 2: Pos(1000, 100, 10), 3: Pos(300, 1000, 10), 4: Pos(9000, 0, 0)}
+    assert cluster_positions_zoned(points, zones, RADIUS, 2) == [[1], [2, 3, 4]]
+    assert cluster_positions_zoned({}, zones, RADIUS, 2) == []